@@ -0,0 +1,441 @@
+# app/analytics_store.py
+#
+# Append-only longitudinal store: every parsed submission is ingested once, and
+# "how has this student done across their last 50 tests" becomes an indexed query
+# instead of re-parsing 50 JSON files.
+#
+#   python -m app.analytics_store data/mock_test_*/ --root .cache/analytics
+#
+# Layout under `root`:
+#   questions/student=<name>/<submission_id>.parquet   question rows, one file per test
+#   analytics.sqlite                                   per-test rows + running aggregates
+#
+# The Parquet files keep the full detail; SQLite holds the small tables that are
+# updated incrementally on each ingest (per test, per student×chapter, per
+# student×concept/topic), so reads never scan the question rows.
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from app.concept_index import summarize_tags
+from app.data_processor import DEFAULT_STUDENT_NAME, expand_sources, iter_file_submissions, objectid_time
+
+logger = logging.getLogger("app.analytics_store")
+
+DEFAULT_STORE_DIR = os.path.join(os.environ.get("FEEDBACK_CACHE_DIR", ".cache"), "analytics")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (
+    submission_id  TEXT PRIMARY KEY,
+    student        TEXT NOT NULL,
+    test_time      REAL NOT NULL,     -- epoch seconds, from the ObjectId (else ingest time)
+    num_questions  INTEGER NOT NULL,
+    correct        INTEGER NOT NULL,
+    time_sum       REAL NOT NULL,
+    ingested_at    REAL NOT NULL,
+    time_count     INTEGER            -- questions with a recorded time (NULL: stored before it was kept)
+);
+CREATE INDEX IF NOT EXISTS idx_tests_student_time ON tests(student, test_time);
+
+CREATE TABLE IF NOT EXISTS test_chapters (
+    submission_id  TEXT NOT NULL,
+    student        TEXT NOT NULL,
+    test_time      REAL NOT NULL,
+    chapter        TEXT NOT NULL,
+    num_questions  INTEGER NOT NULL,
+    correct        INTEGER NOT NULL,
+    PRIMARY KEY (submission_id, chapter)
+);
+CREATE INDEX IF NOT EXISTS idx_test_chapters_student ON test_chapters(student, chapter, test_time);
+
+CREATE TABLE IF NOT EXISTS chapter_stats (
+    student        TEXT NOT NULL,
+    chapter        TEXT NOT NULL,
+    tests          INTEGER NOT NULL,
+    num_questions  INTEGER NOT NULL,
+    correct        INTEGER NOT NULL,
+    time_sum       REAL NOT NULL,
+    time_count     INTEGER NOT NULL,
+    last_seen      REAL NOT NULL,
+    PRIMARY KEY (student, chapter)
+);
+
+CREATE TABLE IF NOT EXISTS tag_stats (
+    student        TEXT NOT NULL,
+    tag_type       TEXT NOT NULL,     -- "topic" or "concept"
+    title          TEXT NOT NULL,
+    num_questions  INTEGER NOT NULL,
+    correct        INTEGER NOT NULL,
+    last_seen      REAL NOT NULL,
+    PRIMARY KEY (student, tag_type, title)
+);
+"""
+
+
+def _epoch(ts) -> float:
+    return ts.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _from_epoch(series: pd.Series) -> pd.Series:
+    return pd.to_datetime(series, unit="s")
+
+
+class AnalyticsStore:
+    """
+    Parquet + SQLite store of every ingested submission, keyed by submission_id.
+
+    ingest() is idempotent: a submission already in the store is skipped, so
+    re-running over the same files only adds what is new. Tests are ordered by the
+    creation time in their ObjectId (see data_processor.objectid_time); submissions
+    without one fall back to the time they were ingested.
+
+    Safe to share between processes (WAL mode, one transaction per ingest).
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = root
+        self.questions_dir = os.path.join(root, "questions")
+        self.db_path = os.path.join(root, "analytics.sqlite")
+        os.makedirs(self.questions_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(tests)")}
+            if "time_count" not in columns:
+                conn.execute("ALTER TABLE tests ADD COLUMN time_count INTEGER")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _student_dir(self, student: str) -> str:
+        return os.path.join(self.questions_dir, "student=" + quote(student, safe=""))
+
+    # ─── Ingest ───────────────────────────────────────────────────────────────────
+
+    def __contains__(self, submission_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM tests WHERE submission_id = ?", (submission_id,)
+            ).fetchone()
+        return row is not None
+
+    def ingest(
+        self,
+        submission_id: str,
+        df_questions,
+        summary_dict: dict,
+        student: str = None,
+        test_time: datetime = None,
+    ) -> bool:
+        """
+        Add one parsed submission (the output of parse_json_to_df) to the store and
+        fold it into the running aggregates. `student` defaults to the submission's
+        student_name; exported tests carry none, and filing them all under the
+        parser's placeholder name would merge every student into one, so that raises
+        ValueError instead. `test_time` (naive UTC) defaults to the time in the
+        ObjectId `submission_id`. Returns False if the submission was already ingested.
+        """
+        student = student or summary_dict.get("student_name")
+        if not student or student == DEFAULT_STUDENT_NAME:
+            raise ValueError(
+                f"Submission {submission_id!r} has no student id; pass the student explicitly "
+                "(--student, or a --students mapping file)."
+            )
+        if submission_id in self:
+            return False
+        now = time.time()
+
+        # 1) Test time: explicit, else from the ObjectId, else now
+        test_time = test_time or objectid_time(submission_id)
+        test_time = _epoch(test_time) if test_time is not None else now
+
+        # 2) Question rows → Parquet, written to a temp name and renamed into place
+        questions = pd.DataFrame({
+            "submission_id": submission_id,
+            "test_time": pd.Timestamp(test_time, unit="s"),
+            "question_no": np.arange(len(df_questions), dtype=np.int32),
+            "chapter": df_questions["chapter"],
+            "difficulty": df_questions["difficulty"],
+            "accuracy": df_questions["accuracy"],
+            "time_spent": df_questions["time_spent"],
+        })
+        student_dir = self._student_dir(student)
+        os.makedirs(student_dir, exist_ok=True)
+        final_path = os.path.join(student_dir, quote(submission_id, safe="") + ".parquet")
+        tmp_path = os.path.join(student_dir, f".tmp-{uuid.uuid4().hex}")
+        questions.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, final_path)
+
+        # 3) Per-test and per-chapter rows, computed once from this submission
+        accuracy = df_questions["accuracy"].to_numpy(dtype=np.int64)
+        time_spent = df_questions["time_spent"].to_numpy(dtype=np.float64)
+        has_time = ~np.isnan(time_spent)
+
+        chapters = df_questions["chapter"].astype(str).to_numpy()
+        chapter_rows = []
+        for chapter in pd.unique(chapters):
+            mask = chapters == chapter
+            timed = mask & has_time
+            chapter_rows.append((
+                chapter, int(mask.sum()), int(accuracy[mask].sum()),
+                float(time_spent[timed].sum()), int(timed.sum()),
+            ))
+
+        # 4) Topic/concept rows, straight from the parser's per-tag summary
+        tags = summary_dict.get("tag_summary_df")
+        if tags is None:
+            tags = summarize_tags(df_questions, summary_dict["question_tags_df"])
+        tag_rows = [
+            (t, title, int(n), int(c))
+            for t, title, n, c in zip(tags["tag_type"], tags["title"], tags["attempts"], tags["correct"])
+        ]
+
+        # 5) One transaction: the test row plus incremental aggregate updates
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO tests (submission_id, student, test_time, num_questions, correct, "
+                    "time_sum, time_count, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (submission_id, student, test_time, len(accuracy), int(accuracy.sum()),
+                     float(time_spent[has_time].sum()), int(has_time.sum()), now),
+                )
+                conn.executemany(
+                    "INSERT INTO test_chapters (submission_id, student, test_time, chapter, "
+                    "num_questions, correct) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(submission_id, student, test_time, ch, n, c) for ch, n, c, _, _ in chapter_rows],
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO chapter_stats (student, chapter, tests, num_questions, correct,
+                                               time_sum, time_count, last_seen)
+                    VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+                    ON CONFLICT (student, chapter) DO UPDATE SET
+                        tests         = tests + 1,
+                        num_questions = num_questions + excluded.num_questions,
+                        correct       = correct + excluded.correct,
+                        time_sum      = time_sum + excluded.time_sum,
+                        time_count    = time_count + excluded.time_count,
+                        last_seen     = MAX(last_seen, excluded.last_seen)
+                    """,
+                    [(student, ch, n, c, ts, tc, test_time) for ch, n, c, ts, tc in chapter_rows],
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO tag_stats (student, tag_type, title, num_questions, correct, last_seen)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (student, tag_type, title) DO UPDATE SET
+                        num_questions = num_questions + excluded.num_questions,
+                        correct       = correct + excluded.correct,
+                        last_seen     = MAX(last_seen, excluded.last_seen)
+                    """,
+                    [(student, t, title, n, c, test_time) for t, title, n, c in tag_rows],
+                )
+        except sqlite3.IntegrityError:
+            # Another process ingested the same submission first; its rows stand
+            return False
+        return True
+
+    def ingest_sources(self, source, student: str = None, students: dict = None) -> dict:
+        """
+        Ingest every submission found in `source` (directory, glob, file or list),
+        filed under `student`, or under students[submission_id] (see load_student_map)
+        for a cohort. Returns {"files", "ingested", "skipped", "seconds"}.
+        """
+        start = time.perf_counter()
+        paths = expand_sources(source)
+        counts = {"files": len(paths), "ingested": 0, "skipped": 0}
+        students = students or {}
+        for path in paths:
+            for sub_id, df_questions, summary in iter_file_submissions(path):
+                if self.ingest(sub_id, df_questions, summary, student=student or students.get(sub_id)):
+                    counts["ingested"] += 1
+                else:
+                    counts["skipped"] += 1
+        counts["seconds"] = round(time.perf_counter() - start, 3)
+        return counts
+
+    # ─── Queries ──────────────────────────────────────────────────────────────────
+
+    def _query(self, sql: str, params=()) -> pd.DataFrame:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+
+    def students(self) -> list:
+        return list(self._query("SELECT DISTINCT student FROM tests ORDER BY student")["student"])
+
+    def accuracy_over_time(self, student: str, last_n: int = None) -> pd.DataFrame:
+        """
+        One row per test, oldest first:
+          ['submission_id', 'test_time', 'num_questions', 'accuracy', 'avg_time_spent']
+        `last_n` keeps only the most recent tests. avg_time_spent is over the
+        questions with a recorded time, as in parse_json_to_df (tests stored before
+        time_count was kept fall back to all questions).
+        """
+        df = self._query(
+            """
+            SELECT submission_id, test_time, num_questions,
+                   ROUND(100.0 * correct / MAX(num_questions, 1), 1)                  AS accuracy,
+                   ROUND(time_sum / MAX(COALESCE(time_count, num_questions), 1), 1) AS avg_time_spent
+            FROM tests WHERE student = ?
+            ORDER BY test_time DESC LIMIT ?
+            """,
+            (student, -1 if last_n is None else int(last_n)),
+        )
+        df = df.iloc[::-1].reset_index(drop=True)
+        df["test_time"] = _from_epoch(df["test_time"])
+        return df
+
+    def chapter_summary(self, student: str) -> pd.DataFrame:
+        """
+        Lifetime per-chapter totals, weakest first:
+          ['chapter', 'tests', 'num_questions', 'accuracy', 'avg_time_spent', 'last_seen']
+        """
+        df = self._query(
+            """
+            SELECT chapter, tests, num_questions,
+                   ROUND(100.0 * correct / num_questions, 1)            AS accuracy,
+                   ROUND(time_sum / MAX(time_count, 1), 1)              AS avg_time_spent,
+                   last_seen
+            FROM chapter_stats WHERE student = ?
+            ORDER BY accuracy ASC, num_questions DESC
+            """,
+            (student,),
+        )
+        df["last_seen"] = _from_epoch(df["last_seen"])
+        return df
+
+    def chapter_trend(self, student: str, chapter: str = None) -> pd.DataFrame:
+        """
+        Per-test accuracy for each chapter (or just `chapter`), oldest first:
+          ['test_time', 'submission_id', 'chapter', 'num_questions', 'accuracy']
+        """
+        sql = (
+            "SELECT test_time, submission_id, chapter, num_questions, "
+            "ROUND(100.0 * correct / num_questions, 1) AS accuracy "
+            "FROM test_chapters WHERE student = ?"
+        )
+        params = [student]
+        if chapter is not None:
+            sql += " AND chapter = ?"
+            params.append(chapter)
+        df = self._query(sql + " ORDER BY chapter, test_time", params)
+        df["test_time"] = _from_epoch(df["test_time"])
+        return df
+
+    def tag_summary(self, student: str, tag_type: str = None, min_questions: int = 1) -> pd.DataFrame:
+        """
+        Lifetime per-topic/concept totals, weakest first:
+          ['tag_type', 'title', 'num_questions', 'accuracy', 'last_seen']
+        """
+        sql = (
+            "SELECT tag_type, title, num_questions, "
+            "ROUND(100.0 * correct / num_questions, 1) AS accuracy, last_seen "
+            "FROM tag_stats WHERE student = ? AND num_questions >= ?"
+        )
+        params = [student, min_questions]
+        if tag_type is not None:
+            if tag_type not in ("topic", "concept"):
+                raise ValueError(f"tag_type must be 'topic' or 'concept', not {tag_type!r}")
+            sql += " AND tag_type = ?"
+            params.append(tag_type)
+        df = self._query(sql + " ORDER BY accuracy ASC, num_questions DESC", params)
+        df["last_seen"] = _from_epoch(df["last_seen"])
+        return df
+
+    def load_questions(self, student: str) -> pd.DataFrame:
+        """
+        Every stored question row for `student`, oldest test first (reads Parquet).
+        """
+        student_dir = self._student_dir(student)
+        files = sorted(
+            os.path.join(student_dir, f) for f in os.listdir(student_dir) if f.endswith(".parquet")
+        ) if os.path.isdir(student_dir) else []
+        if not files:
+            return pd.DataFrame(columns=[
+                "submission_id", "test_time", "question_no", "chapter",
+                "difficulty", "accuracy", "time_spent",
+            ])
+        df = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+        for col in ("submission_id", "chapter", "difficulty"):
+            df[col] = df[col].astype("category")
+        return df.sort_values(["test_time", "question_no"], ignore_index=True)
+
+
+def load_student_map(path: str) -> dict:
+    """
+    {submission_id: student} from a JSON object file, for submissions that do not
+    say who took them.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        students = json.load(f)
+    if not isinstance(students, dict):
+        raise ValueError(f"{path} must hold a JSON object mapping submission ids to students.")
+    return {str(k): str(v) for k, v in students.items()}
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_analytics_store() -> AnalyticsStore:
+    """
+    Process-wide AnalyticsStore rooted at DEFAULT_STORE_DIR.
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = AnalyticsStore()
+        return _default_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.analytics_store",
+        description="Ingest submissions into the longitudinal analytics store.",
+    )
+    parser.add_argument("source", nargs="+", help="directory, glob pattern or JSON file(s)")
+    parser.add_argument("--root", default=DEFAULT_STORE_DIR, help="store directory")
+    parser.add_argument("--student", default=None,
+                        help="file every submission under this student (default: its student_name)")
+    parser.add_argument("--students", default=None, metavar="FILE",
+                        help="JSON object mapping each submission id to its student")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(message)s")
+    students = load_student_map(args.students) if args.students else None
+    try:
+        counts = AnalyticsStore(args.root).ingest_sources(args.source, student=args.student, students=students)
+    except ValueError as e:
+        logger.error("%s", e)
+        return 1
+    logger.info(
+        "%d files: %d submissions ingested, %d already present (%.1fs)",
+        counts["files"], counts["ingested"], counts["skipped"], counts["seconds"],
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
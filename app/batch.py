@@ -0,0 +1,458 @@
+# app/batch.py
+#
+# Headless bulk report generation:
+#
+#   python -m app.batch data/mock_test_1/ --out reports/
+#
+# Every submission goes through parse → chart render → feedback → PDF → disk.
+# Feedback is rule-based by default (no API cost); --feedback-engine llm asks the LLM.
+# Each stage has its own worker pool, so CPU-bound parsing/rendering/PDF work in
+# worker processes overlaps with I/O-bound LLM calls on threads. Charts and feedback
+# only depend on the parsed data, so those two stages run side by side.
+# Students whose PDF already exists in --out are skipped, so a killed run can be resumed.
+
+import argparse
+import logging
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from app.warm_worker import process_context
+
+logger = logging.getLogger("app.batch")
+
+STAGES = ("parse", "charts", "feedback", "pdf")
+
+# Most submissions one parse task returns (fewer when fewer slots are free)
+PARSE_CHUNK_SIZE = 16
+
+
+def _safe_filename(submission_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", submission_id)
+
+
+# ─── Stage functions (top-level so worker processes can run them) ─────────────────
+
+def _timed(fn, *args):
+    """
+    Run fn(*args) and return (service_seconds, result).
+    """
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+_analytics_store = None
+_student_map = (None, {})      # (mapping file, {submission_id: student}) in this worker
+
+# Per worker process: file → (position, generator) of the chunk after the last one
+# this worker parsed, so a worker given the next chunk continues where it stopped
+# instead of reading the file again from the start.
+_parse_cursors = {}
+MAX_PARSE_CURSORS = 4
+
+
+def _parse_stage(
+    path: str, start: int, count: int, analytics_root: str = None, cohort_path: str = None, students_path: str = None,
+) -> tuple:
+    """
+    Parse submissions start … start+count-1 of one file. Returns (results, more),
+    `more` being False once the file is exhausted. With `analytics_root`, every
+    submission is also ingested into the longitudinal AnalyticsStore there
+    (already-stored ones are skipped), filed under its student from the
+    `students_path` mapping (see load_student_map) or its own student_name; one
+    with neither is left out of the store with a warning. With `cohort_path`,
+    summaries get cohort percentiles from that CohortBenchmark.
+    """
+    global _analytics_store, _student_map
+    from itertools import islice
+
+    from app.data_processor import iter_file_submissions
+
+    position, submissions = _parse_cursors.pop(path, (None, None))
+    if position != start:
+        submissions = iter_file_submissions(path, skip=start)
+    results = list(islice(submissions, count))
+    more = len(results) == count
+    if more:
+        _parse_cursors[path] = (start + count, submissions)
+        while len(_parse_cursors) > MAX_PARSE_CURSORS:
+            _parse_cursors.pop(next(iter(_parse_cursors)))
+
+    if cohort_path:
+        from app.cohort_stats import load_cohort_benchmark
+
+        cohort = load_cohort_benchmark(cohort_path)
+        if cohort is None:
+            raise FileNotFoundError(f"No usable cohort benchmark at {cohort_path!r}.")
+        results = [(sub_id, dfq, cohort.with_percentiles(summary)) for sub_id, dfq, summary in results]
+    if analytics_root:
+        from app.analytics_store import AnalyticsStore, load_student_map
+
+        if _analytics_store is None or _analytics_store.root != analytics_root:
+            _analytics_store = AnalyticsStore(analytics_root)
+        if students_path and _student_map[0] != students_path:
+            _student_map = (students_path, load_student_map(students_path))
+        students = _student_map[1] if students_path else {}
+        for sub_id, df_questions, summary_dict in results:
+            try:
+                _analytics_store.ingest(sub_id, df_questions, summary_dict, student=students.get(sub_id))
+            except ValueError as e:
+                logger.warning("Not ingested into analytics: %s", e)
+    return results, more
+
+
+_chart_renderer = None
+
+
+def _chart_stage(df_questions, summary_dict) -> list:
+    """
+    Render the three report charts and return them as ChartImages (figures are not
+    picklable, PNG bytes are). Each worker process keeps one ChartRenderer, so the
+    template figures are built once per process rather than once per student.
+    """
+    global _chart_renderer
+    from app.charts import ChartRenderer
+
+    if _chart_renderer is None:
+        _chart_renderer = ChartRenderer()
+    return _chart_renderer.render_all(df_questions, summary_dict)
+
+
+def _feedback_stage(summary_dict, engine: str = "rules") -> dict:
+    from app.feedback_generator import generate_feedback
+    return generate_feedback(summary_dict, engine=engine)
+
+
+def _feedback_batch_stage(summary_dicts: list) -> list:
+    """
+    Feedback for several students from one multi-student request; a student that
+    still fails after the per-student retry gets rule-based feedback instead.
+    """
+    from app.feedback_generator import generate_feedback_batch, rule_fallback
+
+    results = generate_feedback_batch(summary_dicts, batch_size=len(summary_dicts), return_exceptions=True)
+    return [
+        rule_fallback(summary, f"{type(feedback).__name__}: {feedback}") if isinstance(feedback, Exception) else feedback
+        for summary, feedback in zip(summary_dicts, results)
+    ]
+
+
+def _pdf_stage(out_path: str, student_name: str, feedback: dict, charts: list) -> int:
+    """
+    Build the PDF and write it atomically, so a crash never leaves a truncated
+    file that a resumed run would mistake for a finished report.
+    """
+    from app.pdf_generator import create_pdf_report
+
+    pdf_bytes = create_pdf_report(student_name=student_name, feedback=feedback, chart_figs=charts)
+    tmp_path = f"{out_path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(tmp_path, out_path)
+    return len(pdf_bytes)
+
+
+# ─── Stats ────────────────────────────────────────────────────────────────────────
+
+class StageStats:
+    """
+    Per-stage counters: completed/failed tasks plus service and end-to-end latency
+    (end-to-end includes time spent queued behind other tasks).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.completed = 0
+        self.failed = 0
+        self.service = []
+        self.latency = []
+
+    def record(self, service_s: float, latency_s: float):
+        self.completed += 1
+        self.service.append(service_s)
+        self.latency.append(latency_s)
+
+    @staticmethod
+    def _pct(values: list, q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def as_dict(self, wall_s: float) -> dict:
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "per_sec": round(self.completed / wall_s, 2) if wall_s > 0 else None,
+            "service_p50_ms": round(self._pct(self.service, 0.50) * 1000, 1),
+            "service_p95_ms": round(self._pct(self.service, 0.95) * 1000, 1),
+            "latency_p50_ms": round(self._pct(self.latency, 0.50) * 1000, 1),
+            "latency_p95_ms": round(self._pct(self.latency, 0.95) * 1000, 1),
+        }
+
+
+# ─── Pipeline ─────────────────────────────────────────────────────────────────────
+
+def run_batch(
+    source,
+    out_dir: str,
+    parse_workers: int = None,
+    render_workers: int = None,
+    llm_workers: int = 8,
+    pdf_workers: int = None,
+    max_inflight: int = 64,
+    force: bool = False,
+    analytics_root: str = None,
+    cohort_path: str = None,
+    llm_batch: int = 1,
+    feedback_engine: str = "rules",
+    students_path: str = None,
+) -> dict:
+    """
+    Generate one PDF per submission found in `source` (directory, glob, file or list)
+    into `out_dir`. Returns run statistics, including per-stage throughput/latency.
+    At most `max_inflight` parsed submissions are held in memory at once: files are
+    parsed in chunks of at most the free slots, and a file's next chunk is parsed
+    only after its last one came back (so a cohort file is never parsed all at once).
+    With `analytics_root`, parsed submissions are also ingested into the analytics store,
+    each under its student from the `students_path` mapping file (exported tests do not
+    name their student; see load_student_map);
+    with `cohort_path`, reports include percentiles against that cohort benchmark.
+    Feedback comes from `feedback_engine`: "rules" (default; instant, no API cost) or
+    "llm" (falls back to the rules for a student whose LLM call fails or times out).
+    With "llm" and `llm_batch` > 1, feedback for up to that many students is requested at once
+    (see generate_feedback_batch); a partial group is sent as soon as parsing runs dry.
+    """
+    from app.data_processor import expand_sources
+
+    paths = expand_sources(source)
+    os.makedirs(out_dir, exist_ok=True)
+    cpus = os.cpu_count() or 1
+    ctx = process_context()   # workers fork from a preloaded forkserver
+
+    stats = {name: StageStats(name) for name in STAGES}
+    counts = {"submissions": 0, "written": 0, "skipped": 0, "failed": 0, "pdf_bytes": 0, "rule_fallbacks": 0}
+    if feedback_engine not in ("rules", "llm"):
+        raise ValueError(f"Unknown feedback engine: {feedback_engine!r}")
+    if feedback_engine == "rules":
+        llm_batch = 1
+    if analytics_root and students_path:
+        from app.analytics_store import load_student_map
+
+        load_student_map(students_path)   # a bad mapping file fails here, not in every worker
+
+    parse_workers = parse_workers or cpus
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=ctx)
+    render_pool = ProcessPoolExecutor(max_workers=render_workers or cpus, mp_context=ctx)
+    pdf_pool = ProcessPoolExecutor(max_workers=pdf_workers or cpus, mp_context=ctx)
+    llm_pool = ThreadPoolExecutor(max_workers=llm_workers)
+
+    pending = {}          # future → (stage, job, submitted_at)
+    feedback_queue = []   # (job, summary_dict) waiting for a multi-student request
+    parse_queue = deque((path, 0) for path in paths)   # (file, next submission to parse)
+    files_parsed = 0
+    jobs_in_flight = 0
+    start = time.perf_counter()
+    last_report = start
+
+    def submit(pool, stage, job, fn, *args):
+        future = pool.submit(_timed, fn, *args)
+        pending[future] = (stage, job, time.perf_counter())
+
+    def flush_feedback():
+        group = feedback_queue[:llm_batch]
+        del feedback_queue[:llm_batch]
+        submit(llm_pool, "feedback", {"group": [job for job, _ in group]}, _feedback_batch_stage,
+               [summary for _, summary in group])
+
+    def fail(job, stage, exc):
+        nonlocal jobs_in_flight
+        stats[stage].failed += 1
+        counts["failed"] += 1
+        label = job["id"] if job.get("id") else job.get("path")
+        logger.error("%s failed for %s: %s", stage, label, exc)
+        if job.get("id"):
+            job["dead"] = True
+            jobs_in_flight -= 1
+
+    try:
+        while parse_queue or pending or feedback_queue:
+            # Keep the parse stage fed, but only while there is room for more jobs. Each
+            # chunk reserves as many slots as it may return, spread over the parse workers.
+            while parse_queue and jobs_in_flight < max_inflight:
+                path, position = parse_queue.popleft()
+                count = max(1, min(PARSE_CHUNK_SIZE, (max_inflight - jobs_in_flight) // parse_workers))
+                submit(parse_pool, "parse", {"path": path, "position": position, "reserved": count},
+                       _parse_stage, path, position, count, analytics_root, cohort_path, students_path)
+                jobs_in_flight += count   # released once we know how many the chunk held
+
+            # Send full feedback groups; a partial one only once no parse can add to it
+            parsing = bool(parse_queue) or any(stage == "parse" for stage, _, _ in pending.values())
+            while len(feedback_queue) >= llm_batch or (feedback_queue and not parsing):
+                flush_feedback()
+
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            now = time.perf_counter()
+            for future in done:
+                stage, job, submitted_at = pending.pop(future)
+                try:
+                    service_s, result = future.result()
+                except Exception as e:
+                    if "group" in job:
+                        for member in job["group"]:
+                            if not member.get("dead"):
+                                fail(member, stage, e)
+                    elif stage == "parse":
+                        jobs_in_flight -= job["reserved"]
+                        files_parsed += 1
+                        fail(job, stage, e)
+                    elif not job.get("dead"):
+                        fail(job, stage, e)
+                    continue
+                stats[stage].record(service_s, now - submitted_at)
+
+                if stage == "parse":
+                    submissions, more = result
+                    jobs_in_flight -= job["reserved"]
+                    if more:
+                        parse_queue.appendleft((job["path"], job["position"] + len(submissions)))
+                    else:
+                        files_parsed += 1
+                    for sub_id, df_questions, summary_dict in submissions:
+                        counts["submissions"] += 1
+                        out_path = os.path.join(out_dir, _safe_filename(sub_id) + ".pdf")
+                        if not force and os.path.exists(out_path):
+                            counts["skipped"] += 1
+                            continue
+                        new_job = {
+                            "id": sub_id,
+                            "name": summary_dict.get("student_name", "Student"),
+                            "out": out_path,
+                            "charts": None,
+                            "feedback": None,
+                        }
+                        jobs_in_flight += 1
+                        submit(render_pool, "charts", new_job, _chart_stage, df_questions, summary_dict)
+                        if llm_batch > 1:
+                            feedback_queue.append((new_job, summary_dict))
+                        else:
+                            submit(llm_pool, "feedback", new_job, _feedback_stage, summary_dict, feedback_engine)
+
+                elif "group" in job:
+                    # Multi-student feedback: hand each student's result to their own job
+                    for member, feedback in zip(job["group"], result):
+                        if member.get("dead"):
+                            continue
+                        if isinstance(feedback, Exception):
+                            fail(member, stage, feedback)
+                            continue
+                        member["feedback"] = feedback
+                        counts["rule_fallbacks"] += "fallback_reason" in feedback.get("usage", {})
+                        if member["charts"] is not None:
+                            submit(pdf_pool, "pdf", member, _pdf_stage,
+                                   member["out"], member["name"], member["feedback"], member["charts"])
+
+                elif job.get("dead"):
+                    continue
+
+                elif stage in ("charts", "feedback"):
+                    job["charts" if stage == "charts" else "feedback"] = result
+                    if stage == "feedback":
+                        counts["rule_fallbacks"] += "fallback_reason" in result.get("usage", {})
+                    if job["charts"] is not None and job["feedback"] is not None:
+                        submit(pdf_pool, "pdf", job, _pdf_stage,
+                               job["out"], job["name"], job["feedback"], job["charts"])
+
+                elif stage == "pdf":
+                    counts["written"] += 1
+                    counts["pdf_bytes"] += result
+                    jobs_in_flight -= 1
+
+            if now - last_report >= 5:
+                last_report = now
+                logger.info(
+                    "progress: %d/%d files, %d written, %d skipped, %d failed, %d in flight",
+                    files_parsed, len(paths), counts["written"], counts["skipped"],
+                    counts["failed"], jobs_in_flight,
+                )
+    finally:
+        for pool in (parse_pool, render_pool, pdf_pool, llm_pool):
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    wall_s = time.perf_counter() - start
+    result = {
+        "files": len(paths),
+        **counts,
+        "seconds": round(wall_s, 3),
+        "reports_per_sec": round(counts["written"] / wall_s, 2) if wall_s > 0 else None,
+        "stages": {name: s.as_dict(wall_s) for name, s in stats.items()},
+    }
+    for name in STAGES:
+        s = result["stages"][name]
+        logger.info(
+            "%-8s %5d done %3d failed | %7.2f/s | service p50 %7.1f ms p95 %7.1f ms | "
+            "latency p50 %7.1f ms p95 %7.1f ms",
+            name, s["completed"], s["failed"], s["per_sec"] or 0.0,
+            s["service_p50_ms"], s["service_p95_ms"], s["latency_p50_ms"], s["latency_p95_ms"],
+        )
+    if counts["rule_fallbacks"]:
+        logger.warning("%d reports used rule-based feedback after an LLM failure", counts["rule_fallbacks"])
+    logger.info(
+        "%d submissions: %d written, %d skipped, %d failed in %.1fs (%.2f reports/s)",
+        counts["submissions"], counts["written"], counts["skipped"], counts["failed"],
+        wall_s, result["reports_per_sec"] or 0.0,
+    )
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.batch",
+        description="Generate PDF feedback reports for a whole batch of submissions.",
+    )
+    parser.add_argument("source", nargs="+", help="directory, glob pattern or JSON file(s)")
+    parser.add_argument("--out", required=True, help="directory to write <submission_id>.pdf into")
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--render-workers", type=int, default=None)
+    parser.add_argument("--llm-workers", type=int, default=8)
+    parser.add_argument("--pdf-workers", type=int, default=None)
+    parser.add_argument("--max-inflight", type=int, default=64,
+                        help="max parsed submissions held in memory at once")
+    parser.add_argument("--force", action="store_true", help="regenerate PDFs that already exist")
+    parser.add_argument("--analytics", default=None, metavar="DIR",
+                        help="also ingest every submission into the analytics store at DIR")
+    parser.add_argument("--students", default=None, metavar="FILE",
+                        help="with --analytics, JSON object mapping each submission id to its student")
+    parser.add_argument("--cohort", default=None, metavar="FILE",
+                        help="cohort benchmark (python -m app.cohort_stats) for percentile comparisons")
+    parser.add_argument("--feedback-engine", choices=("rules", "llm"), default="rules",
+                        help="rule-based feedback (default, no API calls) or LLM feedback with rule-based fallback")
+    parser.add_argument("--llm-batch", type=int, default=1, metavar="N",
+                        help="with --feedback-engine llm, request feedback for N students per LLM call (default 1)")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(message)s")
+    result = run_batch(
+        args.source,
+        args.out,
+        parse_workers=args.parse_workers,
+        render_workers=args.render_workers,
+        llm_workers=args.llm_workers,
+        pdf_workers=args.pdf_workers,
+        max_inflight=args.max_inflight,
+        force=args.force,
+        analytics_root=args.analytics,
+        cohort_path=args.cohort,
+        llm_batch=args.llm_batch,
+        feedback_engine=args.feedback_engine,
+        students_path=args.students,
+    )
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
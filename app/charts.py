@@ -1,100 +1,407 @@
-import matplotlib.pyplot as plt
+# app/charts.py
 
+import io
+import struct
+import zlib
+
+from app.metrics import span, timed
 
 PRIMARY_BLUE = "#0033A0"
 ACCENT_ORANGE = "#FF7F00"
 DARK_GRAY = "#333333"
 LIGHT_GRAY = "#F5F5F5"
 
+# Figures are built with the object-oriented API on an Agg canvas, never through
+# pyplot: pyplot keeps every figure alive in its global registry until plt.close(),
+# which is what made memory grow across Streamlit reruns and batch jobs. A plain
+# Figure is freed as soon as the caller drops it.
+#
+# matplotlib, numpy and pandas are imported on first use, so importing this module
+# (e.g. for ChartImage) costs nothing.
+
+def _new_figure(figsize=(6, 4)) -> "Figure":
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _style_axes(ax, xlabel: str, ylabel: str, title: str, grid_axis: str = "both"):
+    ax.set_facecolor(LIGHT_GRAY)
+    ax.grid(axis=grid_axis, color=DARK_GRAY, linestyle="--", linewidth=0.5, alpha=0.4)
+    ax.set_xlabel(xlabel, color=DARK_GRAY, fontsize=10)
+    ax.set_ylabel(ylabel, color=DARK_GRAY, fontsize=10)
+    ax.tick_params(colors=DARK_GRAY)
+    ax.set_title(title, color=PRIMARY_BLUE, fontsize=12, pad=8)
+
+
+_LINE_STYLE = dict(
+    color=PRIMARY_BLUE,
+    linewidth=2,
+    marker="o",
+    markerfacecolor=ACCENT_ORANGE,
+    markeredgecolor=PRIMARY_BLUE,
+    markersize=6,
+)
+_BAR_STYLE = dict(color=PRIMARY_BLUE, edgecolor=DARK_GRAY, height=0.6)
+
+
+@timed()
 def plot_accuracy_over_time(df_all):
     """
     df_all: DataFrame with columns ['timestamp', 'accuracy', ...]
     Returns a Matplotlib Figure object.
     """
-    fig, ax = plt.subplots(figsize=(6, 4))
-    
-    ax.plot(
-        df_all["timestamp"],
-        df_all["accuracy"],
-        color=PRIMARY_BLUE,
-        linewidth=2,
-        marker="o",
-        markerfacecolor=ACCENT_ORANGE,
-        markeredgecolor=PRIMARY_BLUE,
-        markersize=6,
-    )
-    ax.set_facecolor(LIGHT_GRAY)
-    ax.grid(color=DARK_GRAY, linestyle="--", linewidth=0.5, alpha=0.4)
-    
-    ax.set_xlabel("Timestamp", color=DARK_GRAY, fontsize=10)
-    ax.set_ylabel("Accuracy (%)", color=DARK_GRAY, fontsize=10)
-    ax.tick_params(colors=DARK_GRAY)
-    ax.set_title("Accuracy vs. Time", color=PRIMARY_BLUE, fontsize=12, pad=8)
-    
+    fig = _new_figure()
+    ax = fig.add_subplot()
+
+    ax.plot(df_all["timestamp"], df_all["accuracy"], **_LINE_STYLE)
+    _style_axes(ax, "Timestamp", "Accuracy (%)", "Accuracy vs. Time")
+
     # Rotate x-axis labels if datetime
     fig.autofmt_xdate(rotation=25)
-    
+
     return fig
 
+@timed()
 def plot_chapter_breakdown(chapter_summary_df):
     """
-    chapter_summary_df: DataFrame with columns ['chapter', 'accuracy', 'avg_time_spent', 'num_questions']
+    chapter_summary_df: DataFrame with columns ['chapter', 'accuracy', 'avg_time_spent', 'num_questions', 'correct']
     Returns a Matplotlib Figure object.
     """
-    fig, ax = plt.subplots(figsize=(6, 4))
-    
+    fig = _new_figure()
+    ax = fig.add_subplot()
+
     # Sort chapters by accuracy ascending so the lowest appear at bottom
     df_sorted = chapter_summary_df.sort_values("accuracy", ascending=True)
-    
-    ax.barh(
-        df_sorted["chapter"],
-        df_sorted["accuracy"],
-        color=PRIMARY_BLUE,
-        edgecolor=DARK_GRAY,
-        height=0.6
-    )
-    ax.set_facecolor(LIGHT_GRAY)
-    ax.grid(axis="x", color=DARK_GRAY, linestyle="--", linewidth=0.5, alpha=0.4)
-    
-    ax.set_xlabel("Average Accuracy (%)", color=DARK_GRAY, fontsize=10)
-    ax.set_ylabel("Chapter", color=DARK_GRAY, fontsize=10)
-    ax.tick_params(colors=DARK_GRAY)
-    ax.set_title("Chapter‐wise Performance", color=PRIMARY_BLUE, fontsize=12, pad=8)
-    
-    return fig
 
-    # app/charts.py
+    ax.barh(df_sorted["chapter"], df_sorted["accuracy"], **_BAR_STYLE)
+    _style_axes(ax, "Average Accuracy (%)", "Chapter", "Chapter‐wise Performance", grid_axis="x")
 
-import matplotlib.pyplot as plt
-
-# (existing color constants: PRIMARY_BLUE, ACCENT_ORANGE, DARK_GRAY, LIGHT_GRAY)
+    return fig
 
+@timed()
 def plot_subject_breakdown(subject_summary_df):
     """
     subject_summary_df: DataFrame with columns ['subject_id', 'accuracy', ...]
     Returns a Matplotlib figure of subject vs. accuracy.
     """
     if subject_summary_df.empty:
-        fig, ax = plt.subplots()
+        fig = _new_figure(figsize=None)
+        ax = fig.add_subplot()
         ax.text(0.5, 0.5, "No subject data", ha="center", va="center")
         return fig
 
     # Sort by accuracy
     df_sorted = subject_summary_df.sort_values("accuracy", ascending=True)
 
-    fig, ax = plt.subplots(figsize=(6, 4))
-    ax.barh(
-        df_sorted["subject_id"],
-        df_sorted["accuracy"],
-        color=PRIMARY_BLUE,
-        edgecolor=DARK_GRAY,
-        height=0.6
-    )
-    ax.set_facecolor(LIGHT_GRAY)
-    ax.grid(axis="x", color=DARK_GRAY, linestyle="--", linewidth=0.5, alpha=0.4)
-    ax.set_xlabel("Accuracy (%)", color=DARK_GRAY, fontsize=10)
-    ax.set_ylabel("Subject ID", color=DARK_GRAY, fontsize=10)
-    ax.tick_params(colors=DARK_GRAY)
-    ax.set_title("Subject‐wise Performance", color=PRIMARY_BLUE, fontsize=12, pad=8)
+    fig = _new_figure()
+    ax = fig.add_subplot()
+    ax.barh(df_sorted["subject_id"], df_sorted["accuracy"], **_BAR_STYLE)
+    _style_axes(ax, "Accuracy (%)", "Subject ID", "Subject‐wise Performance", grid_axis="x")
+
+    return fig
+
+@timed()
+def plot_concept_breakdown(tag_summary_df, k: int = 10):
+    """
+    tag_summary_df: DataFrame with columns ['tag_type', 'title', 'attempts', 'accuracy', ...]
+    Returns a Matplotlib figure of the k weakest concepts (lowest accuracy).
+    """
+    from app.concept_index import top_k_from_summary
+
+    top = top_k_from_summary(tag_summary_df, k=k, by="weakest")
+    fig = _new_figure()
+    ax = fig.add_subplot()
+    if top.empty:
+        ax.text(0.5, 0.5, "No concept data", ha="center", va="center")
+        return fig
 
+    # Weakest at the top
+    top = top.iloc[::-1]
+    ax.barh(_concept_labels(top), top["accuracy"], **_BAR_STYLE)
+    ax.set_xlim(0, 100)
+    _style_axes(ax, "Accuracy (%)", "Concept", "Weakest Concepts", grid_axis="x")
     return fig
+
+
+def _concept_labels(top) -> list:
+    # Long concept titles would squeeze the bars; cut them and show the attempt count
+    return [
+        f"{title if len(title) <= 32 else title[:31] + '…'} ({n})"
+        for title, n in zip(top["title"], top["attempts"])
+    ]
+
+@timed()
+def plot_percentile_breakdown(chapter_summary_df):
+    """
+    chapter_summary_df: DataFrame with columns ['chapter', 'accuracy_percentile', ...]
+    (see CohortBenchmark.with_percentiles). Returns a Matplotlib figure of where the
+    student stands in the cohort, chapter by chapter.
+    """
+    fig = _new_figure()
+    ax = fig.add_subplot()
+    df = chapter_summary_df.dropna(subset=["accuracy_percentile"]).sort_values("accuracy_percentile")
+    if df.empty:
+        ax.text(0.5, 0.5, "No cohort data", ha="center", va="center")
+        return fig
+
+    ax.barh(df["chapter"], df["accuracy_percentile"], **_BAR_STYLE)
+    ax.axvline(50, color=ACCENT_ORANGE, linestyle="--", linewidth=1.5)
+    ax.set_xlim(0, 100)
+    _style_axes(ax, "Accuracy percentile in cohort", "Chapter", "Chapter Percentiles vs. Cohort", grid_axis="x")
+    return fig
+
+
+# Resolution charts are rasterized at; shared by the browser view and the PDF
+CHART_DPI = 120
+
+
+# zlib level for chart PNGs: 6 is ~40% faster than Pillow's encoder at this size and
+# still smaller, since chart rows are long runs of identical pixels
+PNG_COMPRESS_LEVEL = 6
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def encode_png(rgba: bytes, width: int, height: int, level: int = PNG_COMPRESS_LEVEL) -> bytes:
+    """
+    8-bit RGB PNG from a raw RGBA buffer. Charts are opaque, so alpha is dropped
+    (any translucent pixel is first blended onto white). Rows are left unfiltered,
+    which on flat chart areas compresses about as well and encodes much faster.
+    """
+    import numpy as np
+
+    pixels = np.frombuffer(rgba, dtype=np.uint8).reshape(height, width, 4)
+    rgb = pixels[..., :3]
+    alpha = pixels[..., 3:]
+    if alpha.min() < 255:
+        rgb = (rgb * (alpha / 255.0) + 255.0 * (1.0 - alpha / 255.0)).round().astype(np.uint8)
+    rows = np.zeros((height, 1 + 3 * width), dtype=np.uint8)   # leading 0 = filter "None"
+    rows[:, 1:] = rgb.reshape(height, -1)
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+        _png_chunk(b"IDAT", zlib.compress(rows.tobytes(), level)),
+        _png_chunk(b"IEND", b""),
+    ))
+
+
+def _rasterize(fig, dpi: int, bbox) -> bytes:
+    """
+    PNG bytes of `fig` cropped to `bbox` (inches). Agg renders straight to raw
+    RGBA and encode_png writes the PNG, skipping Pillow's slower RGBA encoder.
+    """
+    buf = io.BytesIO()
+    fig.savefig(buf, format="rgba", dpi=dpi, bbox_inches=bbox)
+    raw = buf.getvalue()
+    # savefig sizes the canvas as int(bbox size in pixels)
+    width, height = int(bbox.width * dpi), int(bbox.height * dpi)
+    if width * height * 4 != len(raw):
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi, bbox_inches=bbox)
+        return buf.getvalue()
+    return encode_png(raw, width, height)
+
+
+def figure_to_png(fig, dpi: int = CHART_DPI) -> bytes:
+    """
+    Rasterize a figure to PNG bytes (tight bounding box, as in the PDF report).
+    """
+    # The box savefig(bbox_inches="tight") would use (default 0.1 in padding)
+    with span("figure_to_png") as s:
+        bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(0.1)
+        png = _rasterize(fig, dpi, bbox)
+        s.add("bytes", len(png))
+    return png
+
+
+class ChartImage:
+    """
+    A chart rendered exactly once: PNG bytes plus pixel size and DPI.
+    The same object is handed to st.image and to create_pdf_report, so a chart is
+    never rasterized twice.
+    """
+
+    __slots__ = ("png", "width", "height", "dpi")
+
+    def __init__(self, png: bytes, dpi: int = CHART_DPI):
+        if png[:8] != b"\x89PNG\r\n\x1a\n":
+            raise ValueError("ChartImage expects PNG bytes.")
+        self.png = png
+        # Pixel size straight from the IHDR chunk, no image decode needed
+        self.width = int.from_bytes(png[16:20], "big")
+        self.height = int.from_bytes(png[20:24], "big")
+        self.dpi = dpi
+
+    @classmethod
+    def from_figure(cls, fig, dpi: int = CHART_DPI) -> "ChartImage":
+        return cls(figure_to_png(fig, dpi=dpi), dpi=dpi)
+
+    def __repr__(self):
+        return f"ChartImage({self.width}x{self.height}px, {self.dpi} dpi, {len(self.png)} bytes)"
+
+
+# ─── Template renderer ─────────────────────────────────────────────────────────────
+
+class ChartRenderer:
+    """
+    Fast path for rendering many charts in one process (batch jobs, benchmarks).
+
+    One template figure per chart type is built once; each render only swaps the
+    data on the existing artists (line data, bar widths, tick labels) and returns a
+    ChartImage, so axes, styling and fonts are never rebuilt. Memory stays flat no matter
+    how many charts are rendered. Call close() (or use it as a context manager) to
+    release the figures deterministically.
+    """
+
+    def __init__(self, dpi: int = CHART_DPI):
+        self.dpi = dpi
+        self._templates = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for template in self._templates.values():
+            template["fig"].clear()
+        self._templates.clear()
+
+    @staticmethod
+    def _layout_key(fig) -> tuple:
+        """
+        Every piece of text that can change the tight box: the x and y tick labels
+        (as the formatters will render them for the current limits) and all other
+        visible text. Formatting ticks is cheap next to drawing the figure.
+        """
+        key = []
+        for ax in fig.axes:
+            for axis in (ax.xaxis, ax.yaxis):
+                formatter = axis.get_major_formatter()
+                key.append(tuple(formatter.format_ticks(axis.get_majorticklocs())))
+            key.append(tuple(text.get_text() for text in ax.texts))
+            key.append((ax.get_title(), ax.get_xlabel(), ax.get_ylabel()))
+        return tuple(key)
+
+    def _to_image(self, t: dict) -> ChartImage:
+        """
+        savefig(bbox_inches="tight") draws the figure twice (once just to measure it).
+        The tight box only changes when the text around the axes does, so measure it
+        once per layout key (see _layout_key) and pass the cached box on later renders.
+        """
+        fig = t["fig"]
+        layout_key = self._layout_key(fig)
+        if t.get("bbox") is None or t.get("layout_key") != layout_key:
+            t["bbox"] = fig.get_tightbbox(fig.canvas.get_renderer()).padded(0.1)
+            t["layout_key"] = layout_key
+        return ChartImage(_rasterize(fig, self.dpi, t["bbox"]), dpi=self.dpi)
+
+    # ── accuracy over time ──
+
+    def render_accuracy_over_time(self, df_all) -> ChartImage:
+        t = self._templates.get("accuracy")
+        if t is None:
+            fig = _new_figure()
+            ax = fig.add_subplot()
+            (line,) = ax.plot(df_all["timestamp"], df_all["accuracy"], **_LINE_STYLE)
+            _style_axes(ax, "Timestamp", "Accuracy (%)", "Accuracy vs. Time")
+            # Unlike autofmt_xdate, this also applies to ticks created by later renders
+            ax.tick_params(axis="x", labelrotation=25)
+            t = self._templates["accuracy"] = {"fig": fig, "ax": ax, "line": line}
+        else:
+            t["line"].set_data(df_all["timestamp"], df_all["accuracy"])
+            t["ax"].relim()
+            t["ax"].autoscale_view()
+        return self._to_image(t)
+
+    # ── horizontal bar charts ──
+
+    def _barh_template(self, key: str, xlabel: str, ylabel: str, title: str) -> dict:
+        t = self._templates.get(key)
+        if t is None:
+            fig = _new_figure()
+            ax = fig.add_subplot()
+            _style_axes(ax, xlabel, ylabel, title, grid_axis="x")
+            empty_text = ax.text(0.5, 0.5, "", ha="center", va="center", transform=ax.transAxes)
+            t = self._templates[key] = {"fig": fig, "ax": ax, "bars": None, "empty": empty_text}
+        return t
+
+    def _render_barh(self, t: dict, labels: list, values: list, empty_message: str) -> ChartImage:
+        ax = t["ax"]
+        bars = t["bars"]
+        n = len(labels)
+
+        if bars is not None and len(bars) == n:
+            # Same number of bars: just change their widths
+            for rect, value in zip(bars, values):
+                rect.set_width(value)
+        else:
+            if bars is not None:
+                bars.remove()
+            # Numeric y positions + tick labels: a categorical axis would keep
+            # accumulating every label ever rendered
+            t["bars"] = ax.barh(range(n), values, **_BAR_STYLE) if n else None
+
+        ax.set_yticks(range(n), labels)
+        t["empty"].set_text("" if n else empty_message)
+        ax.relim()
+        ax.autoscale_view()
+        return self._to_image(t)
+
+    def render_chapter_breakdown(self, chapter_summary_df) -> ChartImage:
+        t = self._barh_template("chapter", "Average Accuracy (%)", "Chapter", "Chapter‐wise Performance")
+        df_sorted = chapter_summary_df.sort_values("accuracy", ascending=True)
+        return self._render_barh(
+            t, list(df_sorted["chapter"]), list(df_sorted["accuracy"]), "No chapter data"
+        )
+
+    def render_subject_breakdown(self, subject_summary_df) -> ChartImage:
+        t = self._barh_template("subject", "Accuracy (%)", "Subject ID", "Subject‐wise Performance")
+        if subject_summary_df.empty:
+            return self._render_barh(t, [], [], "No subject data")
+        df_sorted = subject_summary_df.sort_values("accuracy", ascending=True)
+        return self._render_barh(
+            t, list(df_sorted["subject_id"]), list(df_sorted["accuracy"]), "No subject data"
+        )
+
+    def render_concept_breakdown(self, tag_summary_df, k: int = 10) -> ChartImage:
+        from app.concept_index import top_k_from_summary
+
+        t = self._barh_template("concept", "Accuracy (%)", "Concept", "Weakest Concepts")
+        top = top_k_from_summary(tag_summary_df, k=k, by="weakest").iloc[::-1]
+        t["ax"].set_xlim(0, 100)
+        return self._render_barh(t, _concept_labels(top), list(top["accuracy"]), "No concept data")
+
+    def render_percentile_breakdown(self, chapter_summary_df) -> ChartImage:
+        t = self._barh_template(
+            "percentile", "Accuracy percentile in cohort", "Chapter", "Chapter Percentiles vs. Cohort"
+        )
+        if "median" not in t:
+            t["median"] = t["ax"].axvline(50, color=ACCENT_ORANGE, linestyle="--", linewidth=1.5)
+            t["ax"].set_xlim(0, 100)
+        df = chapter_summary_df.dropna(subset=["accuracy_percentile"]).sort_values("accuracy_percentile")
+        return self._render_barh(t, list(df["chapter"]), list(df["accuracy_percentile"]), "No cohort data")
+
+    def render_all(self, df_all, summary_dict: dict) -> list:
+        """
+        ChartImages for the report charts, in report order. The cohort percentile
+        chart is added when summary_dict carries percentiles (see app.cohort_stats).
+        """
+        with span("ChartRenderer.render_all") as s:
+            images = [
+                self.render_accuracy_over_time(df_all),
+                self.render_chapter_breakdown(summary_dict["chapter_summary_df"]),
+                self.render_subject_breakdown(summary_dict["subject_summary_df"]),
+                self.render_concept_breakdown(summary_dict["tag_summary_df"]),
+            ]
+            if "accuracy_percentile" in summary_dict["chapter_summary_df"]:
+                images.append(self.render_percentile_breakdown(summary_dict["chapter_summary_df"]))
+            s.add("bytes", sum(len(image.png) for image in images))
+        return images
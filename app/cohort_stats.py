@@ -0,0 +1,395 @@
+# app/cohort_stats.py
+#
+# Cohort distributions per chapter and per subject, so feedback can say "better than
+# 80% of students in Capacitance" instead of only "60% accuracy".
+#
+#   python -m app.cohort_stats data/mock_test_1/ --out .cache/cohort_benchmark.json
+#
+# Each (chapter|subject, metric) distribution is a KLL quantile sketch: memory stays
+# a few thousand floats per distribution no matter how many students are added, and
+# sketches from different workers/runs can be merged. freeze() turns every sketch
+# into a fixed-size quantile table, so a percentile lookup is a binary search over
+# PERCENTILE_GRID points — constant time per student, independent of cohort size.
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.data_processor import expand_sources, iter_file_submissions
+
+logger = logging.getLogger("app.cohort_stats")
+
+DEFAULT_BENCHMARK_PATH = os.environ.get(
+    "FEEDBACK_COHORT_PATH",
+    os.path.join(os.environ.get("FEEDBACK_CACHE_DIR", ".cache"), "cohort_benchmark.json"),
+)
+
+# Quantiles kept per distribution after freeze(): 0.0%, 0.1%, …, 100%
+PERCENTILE_GRID = 1001
+
+METRICS = ("accuracy", "time_per_question")
+
+# Version of the saved benchmark file; files of another version are rejected so stale
+# distributions are rebuilt (2: chapter accuracy in % rather than a 0–1 fraction)
+BENCHMARK_FORMAT = 2
+
+
+# ─── Quantile sketch ──────────────────────────────────────────────────────────────
+
+class KLLSketch:
+    """
+    KLL streaming quantile sketch (Karnin, Lang & Liberty).
+
+    Items live in levels; an item on level h stands for 2**h inputs. When a level
+    outgrows its capacity (k for the top level, shrinking by `c` per level below) it
+    is sorted and every other item, from a random offset, is promoted one level up.
+    Rank error is about 1.7/k of n with high probability; memory is O(k).
+    """
+
+    def __init__(self, k: int = 200, c: float = 2 / 3, seed: int = None):
+        if k < 8:
+            raise ValueError("KLLSketch needs k >= 8.")
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - 1 - h
+        return max(2, int(np.ceil(self.k * self.c ** depth)))
+
+    def update(self, values):
+        """
+        Add one value or an array of values (NaNs are ignored).
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        """
+        Fold another sketch into this one (e.g. one built in a worker process).
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate((self.levels[h], items))
+        self.n += other.n
+        self._compress()
+
+    def _compress(self):
+        compacted = True
+        while compacted:
+            compacted = False
+            for h in range(len(self.levels)):
+                items = self.levels[h]
+                if len(items) <= self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                keep = items[:len(items) % 2]   # an odd item out stays on this level
+                items = items[len(keep):]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[h + 1] = np.concatenate((self.levels[h + 1], promoted))
+                self.levels[h] = keep
+                compacted = True
+
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs) -> np.ndarray:
+        """
+        Approximate values at the quantiles `qs` (0..1).
+        """
+        values, cum = self._weighted()
+        if not len(values):
+            return np.full(len(np.atleast_1d(qs)), np.nan)
+        targets = np.clip(np.atleast_1d(qs), 0.0, 1.0) * cum[-1]
+        idx = np.minimum(np.searchsorted(cum, targets, side="left"), len(values) - 1)
+        return values[idx]
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "c": self.c, "n": self.n, "levels": [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(k=data["k"], c=data["c"])
+        sketch.n = data["n"]
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data["levels"]]
+        return sketch
+
+
+# ─── Cohort benchmark ─────────────────────────────────────────────────────────────
+
+class CohortBenchmark:
+    """
+    Per-chapter and per-subject distributions of accuracy and time per question for
+    one test's cohort.
+
+    Feed it parsed submissions (add_summary) or whole cohort frames (add_frames),
+    then look students up with with_percentiles(summary_dict), which returns a copy
+    of summary_dict whose chapter/subject frames carry two extra columns:
+
+      accuracy_percentile  % of the cohort with lower accuracy (ties count half)
+      speed_percentile     % of the cohort that was slower per question (ties count half)
+
+    Both are "higher is better", 0–100.
+    """
+
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.students = 0
+        self.sketches = {}      # (dimension, key, metric) → KLLSketch
+        self._tables = None     # same keys → sorted quantile table, built by freeze()
+        self._lock = threading.Lock()
+
+    def _sketch(self, dimension: str, key: str, metric: str) -> KLLSketch:
+        sketch = self.sketches.get((dimension, key, metric))
+        if sketch is None:
+            sketch = self.sketches[(dimension, key, metric)] = KLLSketch(self.k)
+        return sketch
+
+    # ─── Building ─────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _metric_columns(dimension: str, df: pd.DataFrame):
+        """
+        (key column, accuracy values, time-per-question values) for one summary frame.
+        """
+        if dimension == "chapter":
+            return "chapter", df["accuracy"], df["avg_time_spent"]
+        attempted = pd.to_numeric(df["total_attempted"], errors="coerce").replace(0, np.nan)
+        time_per_q = pd.to_numeric(df["total_time_spent"], errors="coerce") / attempted
+        return "subject_id", df["accuracy"], time_per_q
+
+    def add_frames(self, chapter_summary_df: pd.DataFrame, subject_summary_df: pd.DataFrame, students: int = 1):
+        """
+        Add the chapter/subject summaries of `students` submissions at once (for a
+        cohort: the concatenated frames from parse_submissions). Values are grouped
+        per chapter/subject and pushed into each sketch as one array.
+        """
+        with self._lock:
+            for dimension, df in (("chapter", chapter_summary_df), ("subject", subject_summary_df)):
+                if df is None or df.empty:
+                    continue
+                key_col, accuracy, time_per_q = self._metric_columns(dimension, df)
+                values = pd.DataFrame({
+                    "key": df[key_col].astype(str).to_numpy(),
+                    "accuracy": pd.to_numeric(accuracy, errors="coerce").to_numpy(dtype=np.float64),
+                    "time_per_question": pd.to_numeric(time_per_q, errors="coerce").to_numpy(dtype=np.float64),
+                })
+                for key, group in values.groupby("key", sort=False):
+                    for metric in METRICS:
+                        self._sketch(dimension, key, metric).update(group[metric].to_numpy())
+            self.students += students
+            self._tables = None
+
+    def add_summary(self, summary_dict: dict):
+        """
+        Add one parsed submission (summary_dict from parse_json_to_df).
+        """
+        self.add_frames(summary_dict.get("chapter_summary_df"), summary_dict.get("subject_summary_df"))
+
+    def merge(self, other: "CohortBenchmark"):
+        with self._lock:
+            for key, sketch in other.sketches.items():
+                self._sketch(*key).merge(sketch)
+            self.students += other.students
+            self._tables = None
+
+    def freeze(self):
+        """
+        Turn every sketch into a PERCENTILE_GRID-point quantile table. Called
+        automatically by the lookups; call it yourself after the last add.
+        """
+        grid = np.linspace(0.0, 1.0, PERCENTILE_GRID)
+        with self._lock:
+            self._tables = {key: sketch.quantiles(grid) for key, sketch in self.sketches.items() if sketch.n}
+        return self
+
+    # ─── Lookups ──────────────────────────────────────────────────────────────────
+
+    def percentile(self, dimension: str, key: str, metric: str, value) -> float:
+        """
+        Percent of the cohort below `value` for this chapter/subject metric (ties count
+        half), or NaN if the cohort has no data for it.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}, not {metric!r}")
+        if self._tables is None:
+            self.freeze()
+        table = self._tables.get((dimension, str(key), metric))
+        if table is None or value is None or np.isnan(value):
+            return float("nan")
+        below = np.searchsorted(table, value, side="left")
+        at_or_below = np.searchsorted(table, value, side="right")
+        return round(100.0 * (below + at_or_below) / 2 / len(table), 1)
+
+    def with_percentiles(self, summary_dict: dict) -> dict:
+        """
+        Shallow copy of summary_dict whose chapter_summary_df and subject_summary_df
+        have accuracy_percentile / speed_percentile columns. The input frames are not
+        modified (they may be shared through the parse cache).
+        """
+        result = dict(summary_dict)
+        for dimension, name in (("chapter", "chapter_summary_df"), ("subject", "subject_summary_df")):
+            df = summary_dict.get(name)
+            if df is None:
+                continue
+            key_col, accuracy, time_per_q = self._metric_columns(dimension, df)
+            df = df.copy()
+            df["accuracy_percentile"] = [
+                self.percentile(dimension, key, "accuracy", value)
+                for key, value in zip(df[key_col].astype(str), pd.to_numeric(accuracy, errors="coerce"))
+            ]
+            df["speed_percentile"] = [
+                round(100.0 - p, 1) if not np.isnan(p) else p
+                for p in (
+                    self.percentile(dimension, key, "time_per_question", value)
+                    for key, value in zip(df[key_col].astype(str), pd.to_numeric(time_per_q, errors="coerce"))
+                )
+            ]
+            result[name] = df
+        result["cohort_size"] = self.students
+        return result
+
+    # ─── Persistence ──────────────────────────────────────────────────────────────
+
+    def save(self, path: str):
+        """
+        Write the sketches as JSON (atomically).
+        """
+        data = {
+            "format": BENCHMARK_FORMAT,
+            "k": self.k,
+            "students": self.students,
+            "sketches": [
+                {"dimension": d, "key": key, "metric": m, "sketch": s.to_dict()}
+                for (d, key, m), s in self.sketches.items()
+            ],
+        }
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CohortBenchmark":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != BENCHMARK_FORMAT:
+            raise ValueError(
+                f"{path} was built by an older version; rebuild it with python -m app.cohort_stats."
+            )
+        bench = cls(k=data["k"])
+        bench.students = data["students"]
+        for entry in data["sketches"]:
+            bench.sketches[(entry["dimension"], entry["key"], entry["metric"])] = KLLSketch.from_dict(entry["sketch"])
+        return bench.freeze()
+
+
+def build_cohort_benchmark(source, k: int = 200, flush_rows: int = 50_000) -> CohortBenchmark:
+    """
+    Stream every submission in `source` (directory, glob, file or list) into a new
+    CohortBenchmark. Summary rows are buffered and pushed into the sketches
+    `flush_rows` at a time, so memory stays bounded by the buffer plus the sketches.
+    """
+    bench = CohortBenchmark(k=k)
+    chapters, subjects = [], []
+    buffered_rows = 0
+    buffered_students = 0
+
+    def flush():
+        nonlocal buffered_rows, buffered_students
+        if buffered_students:
+            bench.add_frames(
+                pd.concat(chapters, ignore_index=True) if chapters else None,
+                pd.concat(subjects, ignore_index=True) if subjects else None,
+                students=buffered_students,
+            )
+        chapters.clear()
+        subjects.clear()
+        buffered_rows = buffered_students = 0
+
+    for path in expand_sources(source):
+        for _, _, summary in iter_file_submissions(path):
+            chapters.append(summary["chapter_summary_df"])
+            subjects.append(summary["subject_summary_df"])
+            buffered_rows += len(summary["chapter_summary_df"]) + len(summary["subject_summary_df"])
+            buffered_students += 1
+            if buffered_rows >= flush_rows:
+                flush()
+    flush()
+    return bench.freeze()
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_cohort_benchmark(path: str = DEFAULT_BENCHMARK_PATH):
+    """
+    The CohortBenchmark saved at `path`, or None if there is none (or it was built by
+    an older version, which is logged once). Loaded once per process and reloaded
+    only when the file changes.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached is None or cached[0] != mtime:
+            try:
+                bench = CohortBenchmark.load(path)
+            except ValueError as e:
+                logger.warning("ignoring cohort benchmark: %s", e)
+                bench = None
+            cached = _loaded[path] = (mtime, bench)
+        return cached[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cohort_stats",
+        description="Build the per-chapter/per-subject cohort benchmark for one test.",
+    )
+    parser.add_argument("source", nargs="+", help="directory, glob pattern or JSON file(s)")
+    parser.add_argument("--out", default=DEFAULT_BENCHMARK_PATH, help="where to write the benchmark JSON")
+    parser.add_argument("--k", type=int, default=200, help="sketch size (accuracy ~1.7/k of rank)")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(message)s")
+    start = time.perf_counter()
+    bench = build_cohort_benchmark(args.source, k=args.k)
+    bench.save(args.out)
+    logger.info(
+        "%d students, %d distributions → %s (%.1fs)",
+        bench.students, len(bench.sketches), args.out, time.perf_counter() - start,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,214 @@
+# app/concept_index.py
+#
+# Inverted index from topic/concept → question attempts, with per-student and
+# cohort accuracy/time statistics precomputed once so "weakest / slowest concepts"
+# queries are a slice + partial sort instead of a scan over question rows.
+
+import numpy as np
+import pandas as pd
+
+TAG_TYPES = ("topic", "concept")
+
+_STATS_COLUMNS = ["tag_type", "title", "attempts", "correct", "accuracy", "avg_time_spent"]
+
+
+def _top_k(primary: np.ndarray, secondary: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k smallest `primary` values, ties broken by the smallest
+    `secondary`. argpartition preselects the k smallest without a full sort; every
+    row tied with the k-th value is kept so the tie-break stays exact.
+    """
+    n = len(primary)
+    if n > k > 0:
+        kth = primary[np.argpartition(primary, k - 1)[k - 1]]
+        candidates = np.flatnonzero(primary <= kth)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((secondary[candidates], primary[candidates]))
+    return candidates[order[:k]]
+
+
+class ConceptIndex:
+    """
+    Topic/concept index over one or many submissions.
+
+    Built from a question table and its question_tags_df (parse_json_to_df for one
+    student, parse_submissions for a cohort):
+
+      - postings(): the inverted index, tag → row positions in df_questions
+      - stats():    attempts / correct / accuracy (%) / avg_time_spent per tag,
+                    for one student or the whole cohort
+      - weakest() / slowest(): top-k tags by lowest accuracy / highest avg time
+
+    Everything is aggregated with np.bincount on integer codes when the index is
+    built; per-student rows are stored sorted by student, so a student's stats are
+    a contiguous slice.
+    """
+
+    def __init__(self, df_questions: pd.DataFrame, question_tags_df: pd.DataFrame, student_col: str = None):
+        q_idx = question_tags_df["question_idx"].to_numpy(dtype=np.int64)
+
+        # 1) One integer id per (tag_type, title) that actually occurs
+        type_codes = pd.Categorical(question_tags_df["tag_type"], categories=TAG_TYPES).codes.astype(np.int64)
+        titles = pd.Categorical(question_tags_df["title"])
+        key = titles.codes.astype(np.int64) * len(TAG_TYPES) + type_codes
+        tag_keys, tag_id = np.unique(key, return_inverse=True)
+        tag_id = tag_id.reshape(-1)
+        n_tags = len(tag_keys)
+        self.tag_types = np.asarray(TAG_TYPES, dtype=object)[tag_keys % len(TAG_TYPES)]
+        self.titles = np.asarray(titles.categories, dtype=object)[tag_keys // len(TAG_TYPES)]
+        self._tag_lookup = {(t, title): i for i, (t, title) in enumerate(zip(self.tag_types, self.titles))}
+
+        # 2) Inverted index: question positions grouped by tag (CSR layout)
+        order = np.argsort(tag_id, kind="stable")
+        self._postings = q_idx[order]
+        self._posting_offsets = np.concatenate(([0], np.cumsum(np.bincount(tag_id, minlength=n_tags))))
+
+        # 3) Per-attempt values, looked up once through question_idx
+        correct = df_questions["accuracy"].to_numpy(dtype=np.float64)[q_idx]
+        time_spent = df_questions["time_spent"].to_numpy(dtype=np.float64)[q_idx]
+        has_time = ~np.isnan(time_spent)
+        time_spent = np.where(has_time, time_spent, 0.0)
+
+        # 4) Cohort totals per tag
+        self._cohort = self._aggregate(tag_id, n_tags, correct, time_spent, has_time)
+
+        # 5) Per-(student, tag) totals, sorted by student then tag
+        if student_col is not None:
+            students = pd.Categorical(df_questions[student_col])
+            self.students = list(students.categories)
+            student_of = students.codes.astype(np.int64)[q_idx]
+        else:
+            self.students = []
+            student_of = np.zeros(len(q_idx), dtype=np.int64)
+        self._student_lookup = {s: i for i, s in enumerate(self.students)}
+
+        pair_keys, pair_id = np.unique(student_of * n_tags + tag_id, return_inverse=True)
+        pair_id = pair_id.reshape(-1)
+        self._pair_tag = pair_keys % n_tags if n_tags else pair_keys
+        pair_student = pair_keys // n_tags if n_tags else pair_keys
+        self._pairs = self._aggregate(pair_id, len(pair_keys), correct, time_spent, has_time)
+        self._student_offsets = np.searchsorted(pair_student, np.arange(max(len(self.students), 1) + 1))
+
+    @staticmethod
+    def _aggregate(ids, n, correct, time_spent, has_time) -> dict:
+        return {
+            "attempts": np.bincount(ids, minlength=n),
+            "correct": np.bincount(ids, weights=correct, minlength=n),
+            "time_sum": np.bincount(ids, weights=time_spent, minlength=n),
+            "time_count": np.bincount(ids, weights=has_time, minlength=n),
+        }
+
+    def __len__(self):
+        return len(self.titles)
+
+    # ─── Lookups ──────────────────────────────────────────────────────────────────
+
+    def postings(self, tag_type: str, title: str) -> np.ndarray:
+        """
+        Row positions in df_questions of every attempt tagged (tag_type, title).
+        """
+        i = self._tag_lookup.get((tag_type, title))
+        if i is None:
+            return np.empty(0, dtype=np.int64)
+        return self._postings[self._posting_offsets[i]:self._posting_offsets[i + 1]]
+
+    def _select(self, student):
+        """
+        (tag positions, aggregate arrays) for the cohort (student=None) or one student.
+        """
+        if student is None:
+            return np.arange(len(self.titles)), self._cohort
+        if student not in self._student_lookup:
+            raise ValueError(f"Unknown student {student!r}.")
+        s = self._student_lookup[student]
+        lo, hi = self._student_offsets[s], self._student_offsets[s + 1]
+        return self._pair_tag[lo:hi], {name: values[lo:hi] for name, values in self._pairs.items()}
+
+    def _frame(self, tags: np.ndarray, agg: dict, rows: np.ndarray) -> pd.DataFrame:
+        attempts = agg["attempts"][rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            accuracy = 100.0 * agg["correct"][rows] / attempts
+            avg_time = agg["time_sum"][rows] / agg["time_count"][rows]
+        return pd.DataFrame({
+            "tag_type": self.tag_types[tags[rows]],
+            "title": self.titles[tags[rows]],
+            "attempts": attempts,
+            "correct": agg["correct"][rows].astype(np.int64),
+            "accuracy": accuracy.round(1),
+            "avg_time_spent": avg_time.round(1),
+        }, columns=_STATS_COLUMNS)
+
+    def _candidates(self, tags, agg, tag_type, min_attempts) -> np.ndarray:
+        if tag_type is not None and tag_type not in TAG_TYPES:
+            raise ValueError(f"tag_type must be one of {TAG_TYPES}, not {tag_type!r}")
+        mask = agg["attempts"] >= min_attempts
+        if tag_type is not None:
+            mask &= self.tag_types[tags] == tag_type
+        return np.flatnonzero(mask)
+
+    # ─── Queries ──────────────────────────────────────────────────────────────────
+
+    def stats(self, student=None, tag_type: str = None) -> pd.DataFrame:
+        """
+        Every tag's stats for `student` (or the cohort when None), in tag order.
+        """
+        tags, agg = self._select(student)
+        return self._frame(tags, agg, self._candidates(tags, agg, tag_type, 1))
+
+    def weakest(self, k: int = 5, student=None, tag_type: str = "concept", min_attempts: int = 2) -> pd.DataFrame:
+        """
+        The k tags with the lowest accuracy (most attempts first among ties).
+        Tags seen fewer than `min_attempts` times are ignored as too noisy.
+        """
+        tags, agg = self._select(student)
+        rows = self._candidates(tags, agg, tag_type, min_attempts)
+        accuracy = agg["correct"][rows] / agg["attempts"][rows]
+        top = _top_k(accuracy, -agg["attempts"][rows], k)
+        return self._frame(tags, agg, rows[top])
+
+    def slowest(self, k: int = 5, student=None, tag_type: str = "concept", min_attempts: int = 2) -> pd.DataFrame:
+        """
+        The k tags with the highest average time per attempt (most attempts first among ties).
+        """
+        tags, agg = self._select(student)
+        rows = self._candidates(tags, agg, tag_type, min_attempts)
+        rows = rows[agg["time_count"][rows] > 0]
+        avg_time = agg["time_sum"][rows] / agg["time_count"][rows]
+        top = _top_k(-avg_time, -agg["attempts"][rows], k)
+        return self._frame(tags, agg, rows[top])
+
+
+def summarize_tags(df_questions: pd.DataFrame, question_tags_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-topic/concept stats for a single submission (the tag-level counterpart of
+    chapter_summary_df): ['tag_type', 'title', 'attempts', 'correct', 'accuracy', 'avg_time_spent'].
+    """
+    if len(question_tags_df) == 0:
+        return pd.DataFrame(columns=_STATS_COLUMNS)
+    return ConceptIndex(df_questions, question_tags_df).stats()
+
+
+def top_k_from_summary(tag_summary_df: pd.DataFrame, k: int = 5, by: str = "weakest",
+                       tag_type: str = "concept", min_attempts: int = 2) -> pd.DataFrame:
+    """
+    Top-k rows of an already computed tag summary (summary_dict["tag_summary_df"]),
+    so callers holding only the summary never need the question rows again.
+    `by` is "weakest" (lowest accuracy) or "slowest" (highest avg time).
+    """
+    if by not in ("weakest", "slowest"):
+        raise ValueError(f"by must be 'weakest' or 'slowest', not {by!r}")
+    df = tag_summary_df
+    if len(df) == 0:
+        return df
+    mask = df["attempts"].to_numpy() >= min_attempts
+    if tag_type is not None:
+        mask &= df["tag_type"].to_numpy() == tag_type
+    df = df[mask]
+    if by == "slowest":
+        df = df[df["avg_time_spent"].notna()]
+        primary = -df["avg_time_spent"].to_numpy(dtype=np.float64)
+    else:
+        primary = df["accuracy"].to_numpy(dtype=np.float64)
+    top = _top_k(primary, -df["attempts"].to_numpy(dtype=np.float64), k)
+    return df.iloc[top].reset_index(drop=True)
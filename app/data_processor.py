@@ -1,168 +1,585 @@
-# app/data_processor.py
-
-import json
-import pandas as pd
-from datetime import datetime
-
-def parse_json_to_df(raw_bytes: bytes):
-    """
-    Adapted to handle the sample JSON structure you provided (a list with one dict).
-    This function returns:
-      - df_questions: a pandas DataFrame with one row per question attempt, containing:
-          ['timestamp', 'chapter', 'subject', 'accuracy', 'time_spent', 'difficulty', 'concepts']
-      - summary_dict: {
-            "student_name": str,                   # default "Student"
-            "subject_summary_df": DataFrame,       # per-subject metrics
-            "chapter_summary_df": DataFrame,       # per-chapter metrics
-            "raw_json": Python dict                # the full parsed JSON dict
-        }
-    """
-
-    parsed = json.loads(raw_bytes.decode("utf-8"))
-
-    # 1) If parsed is a list (as in your sample), extract the first element
-    if isinstance(parsed, list) and len(parsed) > 0:
-        parsed = parsed[0]
-    elif isinstance(parsed, list) and len(parsed) == 0:
-        raise ValueError("Uploaded JSON list is empty.")
-
-    # At this point, parsed should be a dict with keys: "test", "subjects", "sections", etc.
-    raw_json = parsed.copy()
-    student_name = parsed.get("student_name", "Student")
-
-    # 2) Build subject-level summary DataFrame (if "subjects" key exists)
-    subject_summary_df = pd.DataFrame()
-    if "subjects" in parsed and isinstance(parsed["subjects"], list):
-        subjects_list = parsed["subjects"]
-        # For each subject entry, we expect keys: totalTimeTaken, totalMarkScored, totalAttempted, totalCorrect, accuracy
-        # We also need some identifier for subject name: in your sample, each subject has a subjectId, but no "name" field.
-        # If you have a separate mapping from subjectId to subject name, you could inject it here.
-        # For now, we’ll simply label them "Subject 1", "Subject 2", … or use subjectId["$oid"] as name.
-        records = []
-        for i, subj in enumerate(subjects_list, start=1):
-            subj_id = subj.get("subjectId", {}).get("$oid", f"subj_{i}")
-            accuracy = subj.get("accuracy", None)
-            total_time = subj.get("totalTimeTaken", None)
-            total_attempted = subj.get("totalAttempted", None)
-            total_correct = subj.get("totalCorrect", None)
-            total_marks = subj.get("totalMarkScored", None)
-            records.append({
-                "subject_id": subj_id,
-                "accuracy": round(accuracy, 1) if accuracy is not None else None,
-                "total_time_spent": total_time,
-                "total_attempted": total_attempted,
-                "total_correct": total_correct,
-                "total_marks": total_marks
-            })
-        subject_summary_df = pd.DataFrame(records)
-    else:
-        # No "subjects" key → empty DataFrame
-        subject_summary_df = pd.DataFrame(
-            columns=[
-                "subject_id",
-                "accuracy",
-                "total_time_spent",
-                "total_attempted",
-                "total_correct",
-                "total_marks"
-            ]
-        )
-
-    # 3) Build a flat DataFrame of all question‐level entries by iterating through sections→questions
-    questions_data = []
-    sections = parsed.get("sections", [])
-    for section in sections:
-        # Each section has keys: "sectionId", "questions" (list)
-        questions = section.get("questions", [])
-        for q in questions:
-            qid = q.get("questionId", {})
-            # Extract chapter titles (list of dicts with "title")
-            chapters = qid.get("chapters", [])
-            # We’ll assume each question belongs to exactly one chapter; if multiple, take the first
-            chapter_title = chapters[0].get("title") if chapters else "Unknown Chapter"
-
-            # Extract topic list (if needed)
-            topics = qid.get("topics", [])
-            # Combine topic titles (just for reference; not currently used in summary)
-            topic_titles = [t.get("title") for t in topics if "title" in t]
-
-            # Extract concept list
-            concepts = qid.get("concepts", [])
-            concept_titles = [c.get("title") for c in concepts if "title" in c]
-
-            # Difficulty (level)
-            difficulty = qid.get("level", None)
-
-            # Status & accuracy: if any markedOption has isCorrect==true, we treat accuracy=1; else 0.
-            marked_options = q.get("markedOptions", [])
-            input_value = q.get("inputValue", {})
-            accuracy_flag = 0
-            # If markedOptions contain {"isCorrect": true}, set accuracy 1
-            for mo in marked_options:
-                if mo.get("isCorrect", False):
-                    accuracy_flag = 1
-                    break
-            # Or if inputValue["isCorrect"] is True (for numeric inputs)
-            if input_value.get("isCorrect", False):
-                accuracy_flag = 1
-
-            # Time spent on this question
-            time_spent = q.get("timeTaken", None)
-
-            # There is no timestamp per question in this JSON. We'll create a dummy ordinal timestamp
-            # based on the order we encounter them. We'll fill real timestamp later if needed.
-            timestamp = None  # placeholder; we’ll fill a sequential int index after building list
-
-            questions_data.append({
-                "timestamp": timestamp,
-                "chapter": chapter_title,
-                "topics": topic_titles,
-                "concepts": concept_titles,
-                "difficulty": difficulty,
-                "accuracy": accuracy_flag,
-                "time_spent": time_spent
-            })
-
-    if len(questions_data) == 0:
-        # No question entries → return empty DataFrame
-        df_questions = pd.DataFrame(
-            columns=[
-                "timestamp", "chapter", "topics", "concepts",
-                "difficulty", "accuracy", "time_spent"
-            ]
-        )
-    else:
-        # Create DataFrame
-        df_questions = pd.DataFrame(questions_data)
-        # Since there is no real timestamp, assign a sequential index (0,1,2,…)
-        df_questions["timestamp"] = pd.date_range(
-            start=datetime.now(), periods=len(df_questions), freq="T"
-        )
-
-    # 4) Compute per‐chapter summary: average accuracy, average time_spent, count of questions per chapter
-    if "chapter" in df_questions.columns and "accuracy" in df_questions.columns and "time_spent" in df_questions.columns:
-        chapter_summary_df = (
-            df_questions
-            .groupby("chapter", as_index=False)
-            .agg(
-                accuracy=("accuracy", "mean"),
-                avg_time_spent=("time_spent", "mean"),
-                num_questions=("accuracy", "count")
-            )
-        )
-        chapter_summary_df["accuracy"] = chapter_summary_df["accuracy"].round(1)
-        chapter_summary_df["avg_time_spent"] = chapter_summary_df["avg_time_spent"].round(1)
-    else:
-        chapter_summary_df = pd.DataFrame(
-            columns=["chapter", "accuracy", "avg_time_spent", "num_questions"]
-        )
-
-    # 5) Package everything into summary_dict
-    summary_dict = {
-        "student_name": student_name,
-        "subject_summary_df": subject_summary_df,
-        "chapter_summary_df": chapter_summary_df,
-        "raw_json": raw_json
-    }
-
-    return df_questions, summary_dict
+# app/data_processor.py
+
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from app.concept_index import ConceptIndex, summarize_tags
+from app.metrics import span
+from app.stream_parser import iter_submissions
+
+# Name reported for a submission that carries no "student_name" (exported tests don't)
+DEFAULT_STUDENT_NAME = "Student"
+
+def parse_json_to_df(raw_bytes: bytes):
+    """
+    Adapted to handle the sample JSON structure you provided (a list with one dict).
+    This function returns:
+      - df_questions: a pandas DataFrame with one row per question attempt, containing:
+          ['timestamp', 'chapter', 'difficulty', 'accuracy', 'time_spent']
+      - summary_dict: {
+            "student_name": str,                   # default "Student"
+            "subject_summary_df": DataFrame,       # per-subject metrics
+            "chapter_summary_df": DataFrame,       # per-chapter metrics
+            "question_tags_df": DataFrame,         # exploded topics/concepts per question
+            "tag_summary_df": DataFrame,           # per-topic/concept metrics
+            "raw_json": Python dict                # the full parsed JSON dict
+        }
+    """
+
+    with span("parse_json_to_df") as s:
+        s.add("bytes", len(raw_bytes))
+        parsed = json.loads(raw_bytes.decode("utf-8"))
+
+        # 1) If parsed is a list (as in your sample), extract the first element
+        if isinstance(parsed, list) and len(parsed) > 0:
+            parsed = parsed[0]
+        elif isinstance(parsed, list) and len(parsed) == 0:
+            raise ValueError("Uploaded JSON list is empty.")
+        if not isinstance(parsed, dict):
+            raise ValueError("Uploaded JSON must be an object or a list of objects.")
+
+        return _parse_submission(parsed)
+
+
+def parse_json_stream_to_df(source):
+    """
+    Streaming variant of parse_json_to_df for very large files.
+    `source` may be raw bytes, a file path, or a binary file object.
+
+    The JSON is walked incrementally (see app.stream_parser) and only the fields the
+    DataFrames need are kept, so question HTML and option payloads never sit in memory.
+    Like parse_json_to_df, only the first submission of a top-level list is used;
+    use parse_submissions for a whole cohort. summary_dict["raw_json"] is None here.
+    """
+    for submission in iter_submissions(source):
+        return _parse_submission(submission, keep_raw=False)
+    raise ValueError("Uploaded JSON list is empty.")
+
+
+def _parse_submission(parsed: dict, keep_raw: bool = True):
+    """
+    Turn one already-decoded submission dict into (df_questions, summary_dict).
+    Shared by parse_json_to_df (single upload), parse_json_stream_to_df and
+    parse_submissions (batch). With keep_raw=False, summary_dict["raw_json"] is None.
+    """
+
+    # At this point, parsed should be a dict with keys: "test", "subjects", "sections", etc.
+    raw_json = parsed.copy() if keep_raw else None
+    student_name = parsed.get("student_name", DEFAULT_STUDENT_NAME)
+
+    # 2) Build subject-level summary DataFrame (if "subjects" key exists)
+    subject_summary_df = pd.DataFrame()
+    if "subjects" in parsed and isinstance(parsed["subjects"], list):
+        subjects_list = parsed["subjects"]
+        # For each subject entry, we expect keys: totalTimeTaken, totalMarkScored, totalAttempted, totalCorrect, accuracy
+        # We also need some identifier for subject name: in your sample, each subject has a subjectId, but no "name" field.
+        # If you have a separate mapping from subjectId to subject name, you could inject it here.
+        # For now, we’ll simply label them "Subject 1", "Subject 2", … or use subjectId["$oid"] as name.
+        records = []
+        for i, subj in enumerate(subjects_list, start=1):
+            subj_id = subj.get("subjectId", {}).get("$oid", f"subj_{i}")
+            accuracy = subj.get("accuracy", None)
+            total_time = subj.get("totalTimeTaken", None)
+            total_attempted = subj.get("totalAttempted", None)
+            total_correct = subj.get("totalCorrect", None)
+            total_marks = subj.get("totalMarkScored", None)
+            records.append({
+                "subject_id": subj_id,
+                "accuracy": round(accuracy, 1) if accuracy is not None else None,
+                "total_time_spent": total_time,
+                "total_attempted": total_attempted,
+                "total_correct": total_correct,
+                "total_marks": total_marks
+            })
+        subject_summary_df = pd.DataFrame(records)
+    else:
+        # No "subjects" key → empty DataFrame
+        subject_summary_df = pd.DataFrame(
+            columns=[
+                "subject_id",
+                "accuracy",
+                "total_time_spent",
+                "total_attempted",
+                "total_correct",
+                "total_marks"
+            ]
+        )
+
+    # 3) Build the question-level table column by column (see _build_question_columns),
+    #    anchored at the submission's real time when its ObjectId carries one
+    df_questions, question_tags_df = _build_question_columns(
+        parsed.get("sections", []), start=submission_time(parsed)
+    )
+
+    # 4) Compute per‐chapter summary: average accuracy, average time_spent, count of questions per chapter
+    chapter_summary_df = _summarize_chapters(df_questions)
+
+    # 5) Per-topic/concept summary, so top-k weakest/slowest never rescans question rows
+    tag_summary_df = summarize_tags(df_questions, question_tags_df)
+
+    # 6) Package everything into summary_dict
+    summary_dict = {
+        "student_name": student_name,
+        "subject_summary_df": subject_summary_df,
+        "chapter_summary_df": chapter_summary_df,
+        "question_tags_df": question_tags_df,
+        "tag_summary_df": tag_summary_df,
+        "raw_json": raw_json
+    }
+
+    return df_questions, summary_dict
+
+
+def _summarize_chapters(df_questions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-chapter accuracy (%) / avg_time_spent / num_questions / correct, computed straight from the
+    categorical codes with np.bincount (same result as a groupby, without its overhead).
+    Chapters are returned in sorted order; missing time_spent values are skipped.
+    """
+    chapter = df_questions["chapter"].array
+    if len(chapter) == 0:
+        return pd.DataFrame(columns=["chapter", "accuracy", "avg_time_spent", "num_questions", "correct"])
+
+    codes = chapter.codes
+    n_chapters = len(chapter.categories)
+    valid = codes >= 0
+    codes = codes[valid]
+    accuracy = df_questions["accuracy"].to_numpy()[valid]
+    time_spent = df_questions["time_spent"].to_numpy(dtype=np.float64)[valid]
+    has_time = ~np.isnan(time_spent)
+
+    counts = np.bincount(codes, minlength=n_chapters)
+    correct = np.bincount(codes, weights=accuracy, minlength=n_chapters)
+    time_sum = np.bincount(codes[has_time], weights=time_spent[has_time], minlength=n_chapters)
+    time_count = np.bincount(codes[has_time], minlength=n_chapters)
+
+    seen = counts > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_time = time_sum[seen] / time_count[seen]
+
+    return pd.DataFrame({
+        "chapter": np.asarray(chapter.categories, dtype=object)[seen],
+        "accuracy": (100.0 * correct[seen] / counts[seen]).round(1),
+        "avg_time_spent": avg_time.round(1),
+        "num_questions": counts[seen],
+        "correct": correct[seen].astype(np.int64),
+    })
+
+
+def _build_question_columns(sections: list, start: datetime = None):
+    """
+    Walk sections→questions once and fill one plain list per column, then convert each
+    list to a typed array in a single step (no per-question dicts, no list-valued cells).
+
+    Returns:
+      - df_questions with columns
+          timestamp  datetime64   one minute per question from `start` (default: now); the
+                                  source has no per-question time, only question order
+          chapter    category     first chapter title, or "Unknown Chapter"
+          difficulty category     questionId.level
+          accuracy   int8         1 if any markedOption or inputValue is correct, else 0
+          time_spent float32      timeTaken (NaN if missing)
+      - question_tags_df: the exploded topics/concepts table, one row per (question, tag):
+          question_idx int32     row position in df_questions
+          tag_type     category  "topic" or "concept"
+          title        category
+    """
+    chapters = []
+    levels = []
+    correct = []
+    times = []
+    tag_idx = []
+    tag_type = []
+    tag_title = []
+
+    # Bind the hot-path appends once instead of per question
+    add_chapter = chapters.append
+    add_level = levels.append
+    add_correct = correct.append
+    add_time = times.append
+    add_tag_idx = tag_idx.append
+    add_tag_type = tag_type.append
+    add_tag_title = tag_title.append
+
+    idx = 0
+    for section in sections:
+        for q in section.get("questions", []):
+            qid = q.get("questionId", {})
+
+            # We assume each question belongs to exactly one chapter; if multiple, take the first
+            q_chapters = qid.get("chapters")
+            add_chapter(q_chapters[0].get("title") if q_chapters else "Unknown Chapter")
+            add_level(qid.get("level"))
+
+            for t in qid.get("topics", ()):
+                if "title" in t:
+                    add_tag_idx(idx)
+                    add_tag_type("topic")
+                    add_tag_title(t["title"])
+            for c in qid.get("concepts", ()):
+                if "title" in c:
+                    add_tag_idx(idx)
+                    add_tag_type("concept")
+                    add_tag_title(c["title"])
+
+            # Correct if any markedOption is correct, or the numeric inputValue is correct
+            is_correct = q.get("inputValue", {}).get("isCorrect", False)
+            if not is_correct:
+                for mo in q.get("markedOptions", ()):
+                    if mo.get("isCorrect", False):
+                        is_correct = True
+                        break
+            add_correct(1 if is_correct else 0)
+
+            t_taken = q.get("timeTaken")
+            add_time(float("nan") if t_taken is None else t_taken)
+            idx += 1
+
+    df_questions = pd.DataFrame({
+        # There is no timestamp per question in this JSON, so use a sequential placeholder
+        "timestamp": pd.date_range(start=start or datetime.now(), periods=idx, freq="min"),
+        "chapter": pd.Categorical(chapters),
+        "difficulty": pd.Categorical(levels),
+        "accuracy": np.asarray(correct, dtype=np.int8),
+        "time_spent": np.asarray(times, dtype=np.float32),
+    })
+    question_tags_df = pd.DataFrame({
+        "question_idx": np.asarray(tag_idx, dtype=np.int32),
+        "tag_type": pd.Categorical(tag_type, categories=["topic", "concept"]),
+        "title": pd.Categorical(tag_title),
+    })
+    return df_questions, question_tags_df
+
+
+# ─── Batch / cohort processing ─────────────────────────────────────────────────────
+
+# Above this size a submission file is parsed incrementally instead of with json.loads
+STREAM_THRESHOLD_BYTES = 16 * 1024 * 1024
+
+def _submission_id(parsed: dict, source_name: str, index: int) -> str:
+    """
+    Stable id for one submission: the Mongo "_id" if present, else "<file stem>:<index>".
+    """
+    oid = parsed.get("_id", {})
+    if isinstance(oid, dict) and oid.get("$oid"):
+        return oid["$oid"]
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    return f"{stem}:{index}"
+
+
+def objectid_time(oid: str):
+    """
+    Creation time embedded in the first 4 bytes of a Mongo ObjectId, as a naive UTC
+    datetime, or None if `oid` is not a 24-character hex ObjectId.
+    """
+    if not isinstance(oid, str) or len(oid) != 24:
+        return None
+    try:
+        int(oid, 16)
+    except ValueError:
+        return None
+    return datetime.fromtimestamp(int(oid[:8], 16), timezone.utc).replace(tzinfo=None)
+
+
+def submission_time(parsed: dict):
+    """
+    When the submission was created, taken from its "_id" ObjectId (see objectid_time),
+    or None. This gives tests a real order without any extra field in the source data.
+    """
+    oid = parsed.get("_id", {})
+    return objectid_time(oid.get("$oid") if isinstance(oid, dict) else oid)
+
+
+def expand_sources(source) -> list:
+    """
+    Resolve `source` into a sorted list of JSON file paths. Accepts:
+      - a directory (every *.json directly inside it)
+      - a glob pattern such as "data/mock_*/**/*.json"
+      - a single file path
+      - a list/tuple of any of the above
+    """
+    if isinstance(source, (list, tuple)):
+        paths = []
+        for item in source:
+            paths.extend(expand_sources(item))
+        return paths
+
+    source = os.fspath(source)
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "*.json")))
+    if glob.has_magic(source):
+        return sorted(glob.glob(source, recursive=True))
+    if os.path.isfile(source):
+        return [source]
+    raise FileNotFoundError(f"No submissions found at {source!r}.")
+
+
+def iter_file_submissions(path: str, skip: int = 0):
+    """
+    Yield (submission_id, df_questions, summary_dict) for every submission in one file
+    (a dict, or a list of dicts). Files larger than STREAM_THRESHOLD_BYTES are streamed,
+    so a file holding a whole cohort is never fully loaded; smaller ones take the
+    faster json.loads path. summary_dict["raw_json"] is always None.
+    The first `skip` submissions are read but not parsed (for resuming part-way).
+    """
+    if os.path.getsize(path) > STREAM_THRESHOLD_BYTES:
+        submissions = iter_submissions(path)
+    else:
+        with open(path, "rb") as f:
+            parsed = json.loads(f.read().decode("utf-8"))
+        submissions = parsed if isinstance(parsed, list) else [parsed]
+
+    for i, submission in enumerate(submissions):
+        if not isinstance(submission, dict):
+            continue
+        if skip:
+            skip -= 1
+            continue
+        df_questions, summary = _parse_submission(submission, keep_raw=False)
+        yield _submission_id(submission, path, i), df_questions, summary
+
+
+# Bytes scanned at a time when splitting a file into its list elements
+SPLIT_BLOCK_BYTES = 4 * 1024 * 1024
+
+
+
+def _list_item_ranges(path: str):
+    """
+    (index, offset, length) of every element of the top-level JSON list in `path`,
+    found without decoding the file: a block-wise numpy scan for the commas and
+    closing bracket at depth 1, skipping brackets and commas inside strings. Memory
+    stays at one block however large the file is. Returns None when the top level
+    is not a list, or the list does not end where it should (the caller then parses
+    the file whole, which reports the error).
+    """
+    ranges = []
+    with open(path, "rb") as f:
+        head = f.read(SPLIT_BLOCK_BYTES)
+        stripped = head.lstrip()
+        if not stripped.startswith(b"["):
+            return None
+        base = 0
+        block = head
+        in_string = False
+        depth = 0
+        carry = 0           # backslashes ending the previous block
+        start = None        # offset where the current element begins
+        while block:
+            a = np.frombuffer(block, dtype=np.uint8)
+
+            # Quotes preceded by an odd run of backslashes are escaped
+            quotes = np.flatnonzero(a == ord('"'))
+            backslashes = np.flatnonzero(a == ord("\\"))
+            odd_ends = np.empty(0, dtype=np.int64)
+            new_carry = 0
+            if len(backslashes):
+                breaks = np.flatnonzero(np.diff(backslashes) != 1)
+                first = np.concatenate(([0], breaks + 1))
+                last = np.concatenate((breaks, [len(backslashes) - 1]))
+                lengths = last - first + 1 + np.where(backslashes[first] == 0, carry, 0)
+                odd_ends = backslashes[last][lengths % 2 == 1]
+                if backslashes[-1] == len(a) - 1:
+                    new_carry = int(lengths[-1])
+            if carry % 2 and a[0] != ord("\\"):
+                odd_ends = np.concatenate(([-1], odd_ends))
+            if len(odd_ends):
+                escaping = np.zeros(len(a) + 1, dtype=bool)
+                escaping[odd_ends + 1] = True       # shifted by one so -1 fits
+                quotes = quotes[~escaping[quotes]]
+
+            # Brackets and commas outside strings, with the depth after each
+            marks = np.flatnonzero((a == ord(",")) | ((a | 0x20) == ord("{")) | ((a | 0x20) == ord("}")))
+            outside = (np.searchsorted(quotes, marks) + in_string) % 2 == 0
+            marks = marks[outside]
+            kinds = a[marks]
+            delta = np.where(kinds == ord(","), 0, np.where((kinds | 0x20) == ord("{"), 1, -1))
+            depths = depth + np.cumsum(delta)
+
+            if start is None and len(marks):
+                start = base + int(marks[0]) + 1        # just after the opening "["
+            closed = np.flatnonzero(depths == 0)
+            stop = int(closed[0]) if len(closed) else len(marks)
+            for pos in marks[:stop][(kinds[:stop] == ord(",")) & (depths[:stop] == 1)]:
+                end = base + int(pos)
+                ranges.append((len(ranges), start, end - start))
+                start = end + 1
+            if len(closed):
+                end = base + int(marks[stop])
+                if _has_content(f, start, end - start):    # not the inside of "[]"
+                    ranges.append((len(ranges), start, end - start))
+                return ranges
+
+            in_string = bool((in_string + len(quotes)) % 2)
+            depth = int(depths[-1]) if len(depths) else depth
+            carry = new_carry
+            base += len(block)
+            block = f.read(SPLIT_BLOCK_BYTES)
+    return None
+
+
+def _has_content(f, offset: int, length: int) -> bool:
+    f.seek(offset)
+    return bool(f.read(length).strip())
+
+
+def _cohort_row(sub_id: str, df_questions: pd.DataFrame, summary: dict) -> tuple:
+    name = summary["student_name"]
+    for df in (df_questions, summary["subject_summary_df"], summary["chapter_summary_df"]):
+        df.insert(0, "student_name", name)
+        df.insert(0, "submission_id", sub_id)
+    return (
+        sub_id,
+        df_questions,
+        summary["subject_summary_df"],
+        summary["chapter_summary_df"],
+        summary["question_tags_df"],
+    )
+
+
+def _parse_submission_chunk(task: tuple) -> list:
+    """
+    Worker entry point: parse one chunk of a file and return a list of
+    (submission_id, df_questions, subject_summary_df, chapter_summary_df, question_tags_df).
+    `task` is (path, ranges): the (index, offset, length) of each list element to
+    parse, or None for every submission in the file.
+    Runs inside a worker process, so it must stay a top-level function.
+    """
+    path, ranges = task
+    if ranges is None:
+        return [_cohort_row(*parsed) for parsed in iter_file_submissions(path)]
+    results = []
+    with open(path, "rb") as f:
+        for index, offset, length in ranges:
+            f.seek(offset)
+            submission = json.loads(f.read(length).decode("utf-8"))
+            if not isinstance(submission, dict):
+                continue
+            df_questions, summary = _parse_submission(submission, keep_raw=False)
+            results.append(_cohort_row(_submission_id(submission, path, index), df_questions, summary))
+    return results
+
+
+def _split_tasks(paths: list, workers: int) -> list:
+    """
+    (path, ranges) tasks for _parse_submission_chunk. A file holding a list is cut
+    into chunks of its elements, so one big cohort file spreads over every worker
+    (about 4 chunks per worker across all files); any other file is one task.
+    """
+    per_file = [(path, _list_item_ranges(path) if workers > 1 else None) for path in paths]
+    total = sum(len(ranges) if ranges is not None else 1 for _, ranges in per_file)
+    size = max(1, -(-total // (workers * 4)))
+    tasks = []
+    for path, ranges in per_file:
+        if ranges is None:
+            tasks.append((path, None))
+            continue
+        tasks.extend((path, ranges[i:i + size]) for i in range(0, len(ranges), size))
+    return tasks
+
+
+def _concat_categorical(frames: list, categorical_cols: list) -> pd.DataFrame:
+    """
+    pd.concat falls back to object dtype when categoricals have different categories,
+    so re-encode the listed columns once on the combined frame.
+    """
+    combined = pd.concat(frames, ignore_index=True)
+    for col in categorical_cols:
+        combined[col] = combined[col].astype("category")
+    return combined
+
+
+def parse_submissions(source, max_workers: int = None, chunksize: int = None):
+    """
+    Parse a whole cohort of submissions in parallel.
+
+    `source` may be a directory, a glob pattern, a file (whose top-level JSON may be a
+    list holding many submissions), or a list of those. Files are parsed in worker
+    processes, a file holding a list split into chunks of its elements so a single
+    cohort file uses every worker too; every submission is kept (unlike
+    parse_json_to_df, which only looks at the first element of a list).
+
+    Returns:
+      - df_questions: question-level DataFrame for all students, keyed by
+          ['submission_id', 'student_name', ...the parse_json_to_df columns]
+      - cohort_dict: {
+            "submission_ids": list[str],
+            "subject_summary_df": DataFrame,   # per-student subject metrics
+            "chapter_summary_df": DataFrame,   # per-student chapter metrics
+            "question_tags_df": DataFrame,     # topics/concepts; question_idx indexes df_questions
+            "concept_index": ConceptIndex,     # per-submission and cohort topic/concept stats
+            "stats": {"files", "submissions", "workers", "seconds", "submissions_per_sec"}
+        }
+    """
+    paths = expand_sources(source)
+    if not paths:
+        raise ValueError(f"No JSON files matched {source!r}.")
+
+    workers = max(1, max_workers or os.cpu_count() or 1)
+
+    start = time.perf_counter()
+    tasks = _split_tasks(paths, workers)
+    workers = min(workers, len(tasks))
+    # A few chunks per worker keeps every core busy without paying per-task IPC overhead
+    if chunksize is None:
+        chunksize = max(1, len(tasks) // (workers * 4))
+    if workers == 1:
+        per_task = [_parse_submission_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            per_task = list(pool.map(_parse_submission_chunk, tasks, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    rows = [r for task_results in per_task for r in task_results]
+    submission_ids = [r[0] for r in rows]
+
+    if rows:
+        # Re-base each submission's question_idx onto the concatenated question table
+        offset = 0
+        for r in rows:
+            r[4]["question_idx"] += offset
+            offset += len(r[1])
+
+        df_questions = _concat_categorical(
+            [r[1] for r in rows], ["submission_id", "student_name", "chapter", "difficulty"]
+        )
+        subject_summary_df = pd.concat([r[2] for r in rows], ignore_index=True)
+        chapter_summary_df = pd.concat([r[3] for r in rows], ignore_index=True)
+        question_tags_df = _concat_categorical([r[4] for r in rows], ["tag_type", "title"])
+    else:
+        df_questions = pd.DataFrame(columns=[
+            "submission_id", "student_name", "timestamp", "chapter",
+            "difficulty", "accuracy", "time_spent"
+        ])
+        question_tags_df = pd.DataFrame(columns=["question_idx", "tag_type", "title"])
+        subject_summary_df = pd.DataFrame(columns=[
+            "submission_id", "student_name", "subject_id", "accuracy",
+            "total_time_spent", "total_attempted", "total_correct", "total_marks"
+        ])
+        chapter_summary_df = pd.DataFrame(columns=[
+            "submission_id", "student_name", "chapter", "accuracy",
+            "avg_time_spent", "num_questions", "correct"
+        ])
+
+    cohort_dict = {
+        "submission_ids": submission_ids,
+        "subject_summary_df": subject_summary_df,
+        "chapter_summary_df": chapter_summary_df,
+        "question_tags_df": question_tags_df,
+        "concept_index": ConceptIndex(df_questions, question_tags_df, student_col="submission_id"),
+        "stats": {
+            "files": len(paths),
+            "submissions": len(submission_ids),
+            "workers": workers,
+            "seconds": round(elapsed, 3),
+            "submissions_per_sec": round(len(submission_ids) / elapsed, 1) if elapsed > 0 else None,
+        },
+    }
+    return df_questions, cohort_dict
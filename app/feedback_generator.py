@@ -1,123 +1,722 @@
-# File: app/feedback_generator.py
-
-import json
-from app.llm_client import get_completion
-import streamlit as st   # only used for debugging in the UI
-
-
-def _strip_backticks(raw: str) -> str:
-    """
-    Remove leading/trailing triple-backticks if present.
-    If there's no closing backticks, just return everything after the first line.
-    """
-    text = raw.strip()
-    if text.startswith("```"):
-        first_newline  = text.find("\n")
-        closing_index  = text.find("```", first_newline + 1)
-        if closing_index > first_newline:
-            # Normal case: content between the first newline and the closing ```
-            only = text[first_newline + 1 : closing_index]
-        else:
-            # No closing backticks→ everything after the first newline
-            only = text[first_newline + 1 :]
-    else:
-        only = text
-    return only.strip()
-
-
-def _sanitize_str(val: str) -> str:
-    """
-    Ensure we have a string (no accidental None or non-str).
-    """
-    if not isinstance(val, str):
-        return ""
-    return val.strip()
-
-
-def _debug_and_parse(raw_response: str) -> dict:
-    """
-    Show the LLM’s raw response (first 200 chars) in Streamlit,
-    strip any backticks, then parse JSON. If parsing fails, raise an error.
-    """
-
-    stripped = _strip_backticks(raw_response)
-    if not stripped:
-        raise ValueError(
-            "LLM returned an empty response (after stripping backticks). "
-            f"repr(raw_response) = {repr(raw_response)}"
-        )
-
-    try:
-        return json.loads(stripped)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Failed to parse JSON from LLM response: {e}\n\nPartial content:\n{stripped}")
-
-
-def generate_feedback_sections(summary_dict: dict) -> dict:
-    """
-    Build a minimal JSON context (no DataFrames), send it to the LLM,
-    parse the returned JSON, and return a dict with keys "intro", "breakdown", "suggestions".
-    """
-
-    # 1) Extract student name + DataFrames from summary_dict
-    student_name = summary_dict.get("student_name", "Student")
-    subj_df = summary_dict.get("subject_summary_df")   # pandas.DataFrame
-    chap_df = summary_dict.get("chapter_summary_df")   # pandas.DataFrame
-
-    # 2) Convert each DataFrame → list[dict] so nothing non-serializable ends up in JSON
-    subjects = subj_df.to_dict(orient="records") if subj_df is not None else []
-    chapters = chap_df.to_dict(orient="records") if chap_df is not None else []
-
-    # 3) Build a “slim” context
-    slim_context = {
-        "student_name": student_name,
-        "subjects":     subjects,
-        "chapters":     chapters
-    }
-
-    # 4) Attempt to serialize slim_context
-    try:
-        json_data_str = json.dumps(slim_context, indent=2)
-    except TypeError as e:
-        st.error(f"DEBUG: Could not JSON-serialize slim_context: {e}")
-        raise
-
-    # 5) Load the prompt template (must contain a {JSON_DATA} placeholder)
-    with open("app/prompt/feedback_prompt.txt", "r", encoding="utf-8") as f:
-        template = f.read()
-
-    # 6) Inject our JSON_DATA into the prompt
-    final_prompt = template.format(JSON_DATA=json_data_str)
-
-    # 7) Call the LLM
-    raw_response = get_completion(final_prompt)
-    if raw_response is None:
-        # Instead of “return None”, raise an error so the frontend shows a clear message
-        raise ValueError("LLM returned None instead of a string. Check your API key or network.")
-
-    # 8) Strip backticks & parse JSON
-    feedback = _debug_and_parse(raw_response)
-
-    # 9) Safely extract each top-level field (use .get so missing keys don’t crash)
-    intro_raw       = feedback.get("intro", "")
-    breakdown_raw   = feedback.get("breakdown", "")
-    suggestions_raw = feedback.get("suggestions", [])
-
-    # 10) Sanitize each field
-    intro     = _sanitize_str(intro_raw)
-    breakdown = _sanitize_str(breakdown_raw)
-
-    if isinstance(suggestions_raw, str):
-        # If suggestions is a newline-separated string, split into list
-        lines = suggestions_raw.splitlines()
-        suggestions = [line.strip(" •-") for line in lines if line.strip()]
-    elif isinstance(suggestions_raw, list):
-        suggestions = [_sanitize_str(item) for item in suggestions_raw]
-    else:
-        suggestions = []
-
-    return {
-        "intro":       intro,
-        "breakdown":   breakdown,
-        "suggestions": suggestions
-    }
+# File: app/feedback_generator.py
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from app.json_repair import repair_json
+from app.llm_client import forget_completion, get_completion
+from app.metrics import span
+from app.prompt_builder import (
+    BuiltPrompt, build_batch_prompt, build_feedback_prompt, build_missing_prompt, count_tokens, dumps_compact,
+)
+from app.rule_feedback import generate_rule_feedback
+from app.single_flight import Abandoned, get_single_flight
+
+logger = logging.getLogger("app.feedback_generator")
+
+FEEDBACK_SECTIONS = ("intro", "breakdown", "suggestions")
+
+
+def _strip_backticks(raw: str) -> str:
+    """
+    Remove leading/trailing triple-backticks if present.
+    If there's no closing backticks, just return everything after the first line.
+    """
+    text = raw.strip()
+    if text.startswith("```"):
+        first_newline  = text.find("\n")
+        closing_index  = text.find("```", first_newline + 1)
+        if closing_index > first_newline:
+            # Normal case: content between the first newline and the closing ```
+            only = text[first_newline + 1 : closing_index]
+        else:
+            # No closing backticks→ everything after the first newline
+            only = text[first_newline + 1 :]
+    else:
+        only = text
+    return only.strip()
+
+
+def _sanitize_str(val: str) -> str:
+    """
+    Ensure we have a string (no accidental None or non-str).
+    """
+    if not isinstance(val, str):
+        return ""
+    return val.strip()
+
+
+def _debug_and_parse(raw_response: str) -> dict:
+    """
+    Strip any backticks from the LLM’s raw response, then parse JSON.
+    If that fails, parse the repaired JSON instead (see app.json_repair: prose
+    around it, raw newlines in strings, trailing commas, a missing final quote).
+    If the reply is cut off or still does not parse, raise an error.
+    """
+    with span("_debug_and_parse") as s:
+        s.add("bytes", len(raw_response) if isinstance(raw_response, str) else 0)
+        stripped = _strip_backticks(raw_response)
+        if not stripped:
+            raise ValueError(
+                "LLM returned an empty response (after stripping backticks). "
+                f"repr(raw_response) = {repr(raw_response)}"
+            )
+
+        try:
+            return json.loads(stripped)
+        except json.JSONDecodeError as e:
+            error = e
+
+        repaired, complete = repair_json(stripped)
+        if complete:
+            try:
+                parsed = json.loads(repaired)
+                s.add("repaired")
+                return parsed
+            except json.JSONDecodeError:
+                pass
+        raise ValueError(f"Failed to parse JSON from LLM response: {error}\n\nPartial content:\n{stripped}")
+
+
+# How many weakest / slowest concepts go into the prompt
+CONCEPTS_IN_PROMPT = 5
+
+
+def _slim_context(summary_dict: dict) -> dict:
+    """
+    The minimal JSON-able view of summary_dict that the LLM sees (no DataFrames).
+    """
+
+    # 1) Extract student name + DataFrames from summary_dict
+    student_name = summary_dict.get("student_name", "Student")
+    subj_df = summary_dict.get("subject_summary_df")   # pandas.DataFrame
+    chap_df = summary_dict.get("chapter_summary_df")   # pandas.DataFrame
+
+    # 2) Convert each DataFrame → list[dict] so nothing non-serializable ends up in JSON
+    subjects = subj_df.to_dict(orient="records") if subj_df is not None else []
+    chapters = chap_df.to_dict(orient="records") if chap_df is not None else []
+
+    # 3) Build a “slim” context
+    slim_context = {
+        "student_name": student_name,
+        "subjects":     subjects,
+        "chapters":     chapters
+    }
+
+    # 3b) Weakest / slowest concepts, read off the precomputed per-tag summary
+    tag_df = summary_dict.get("tag_summary_df")
+    if tag_df is not None and len(tag_df):
+        from app.concept_index import top_k_from_summary
+
+        for key, by in (("weakest_concepts", "weakest"), ("slowest_concepts", "slowest")):
+            top = top_k_from_summary(tag_df, k=CONCEPTS_IN_PROMPT, by=by)
+            slim_context[key] = top[["title", "attempts", "accuracy", "avg_time_spent"]].to_dict(orient="records")
+    return slim_context
+
+
+def _build_prompt(summary_dict: dict, budget: int = None) -> BuiltPrompt:
+    """
+    Build the slim context from summary_dict and fit it, compactly serialized, into
+    the cached prompt template within `budget` tokens (see app.prompt_builder).
+    """
+    slim_context = _slim_context(summary_dict)
+
+    # 4) Serialize + inject into the template (must contain a {JSON_DATA} placeholder)
+    try:
+        built = build_feedback_prompt(slim_context, budget=budget)
+    except TypeError as e:
+        logger.error("Could not JSON-serialize slim_context: %s", e)
+        raise
+
+    if built.omitted:
+        logger.info("prompt over %d-token budget; omitted %s", built.budget, built.omitted)
+    return built
+
+
+def _usage_report(built: BuiltPrompt, usage: dict) -> dict:
+    """
+    Token accounting for one feedback call: the API's (or estimated) counts plus the
+    local prompt estimate and budget, logged and returned with the feedback.
+    """
+    report = {
+        "prompt_tokens": usage.get("prompt_tokens", built.prompt_tokens),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "source": usage.get("source", "estimate"),
+        "prompt_tokens_local": built.prompt_tokens,
+        "prompt_budget": built.budget,
+        "omitted": dict(built.omitted),
+    }
+    if usage.get("missing_sections"):
+        # Counts include the follow-up call for these
+        report["missing_sections"] = list(usage["missing_sections"])
+    logger.info(
+        "feedback call: %d prompt + %d completion tokens (%s; local prompt estimate %d / budget %d)",
+        report["prompt_tokens"], report["completion_tokens"], report["source"],
+        built.prompt_tokens, built.budget,
+    )
+    return report
+
+
+def _sanitize_suggestions(suggestions_raw) -> list:
+    if isinstance(suggestions_raw, str):
+        # If suggestions is a newline-separated string, split into list
+        lines = suggestions_raw.splitlines()
+        return [line.strip(" •-") for line in lines if line.strip()]
+    elif isinstance(suggestions_raw, list):
+        return [_sanitize_str(item) for item in suggestions_raw]
+    return []
+
+
+def _sanitize_feedback(feedback: dict) -> dict:
+    """
+    Safely extract and sanitize each top-level field (missing keys don’t crash).
+    """
+    return {
+        "intro":       _sanitize_str(feedback.get("intro", "")),
+        "breakdown":   _sanitize_str(feedback.get("breakdown", "")),
+        "suggestions": _sanitize_suggestions(feedback.get("suggestions", []))
+    }
+
+
+def _salvage_sections(raw_response: str) -> dict:
+    """
+    The sections of a feedback reply that can be used as they are: all of them if
+    the reply parses (after repair), otherwise each one whose value was complete
+    before the reply broke off. Empty sections count as missing.
+    """
+    try:
+        parsed = _debug_and_parse(raw_response)
+    except ValueError:
+        repaired, _ = repair_json(_strip_backticks(raw_response or ""))
+        parsed = dict(_TopLevelJSONScanner().feed(repaired))
+    if not isinstance(parsed, dict):
+        return {}
+    sanitized = _sanitize_feedback(parsed)
+    return {k: parsed[k] for k in FEEDBACK_SECTIONS if k in parsed and sanitized[k]}
+
+
+def _request_sections(built: BuiltPrompt, missing: list, usage: dict) -> dict:
+    """
+    Ask again for only the `missing` sections of the feedback `built` was for, and
+    add that call's tokens to `usage`. Raises ValueError if they still don't come back.
+    """
+    followup = build_missing_prompt(built.context, missing, budget=built.budget)
+    followup_usage = {}
+    with span("feedback.missing_sections") as s:
+        s.add("sections", len(missing))
+        raw_response = get_completion(followup.text, usage=followup_usage)
+    sections = _salvage_sections(raw_response)
+    still_missing = [k for k in missing if k not in sections]
+    if still_missing:
+        forget_completion(followup_usage)
+        raise ValueError(f"LLM reply is missing {', '.join(still_missing)}, also after asking for just those.")
+
+    usage["prompt_tokens"] = usage.get("prompt_tokens", built.prompt_tokens) + followup_usage.get(
+        "prompt_tokens", followup.prompt_tokens
+    )
+    usage["completion_tokens"] = usage.get("completion_tokens", 0) + followup_usage.get("completion_tokens", 0)
+    usage["missing_sections"] = list(missing)
+    return {k: sections[k] for k in missing}
+
+
+def _complete_sections(built: BuiltPrompt, raw_response: str, usage: dict) -> dict:
+    """
+    The three feedback sections from `raw_response`: the usable ones as they are,
+    the rest from a follow-up request (see _request_sections).
+    """
+    sections = _salvage_sections(raw_response)
+    if not sections:
+        _debug_and_parse(raw_response)   # raises the parse error, if that is what went wrong
+        raise ValueError(f"LLM response has none of {', '.join(FEEDBACK_SECTIONS)}.")
+    missing = [k for k in FEEDBACK_SECTIONS if k not in sections]
+    if missing:
+        logger.info("LLM reply unusable for %s; asking for just those", missing)
+        sections.update(_request_sections(built, missing, usage))
+    return sections
+
+
+def _complete_feedback(built: BuiltPrompt) -> dict:
+    # 7) Call the LLM
+    usage = {}
+    raw_response = get_completion(built.text, usage=usage)
+    if raw_response is None:
+        # Instead of “return None”, raise an error so the frontend shows a clear message
+        raise ValueError("LLM returned None instead of a string. Check your API key or network.")
+
+    # 8) Strip backticks & parse (or repair) the JSON, ask again for any section that
+    #    did not come back usable, then sanitize each field. A reply that stays
+    #    unusable leaves the response cache, so a retry makes a fresh request.
+    try:
+        sections = _complete_sections(built, raw_response, usage)
+    except Exception:
+        forget_completion(usage)
+        raise
+    feedback = _sanitize_feedback(sections)
+    feedback["usage"] = _usage_report(built, usage)
+    return feedback
+
+
+# ─── Request coalescing ───────────────────────────────────────────────────────────
+
+def _flight_key(built: BuiltPrompt) -> str:
+    """
+    Single-flight key of a feedback call: identical prompts share one LLM request.
+    """
+    return hashlib.sha256(("feedback_sections\0" + built.text).encode("utf-8")).hexdigest()
+
+
+def _coalesced(feedback: dict) -> dict:
+    """
+    A caller's own copy of feedback another caller's request produced. Like a cache
+    hit, usage keeps that request's token counts with source "coalesced".
+    """
+    feedback = copy.deepcopy(feedback)
+    feedback["usage"] = {**feedback.get("usage", {}), "source": "coalesced"}
+    return feedback
+
+
+def _join_flight(built: BuiltPrompt) -> tuple:
+    """
+    (call, None) when this caller should make the request itself, finishing `call`
+    afterwards (call is None with coalescing off), or (None, feedback) when another
+    caller's identical request answered it. Raises that request's error, or
+    TimeoutError after waiting SINGLE_FLIGHT_WAIT_S for it (see app.single_flight).
+    """
+    flight = get_single_flight()
+    if flight is None:
+        return None, None
+    key = _flight_key(built)
+    while True:
+        call = flight.begin(key)
+        if call.leader:
+            return call, None
+        try:
+            return None, _coalesced(call.wait())
+        except Abandoned:
+            continue
+
+
+def generate_feedback_sections(summary_dict: dict, budget: int = None) -> dict:
+    """
+    Build a minimal JSON context (no DataFrames), send it to the LLM,
+    parse the returned JSON, and return a dict with keys "intro", "breakdown", "suggestions",
+    plus "usage" (prompt/completion token counts for this call, see _usage_report).
+
+    Concurrent calls with the same prompt, in this process or another one, share a
+    single LLM request (see app.single_flight); their usage["source"] is "coalesced".
+    """
+    built = _build_prompt(summary_dict, budget=budget)
+    call, shared = _join_flight(built)
+    if shared is not None:
+        return shared
+    if call is None:
+        return _complete_feedback(built)
+    try:
+        feedback = _complete_feedback(built)
+    except BaseException as e:
+        call.finish(error=e)
+        raise
+    call.finish(copy.deepcopy(feedback))
+    return feedback
+
+
+# ─── Engines and fallback ─────────────────────────────────────────────────────────
+
+# "llm" (with the rule-based fallback) or "rules"; how long to wait for the LLM
+FEEDBACK_ENGINE = os.environ.get("FEEDBACK_ENGINE", "llm")
+FEEDBACK_TIMEOUT_S = float(os.environ.get("FEEDBACK_TIMEOUT_S", "45"))
+
+_llm_pool = None
+_llm_pool_lock = threading.Lock()
+
+
+def _get_llm_pool() -> ThreadPoolExecutor:
+    """
+    Threads that run LLM calls for generate_feedback, so a call can be abandoned
+    after its timeout. An abandoned call still finishes in the background and lands
+    in the LLM response cache, so asking again later is instant.
+    """
+    global _llm_pool
+    with _llm_pool_lock:
+        if _llm_pool is None:
+            _llm_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="feedback-llm")
+        return _llm_pool
+
+
+def rule_fallback(summary_dict: dict, reason: str, partial: dict = None) -> dict:
+    """
+    Rule-based feedback standing in for a failed LLM call, with any sections the
+    LLM did finish (`partial`) kept. usage["fallback_reason"] records why.
+    """
+    logger.warning("LLM feedback unavailable (%s); using rule-based feedback", reason)
+    feedback = generate_rule_feedback(summary_dict)
+    feedback.update({k: v for k, v in (partial or {}).items() if k != "usage"})
+    feedback["usage"]["fallback_reason"] = reason
+    return feedback
+
+
+def generate_feedback(summary_dict: dict, engine: str = None, timeout: float = None, budget: int = None) -> dict:
+    """
+    Feedback from `engine` (default FEEDBACK_ENGINE): "rules" answers instantly
+    from the summary tables (app.rule_feedback); "llm" calls
+    generate_feedback_sections but falls back to the rules when the call fails or
+    takes longer than `timeout` seconds (default FEEDBACK_TIMEOUT_S). Either way
+    the result has the usual "intro"/"breakdown"/"suggestions"/"usage" keys;
+    usage["source"] is "rules" when the rules answered.
+    """
+    engine = engine or FEEDBACK_ENGINE
+    if engine == "rules":
+        return generate_rule_feedback(summary_dict)
+    if engine != "llm":
+        raise ValueError(f"Unknown feedback engine: {engine!r}")
+
+    future = _get_llm_pool().submit(generate_feedback_sections, summary_dict, budget)
+    try:
+        return future.result(timeout=timeout or FEEDBACK_TIMEOUT_S)
+    except FutureTimeout:
+        return rule_fallback(summary_dict, f"no reply within {timeout or FEEDBACK_TIMEOUT_S:g}s")
+    except Exception as e:
+        return rule_fallback(summary_dict, f"{type(e).__name__}: {e}")
+
+
+# ─── Multi-student requests ───────────────────────────────────────────────────────
+
+# Students packed into one request, and the reply length allowed per student
+FEEDBACK_BATCH_SIZE = int(os.environ.get("FEEDBACK_BATCH_SIZE", "4"))
+MAX_TOKENS_PER_STUDENT = 2000
+
+
+def _split_batch_response(raw_response: str) -> list:
+    """
+    The objects of a batch reply's JSON array, in order. If the array is cut off
+    (e.g. the reply hit max_tokens) or breaks somewhere, every object that parsed
+    before that point is still returned, so only the rest need a retry.
+    """
+    try:
+        parsed = _debug_and_parse(raw_response)
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, list):
+        return parsed
+    if isinstance(parsed, dict):
+        # Some models wrap the array: {"students": [...]}
+        nested = [v for v in parsed.values() if isinstance(v, list)]
+        return nested[0] if len(nested) == 1 else [parsed]
+
+    # Salvage: decode object by object (of the repaired text) until something fails
+    text, _ = repair_json(_strip_backticks(raw_response or ""))
+    pos = text.find("[") + 1
+    if pos == 0:
+        return []
+    decoder = json.JSONDecoder()
+    entries = []
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text) or text[pos] == "]":
+            break
+        try:
+            entry, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            break
+        entries.append(entry)
+    return entries
+
+
+def _batch_usage(built: BuiltPrompt, usage: dict, student_id: str, entry_json: str, reply_tokens: int) -> dict:
+    """
+    This student's share of a multi-student call: the shared instructions split
+    evenly plus their own data for the prompt, their own entry for the completion
+    (both scaled to the API's totals).
+    """
+    local_prompt = max(1, built.prompt_tokens)
+    n = len(built.context)
+    entry = next(e for e in built.context if e["id"] == student_id)
+    share = (local_prompt - sum(count_tokens(dumps_compact(e)) for e in built.context)) / n
+    share += count_tokens(dumps_compact(entry))
+    prompt_tokens = usage.get("prompt_tokens", local_prompt)
+    completion_tokens = usage.get("completion_tokens", reply_tokens)
+    return {
+        "prompt_tokens": round(prompt_tokens * share / local_prompt),
+        "completion_tokens": round(completion_tokens * count_tokens(entry_json) / max(1, reply_tokens)),
+        "source": usage.get("source", "estimate"),
+        "prompt_tokens_local": round(share),
+        "prompt_budget": built.budget // n,
+        "omitted": dict(built.omitted.get(student_id, {})),
+        "batch_size": n,
+    }
+
+
+def _generate_batch(summary_dicts: list, budget: int = None) -> list:
+    """
+    One request for all of `summary_dicts`. Returns a list aligned with the input:
+    the sanitized feedback for every student whose entry came back complete, None
+    for the others.
+    """
+    ids = [f"s{i}" for i in range(len(summary_dicts))]
+    built = build_batch_prompt(
+        {student_id: _slim_context(summary) for student_id, summary in zip(ids, summary_dicts)},
+        budget=budget,
+    )
+    usage = {}
+    raw_response = get_completion(
+        built.text, max_tokens=MAX_TOKENS_PER_STUDENT * len(ids), usage=usage,
+    )
+    entries = _split_batch_response(raw_response)
+
+    # Match entries by their "id"; an entry with a missing/unknown id takes its position
+    by_id = {}
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        student_id = entry.get("id")
+        if student_id not in ids and i < len(ids):
+            student_id = ids[i]
+        by_id.setdefault(student_id, entry)
+
+    reply_tokens = count_tokens(raw_response or "")
+    results = []
+    for student_id in ids:
+        entry = by_id.get(student_id)
+        if entry is None or not set(FEEDBACK_SECTIONS) <= set(entry):
+            results.append(None)
+            continue
+        feedback = _sanitize_feedback(entry)
+        if not feedback["intro"] or not feedback["breakdown"]:
+            results.append(None)
+            continue
+        feedback["usage"] = _batch_usage(built, usage, student_id, json.dumps(entry), reply_tokens)
+        results.append(feedback)
+
+    missing = results.count(None)
+    if missing == len(ids):
+        forget_completion(usage)   # nothing usable: don't replay this reply on the next run
+    logger.info(
+        "batch feedback call: %d students, %d prompt + %d completion tokens (%s), %d to retry",
+        len(ids), usage.get("prompt_tokens", built.prompt_tokens), usage.get("completion_tokens", 0),
+        usage.get("source", "estimate"), missing,
+    )
+    return results
+
+
+def generate_feedback_batch(
+    summary_dicts: list,
+    batch_size: int = None,
+    budget: int = None,
+    return_exceptions: bool = False,
+) -> list:
+    """
+    Batch mode of generate_feedback_sections: feedback for many students, packed
+    `batch_size` (default FEEDBACK_BATCH_SIZE) per request. Every request starts
+    with the same instructions, so the provider can serve them from its prompt
+    cache, and the model answers with a JSON array keyed by student.
+
+    Returns one feedback dict per summary, in order, each with the same keys as
+    generate_feedback_sections (its "usage" is that student's share of the call,
+    plus "batch_size"). Students whose entry is missing or malformed, or whose
+    whole batch failed, are retried one by one with generate_feedback_sections.
+    With return_exceptions=True a student that still fails yields the exception
+    instead of aborting the rest.
+    """
+    batch_size = max(1, batch_size or FEEDBACK_BATCH_SIZE)
+    results = [None] * len(summary_dicts)
+
+    # 1) One request per group of batch_size students
+    for lo in range(0, len(summary_dicts), batch_size):
+        group = summary_dicts[lo:lo + batch_size]
+        if len(group) == 1:
+            continue
+        try:
+            results[lo:lo + len(group)] = _generate_batch(group, budget=budget)
+        except Exception as e:
+            logger.warning("batch feedback call for %d students failed (%s); retrying one by one", len(group), e)
+
+    # 2) Whatever did not come back usable goes through the one-student path
+    for i, feedback in enumerate(results):
+        if feedback is not None:
+            continue
+        try:
+            results[i] = generate_feedback_sections(summary_dicts[i], budget=budget)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            results[i] = e
+    return results
+
+
+# ─── Streaming ─────────────────────────────────────────────────────────────────────
+
+class _TopLevelJSONScanner:
+    """
+    Incrementally scans a streamed JSON object and reports each top-level
+    key/value pair as soon as its value is complete, e.g. "intro" is available as
+    soon as its closing quote arrives, long before "suggestions" has started.
+    Anything before the first "{" (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self.pos = 0
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+        self.expect = "key"      # "key" → "colon" → "value" → "comma"
+
+    def feed(self, chunk: str) -> list:
+        """
+        Append a chunk; return a list of (key, value) pairs completed by it.
+        """
+        if self.done:
+            return []
+        self.text += chunk
+        completed = []
+        text = self.text
+        i = self.pos
+        n = len(text)
+        while i < n:
+            ch = text[i]
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self.depth = 1
+                i += 1
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.expect == "key":
+                        self.key = json.loads(text[self.key_start:i + 1])
+                        self.expect = "colon"
+                    elif self.depth == 1 and self.expect == "value":
+                        self._complete(completed, text[self.value_start:i + 1])
+                i += 1
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                if self.depth == 1 and self.expect == "key":
+                    self.key_start = i
+                elif self.depth == 1 and self.expect == "value" and self.value_start is None:
+                    self.value_start = i
+            elif ch in "{[":
+                if self.depth == 1 and self.expect == "value" and self.value_start is None:
+                    self.value_start = i
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 1 and self.expect == "value":
+                    self._complete(completed, text[self.value_start:i + 1])
+                elif self.depth == 0:
+                    # End of the object: flush a trailing scalar value, if any
+                    if self.expect == "value" and self.value_start is not None:
+                        self._complete(completed, text[self.value_start:i])
+                    self.pos = n
+                    self.done = True
+                    return completed
+            elif self.depth == 1:
+                if ch == ":" and self.expect == "colon":
+                    self.expect = "value"
+                    self.value_start = None
+                elif ch == ",":
+                    if self.expect == "value" and self.value_start is not None:
+                        self._complete(completed, text[self.value_start:i])
+                    self.expect = "key"
+                elif not ch.isspace() and self.expect == "value" and self.value_start is None:
+                    self.value_start = i
+            i += 1
+        self.pos = i
+        return completed
+
+    def _complete(self, completed: list, raw_value: str):
+        try:
+            completed.append((self.key, json.loads(raw_value)))
+        except json.JSONDecodeError:
+            # Leave it for the full parse at the end of the stream
+            pass
+        self.expect = "comma"
+        self.value_start = None
+
+
+def stream_feedback_sections(summary_dict: dict, budget: int = None, fallback: bool = True):
+    """
+    Streaming counterpart of generate_feedback_sections.
+
+    Yields the feedback dict every time another top-level section finishes
+    arriving, each time with all sections received so far (already sanitized), so
+    the UI can show "intro" while "breakdown" and "suggestions" are still being
+    generated. The last yielded dict is always complete, with the same shape as
+    generate_feedback_sections' result (including "usage").
+
+    With `fallback` (the default), an LLM error ends the stream with rule-based
+    feedback instead of raising; sections the LLM already finished are kept.
+
+    A caller whose prompt is already being streamed for someone else (see
+    generate_feedback_sections) waits for that stream and gets one complete dict.
+    """
+    built = _build_prompt(summary_dict, budget=budget)
+    try:
+        call, shared = _join_flight(built)
+    except Exception as e:
+        if not fallback:
+            raise
+        yield rule_fallback(summary_dict, f"{type(e).__name__}: {e}")
+        return
+    if shared is not None:
+        yield shared
+        return
+
+    scanner = _TopLevelJSONScanner()
+    partial = {}
+    chunks = []
+    usage = {}
+    try:
+        for chunk in get_completion(built.text, stream=True, usage=usage):
+            chunks.append(chunk)
+            new_pairs = scanner.feed(chunk)
+            if not new_pairs:
+                continue
+            for key, value in new_pairs:
+                partial[key] = value
+            sanitized = _sanitize_feedback(partial)
+            yield {k: sanitized[k] for k in sanitized if k in partial}
+
+        raw_response = "".join(chunks)
+        if set(partial) >= set(FEEDBACK_SECTIONS):
+            feedback = partial
+        else:
+            # The incremental scan missed something (e.g. a malformed value or a cut-off
+            # reply): repair it all at once and ask again for whatever is still missing
+            feedback = _complete_sections(built, raw_response, usage)
+    except GeneratorExit:
+        if call is not None:
+            call.abandon()   # closed early: whoever was waiting makes the request
+        raise
+    except Exception as e:
+        forget_completion(usage)
+        if call is not None:
+            call.finish(error=e)
+        if not fallback:
+            raise
+        sanitized = _sanitize_feedback(partial)
+        yield rule_fallback(summary_dict, f"{type(e).__name__}: {e}", {k: sanitized[k] for k in partial if k in sanitized})
+        return
+    feedback = _sanitize_feedback(feedback)
+    feedback["usage"] = _usage_report(built, usage)
+    if call is not None:
+        call.finish(copy.deepcopy(feedback))
+    yield feedback
@@ -0,0 +1,637 @@
+# app/job_queue.py
+#
+# Durable local job queue for report generation: a submission is enqueued once, a
+# pool of worker processes runs parse → charts + feedback → PDF on it, and the PDF
+# is kept for later download, whether or not whoever enqueued it is still around.
+#
+#   python -m app.job_queue enqueue data/mock_test_1/ --engine llm
+#   python -m app.job_queue work --workers 4            # until Ctrl-C (--drain: until the queue is empty)
+#   python -m app.job_queue status [JOB_ID]
+#   python -m app.job_queue fetch JOB_ID --out report.pdf
+#
+# Layout under `root`:
+#   jobs.sqlite              one row per job: status, stage, progress, attempts, errors
+#   inputs/<job_id>.json     the submission, until the job is done
+#   results/<job_id>.pdf     the finished report
+#
+# A worker claims a job by taking a lease on it and renews the lease while it works.
+# A job whose worker died (crash, kill, restart) is claimed again once its lease runs
+# out, or straight away by the next WorkerPool started on the same machine. Feedback
+# is saved with the job as soon as it exists, so a resumed job does not pay for the
+# LLM call twice. A failing job is retried with exponential backoff up to
+# max_attempts times; a submission that does not parse fails at once.
+#
+# Workers are independent processes sharing nothing but the database (WAL mode,
+# short transactions), so throughput grows with --workers until the CPU (parse,
+# charts, PDF) or the LLM rate limit runs out.
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from app.warm_worker import process_context
+
+logger = logging.getLogger("app.job_queue")
+
+DEFAULT_QUEUE_DIR = os.path.join(os.environ.get("FEEDBACK_CACHE_DIR", ".cache"), "jobs")
+
+# Seconds a claimed job stays reserved without a renewal; renewed every LEASE_S / 3
+LEASE_S = float(os.environ.get("FEEDBACK_QUEUE_LEASE_S", "60"))
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_S = 5.0
+
+STATUSES = ("queued", "running", "done", "failed")
+
+# Progress reported when each stage starts
+STAGE_PROGRESS = {"parse": 0.05, "charts+feedback": 0.2, "pdf": 0.8}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id         TEXT PRIMARY KEY,
+    submission_id  TEXT,
+    student_name   TEXT,
+    engine         TEXT NOT NULL,     -- "rules" or "llm"
+    status         TEXT NOT NULL,     -- queued | running | done | failed
+    stage          TEXT,
+    progress       REAL NOT NULL DEFAULT 0,
+    attempts       INTEGER NOT NULL DEFAULT 0,
+    max_attempts   INTEGER NOT NULL,
+    not_before     REAL NOT NULL,     -- epoch seconds; retries wait out their backoff
+    worker         TEXT,              -- "<host>:<pid>" of the current/last worker
+    lease_until    REAL,
+    error          TEXT,
+    feedback_json  TEXT,              -- checkpoint: kept across retries
+    result_bytes   INTEGER,
+    created_at     REAL NOT NULL,
+    started_at     REAL,
+    finished_at    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, not_before, created_at);
+"""
+
+# Columns returned by get()/list_jobs(); the feedback checkpoint is left out
+_JOB_COLUMNS = (
+    "job_id", "submission_id", "student_name", "engine", "status", "stage", "progress", "attempts",
+    "max_attempts", "worker", "error", "result_bytes", "created_at", "started_at", "finished_at",
+)
+
+
+class PermanentJobError(ValueError):
+    """
+    A job that can never succeed (e.g. the submission does not parse); not retried.
+    """
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of report jobs under `root`. Safe to share between
+    processes; every method is one short transaction.
+    """
+
+    def __init__(self, root: str = DEFAULT_QUEUE_DIR):
+        self.root = root
+        self.db_path = os.path.join(root, "jobs.sqlite")
+        self.inputs_dir = os.path.join(root, "inputs")
+        self.results_dir = os.path.join(root, "results")
+        os.makedirs(self.inputs_dir, exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _exclusive(self):
+        """
+        A write transaction taken up front (BEGIN IMMEDIATE), so read-then-update
+        sequences such as claiming a job cannot interleave between processes.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def input_path(self, job_id: str) -> str:
+        return os.path.join(self.inputs_dir, f"{job_id}.json")
+
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.results_dir, f"{job_id}.pdf")
+
+    # ─── Enqueue ──────────────────────────────────────────────────────────────────
+
+    def enqueue(
+        self,
+        raw_bytes: bytes,
+        engine: str = "llm",
+        submission_id: str = None,
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> str:
+        """
+        Add one submission (JSON bytes, as uploaded) and return its job id.
+        """
+        if engine not in ("rules", "llm"):
+            raise ValueError(f"Unknown feedback engine: {engine!r}")
+        job_id = uuid.uuid4().hex
+        # Input first, then the row: a worker never sees a job without its input
+        tmp_path = f"{self.input_path(job_id)}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(raw_bytes)
+        os.replace(tmp_path, self.input_path(job_id))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, submission_id, engine, status, max_attempts, not_before, created_at)"
+                " VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, submission_id, engine, max_attempts, now, now),
+            )
+        return job_id
+
+    def enqueue_sources(self, source, engine: str = "llm") -> list:
+        """
+        Enqueue every submission found in `source` (directory, glob, file or list; a
+        file may hold a list of submissions). Returns the job ids in file order.
+        """
+        from app.data_processor import STREAM_THRESHOLD_BYTES, _submission_id, expand_sources
+        from app.stream_parser import iter_submissions
+
+        job_ids = []
+        for path in expand_sources(source):
+            if os.path.getsize(path) > STREAM_THRESHOLD_BYTES:
+                submissions = iter_submissions(path)
+            else:
+                with open(path, "rb") as f:
+                    parsed = json.loads(f.read().decode("utf-8"))
+                submissions = parsed if isinstance(parsed, list) else [parsed]
+            for i, submission in enumerate(submissions):
+                if isinstance(submission, dict):
+                    raw_bytes = json.dumps(submission).encode("utf-8")
+                    job_ids.append(self.enqueue(raw_bytes, engine, _submission_id(submission, path, i)))
+        return job_ids
+
+    # ─── Status ───────────────────────────────────────────────────────────────────
+
+    def get(self, job_id: str):
+        """
+        The job's row as a dict, or None if there is no such job.
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def list_jobs(self, status: str = None, limit: int = 50) -> list:
+        """
+        Most recent jobs first, optionally only those with `status`.
+        """
+        sql = f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs"
+        params = ()
+        if status:
+            sql, params = sql + " WHERE status = ?", (status,)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(sql + " ORDER BY created_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self) -> dict:
+        """
+        {status: number of jobs}, every status included.
+        """
+        with self._connect() as conn:
+            rows = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {status: rows.get(status, 0) for status in STATUSES}
+
+    def read_result(self, job_id: str) -> bytes:
+        """
+        The finished PDF. Raises ValueError if the job is not done.
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] != "done":
+            raise ValueError(f"Job {job_id!r} has no result (status: {job and job['status']}).")
+        with open(self.result_path(job_id), "rb") as f:
+            return f.read()
+
+    def retry(self, job_id: str) -> bool:
+        """
+        Put a failed job back in the queue with a fresh set of attempts.
+        """
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, error = NULL, not_before = ?"
+                " WHERE job_id = ? AND status = 'failed'",
+                (time.time(), job_id),
+            )
+        return cur.rowcount == 1
+
+    # ─── Worker side ──────────────────────────────────────────────────────────────
+
+    def claim(self, worker: str):
+        """
+        Lease the oldest runnable job to `worker` and return (job_id, engine,
+        feedback checkpoint or None), or None when nothing is runnable. Runnable
+        means queued and past its backoff, or running under an expired lease. An
+        expired job that has used up its attempts is failed instead.
+        """
+        now = time.time()
+        with self._exclusive() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT job_id, engine, feedback_json, status, attempts, max_attempts, worker FROM jobs"
+                    " WHERE (status = 'queued' AND not_before <= ?) OR (status = 'running' AND lease_until < ?)"
+                    " ORDER BY created_at LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, engine, feedback_json, status, attempts, max_attempts, previous = row
+                if status == "running" and attempts >= max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', finished_at = ?,"
+                        " error = COALESCE(error, 'worker lost') || ' (attempts exhausted)' WHERE job_id = ?",
+                        (now, job_id),
+                    )
+                    continue
+                if status == "running":
+                    logger.warning("job %s: lease of %s expired, resuming", job_id, previous)
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1,"
+                    " started_at = COALESCE(started_at, ?), stage = NULL WHERE job_id = ?",
+                    (worker, now + LEASE_S, now, job_id),
+                )
+                return job_id, engine, json.loads(feedback_json) if feedback_json else None
+
+    def heartbeat(self, job_id: str, worker: str, stage: str = None, progress: float = None) -> bool:
+        """
+        Renew `worker`'s lease on the job, optionally recording stage/progress.
+        False if the job is no longer leased to `worker`.
+        """
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_until = ?, stage = COALESCE(?, stage), progress = COALESCE(?, progress)"
+                " WHERE job_id = ? AND worker = ? AND status = 'running'",
+                (time.time() + LEASE_S, stage, progress, job_id, worker),
+            )
+        return cur.rowcount == 1
+
+    def save_feedback(self, job_id: str, student_name: str, feedback: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET student_name = ?, feedback_json = ? WHERE job_id = ?",
+                (student_name, json.dumps(feedback), job_id),
+            )
+
+    def complete(self, job_id: str, worker: str, pdf_bytes: bytes):
+        """
+        Store the PDF (atomically) and mark the job done; its input is removed.
+        """
+        path = self.result_path(job_id)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', stage = NULL, progress = 1.0, error = NULL, result_bytes = ?,"
+                " finished_at = ?, lease_until = NULL WHERE job_id = ? AND worker = ?",
+                (len(pdf_bytes), time.time(), job_id, worker),
+            )
+        try:
+            os.remove(self.input_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def fail(self, job_id: str, worker: str, error: str, permanent: bool = False):
+        """
+        Record a failed attempt: back to the queue after a backoff while attempts
+        remain (and the error is not permanent), otherwise failed for good.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            attempts, max_attempts = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if permanent or attempts >= max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease_until = NULL"
+                    " WHERE job_id = ? AND worker = ?",
+                    (error, now, job_id, worker),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, not_before = ?, lease_until = NULL"
+                    " WHERE job_id = ? AND worker = ?",
+                    (error, now + RETRY_BACKOFF_S * 2 ** (attempts - 1), job_id, worker),
+                )
+
+    def recover(self) -> int:
+        """
+        Requeue running jobs whose worker was a process on this machine that no
+        longer exists, so a restart resumes them without waiting for the lease.
+        """
+        host = socket.gethostname()
+        with self._exclusive() as conn:
+            stale = [
+                job_id
+                for job_id, worker in conn.execute("SELECT job_id, worker FROM jobs WHERE status = 'running'")
+                if worker and worker.rpartition(":")[0] == host and not _pid_alive(int(worker.rpartition(":")[2]))
+            ]
+            for job_id in stale:
+                conn.execute("UPDATE jobs SET lease_until = 0 WHERE job_id = ?", (job_id,))
+        return len(stale)
+
+
+# ─── Workers ──────────────────────────────────────────────────────────────────────
+
+class _Lease:
+    """
+    Renews a job's lease in the background while the worker is busy with it.
+    """
+
+    def __init__(self, queue: JobQueue, job_id: str, worker: str):
+        self.queue, self.job_id, self.worker = queue, job_id, worker
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._renew, daemon=True)
+
+    def _renew(self):
+        while not self._done.wait(LEASE_S / 3):
+            if not self.queue.heartbeat(self.job_id, self.worker):
+                logger.warning("job %s: lease lost", self.job_id)
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+
+
+_chart_renderer = None
+
+
+def process_job(queue: JobQueue, job_id: str, engine: str, feedback, worker: str):
+    """
+    Run one claimed job through parse → charts + feedback → PDF and store the result.
+    Charts render while the feedback is written; `feedback` is the checkpoint from
+    an earlier attempt, if any. One ChartRenderer is kept per worker process.
+    """
+    global _chart_renderer
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.charts import ChartRenderer
+    from app.cohort_stats import load_cohort_benchmark
+    from app.data_processor import STREAM_THRESHOLD_BYTES, parse_json_stream_to_df, parse_json_to_df
+    from app.feedback_generator import generate_feedback
+    from app.pdf_generator import create_pdf_report
+
+    # 1) Parse; a submission that does not parse will not parse on a retry either
+    queue.heartbeat(job_id, worker, "parse", STAGE_PROGRESS["parse"])
+    path = queue.input_path(job_id)
+    try:
+        if os.path.getsize(path) > STREAM_THRESHOLD_BYTES:
+            df_questions, summary_dict = parse_json_stream_to_df(path)
+        else:
+            with open(path, "rb") as f:
+                df_questions, summary_dict = parse_json_to_df(f.read())
+    except (ValueError, KeyError, TypeError) as e:
+        raise PermanentJobError(f"submission does not parse: {type(e).__name__}: {e}") from e
+    cohort = load_cohort_benchmark()
+    if cohort is not None:
+        summary_dict = cohort.with_percentiles(summary_dict)
+
+    # 2) Feedback on a thread (unless checkpointed) while the charts render here
+    queue.heartbeat(job_id, worker, "charts+feedback", STAGE_PROGRESS["charts+feedback"])
+    with ThreadPoolExecutor(max_workers=1) as llm_thread:
+        pending = llm_thread.submit(generate_feedback, summary_dict, engine) if feedback is None else None
+        if _chart_renderer is None:
+            _chart_renderer = ChartRenderer()
+        charts = _chart_renderer.render_all(df_questions, summary_dict)
+        if pending is not None:
+            feedback = pending.result()
+            queue.save_feedback(job_id, summary_dict["student_name"], feedback)
+
+    # 3) PDF, stored with the job
+    queue.heartbeat(job_id, worker, "pdf", STAGE_PROGRESS["pdf"])
+    pdf_bytes = create_pdf_report(student_name=summary_dict["student_name"], feedback=feedback, chart_figs=charts)
+    queue.complete(job_id, worker, pdf_bytes)
+
+
+def worker_loop(root: str, stop_event, poll_interval: float = 0.5, drain: bool = False,
+                initializer=None, initargs=()):
+    """
+    Claim and process jobs until `stop_event` is set (or, with `drain`, until no
+    job is runnable). Entry point of each WorkerPool process.
+    """
+    # Ctrl-C reaches the whole process group; the pool's parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer is not None:
+        initializer(*initargs)
+    queue = JobQueue(root)
+    worker = _worker_id()
+    while not stop_event.is_set():
+        claimed = queue.claim(worker)
+        if claimed is None:
+            if drain:
+                return
+            stop_event.wait(poll_interval)
+            continue
+        job_id, engine, feedback = claimed
+        start = time.perf_counter()
+        try:
+            with _Lease(queue, job_id, worker):
+                process_job(queue, job_id, engine, feedback, worker)
+            logger.info("job %s done in %.1fs", job_id, time.perf_counter() - start)
+        except PermanentJobError as e:
+            logger.error("job %s failed: %s", job_id, e)
+            queue.fail(job_id, worker, str(e), permanent=True)
+        except Exception as e:
+            logger.exception("job %s attempt failed", job_id)
+            queue.fail(job_id, worker, f"{type(e).__name__}: {e}")
+
+
+class WorkerPool:
+    """
+    `workers` processes running worker_loop on the queue at `root`. The processes
+    fork from the preloaded forkserver (app.warm_worker.process_context), so they
+    start warm. `initializer(*initargs)` runs first in each of them, as with
+    ProcessPoolExecutor.
+    """
+
+    def __init__(self, root: str = DEFAULT_QUEUE_DIR, workers: int = 2, poll_interval: float = 0.5,
+                 drain: bool = False, initializer=None, initargs=()):
+        self.root = root
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.drain = drain
+        self.initializer = initializer
+        self.initargs = initargs
+        self._processes = []
+        self._stop = None
+
+    def start(self) -> "WorkerPool":
+        recovered = JobQueue(self.root).recover()
+        if recovered:
+            logger.info("resuming %d job(s) left running by a previous run", recovered)
+        ctx = process_context()
+        self._stop = ctx.Event()
+        self._processes = [
+            ctx.Process(
+                target=worker_loop,
+                args=(self.root, self._stop, self.poll_interval, self.drain, self.initializer, self.initargs),
+                name=f"job-worker-{i}",
+                daemon=True,
+            )
+            for i in range(self.workers)
+        ]
+        for process in self._processes:
+            process.start()
+        return self
+
+    def alive(self) -> int:
+        return sum(process.is_alive() for process in self._processes)
+
+    def join(self, timeout: float = None):
+        for process in self._processes:
+            process.join(timeout)
+
+    def stop(self, timeout: float = None):
+        """
+        Let every worker finish its current job, then exit. Workers still busy after
+        `timeout` seconds are terminated; their jobs are resumed on the next start.
+        """
+        self._stop.set()
+        self.join(timeout)
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool(workers: int = None) -> WorkerPool:
+    """
+    Process-wide WorkerPool on DEFAULT_QUEUE_DIR, started on first use (the
+    Streamlit app uses this). Size: `workers`, else $FEEDBACK_QUEUE_WORKERS, else 2.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or not _pool.alive():
+            workers = workers or int(os.environ.get("FEEDBACK_QUEUE_WORKERS", "2"))
+            _pool = WorkerPool(DEFAULT_QUEUE_DIR, workers).start()
+        return _pool
+
+
+# ─── CLI ──────────────────────────────────────────────────────────────────────────
+
+def _print_jobs(jobs: list):
+    print(f"{'job':<32}  {'status':<8} {'stage':<16} {'progress':>8} {'tries':>5}  student / error")
+    for job in jobs:
+        note = job["error"] if job["status"] == "failed" else (job["student_name"] or job["submission_id"] or "")
+        print(f"{job['job_id']:<32}  {job['status']:<8} {job['stage'] or '-':<16} "
+              f"{job['progress']:>8.0%} {job['attempts']:>5}  {note}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.job_queue", description="Durable report job queue.")
+    parser.add_argument("--root", default=DEFAULT_QUEUE_DIR, help="queue directory")
+    parser.add_argument("--log-level", default="INFO")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="add every submission found in the sources")
+    enqueue.add_argument("source", nargs="+", help="directory, glob pattern or JSON file(s)")
+    enqueue.add_argument("--engine", choices=("rules", "llm"), default="llm")
+
+    work = commands.add_parser("work", help="run workers until interrupted")
+    work.add_argument("--workers", type=int, default=2)
+    work.add_argument("--drain", action="store_true", help="exit once no job is left to run")
+
+    status = commands.add_parser("status", help="queue counts and recent jobs, or one job")
+    status.add_argument("job_id", nargs="?")
+    status.add_argument("--limit", type=int, default=20)
+
+    fetch = commands.add_parser("fetch", help="write a finished job's PDF")
+    fetch.add_argument("job_id")
+    fetch.add_argument("--out", required=True)
+
+    retry = commands.add_parser("retry", help="requeue a failed job")
+    retry.add_argument("job_id")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(processName)s %(message)s")
+    queue = JobQueue(args.root)
+
+    if args.command == "enqueue":
+        job_ids = queue.enqueue_sources(args.source, args.engine)
+        logger.info("enqueued %d job(s); queue: %s", len(job_ids), queue.counts())
+    elif args.command == "work":
+        start = time.perf_counter()
+        before = queue.counts()["done"]
+        pool = WorkerPool(args.root, args.workers, drain=args.drain).start()
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            logger.info("stopping after the current jobs (Ctrl-C again to abandon them; they will resume)")
+            pool.stop()
+        done = queue.counts()["done"] - before
+        wall = time.perf_counter() - start
+        logger.info("%d job(s) done in %.1fs (%.2f/s); queue: %s", done, wall, done / wall, queue.counts())
+    elif args.command == "status":
+        if args.job_id:
+            job = queue.get(args.job_id)
+            if job is None:
+                raise SystemExit(f"No job {args.job_id!r}.")
+            print(json.dumps(job, indent=1))
+        else:
+            print(queue.counts())
+            _print_jobs(queue.list_jobs(limit=args.limit))
+    elif args.command == "fetch":
+        with open(args.out, "wb") as f:
+            f.write(queue.read_result(args.job_id))
+    elif args.command == "retry":
+        if not queue.retry(args.job_id):
+            raise SystemExit(f"Job {args.job_id!r} is not failed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+# app/json_repair.py
+#
+# Tolerant extraction of the JSON object (or array) in an LLM reply.
+#
+#   text, complete = repair_json(raw)
+#   if complete:
+#       value = json.loads(text)
+#
+# repair_json returns the outermost JSON value found in `raw` with the usual model
+# mistakes fixed, so json.loads accepts it:
+#   - prose or ``` fences before and after the JSON are dropped;
+#   - raw line breaks, tabs and other control characters inside strings are escaped;
+#   - trailing commas before "}" / "]" are removed, and a "]" / "}" that closes the
+#     wrong container is replaced by the right one;
+#   - a final string missing its closing quote ('..."last tip]}') is closed when
+#     only the brackets that end the value follow it.
+# `complete` is False when the text ends before the outermost value does (e.g. the
+# reply hit max_tokens). The repaired text then stops where the input did; nothing
+# is invented to close it, so callers can keep whatever values did finish (see
+# feedback_generator._salvage_sections) and ask again for the rest.
+
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _escape_control(ch: str) -> str:
+    return _CONTROL_ESCAPES.get(ch) or f"\\u{ord(ch):04x}"
+
+
+def _drop_trailing_comma(out: list):
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i]
+
+
+def _scan(text: str, start: int) -> tuple:
+    """
+    One pass over text[start:] (which begins with "{" or "["). Returns
+    (repaired, complete, stack, string_start), the last two describing where an
+    incomplete value stopped: the closers still owed, and the index in `text` of
+    the opening quote of an unterminated string (None if not inside one).
+    """
+    out = []
+    stack = []
+    in_string = escape = False
+    string_start = None
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+            elif ch < " ":
+                out.append(_escape_control(ch))
+            else:
+                out.append(ch)
+            continue
+
+        if ch == '"':
+            in_string = True
+            string_start = i
+            out.append(ch)
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            out.append(stack.pop())
+            if not stack:
+                return "".join(out), True, [], None
+        else:
+            out.append(ch)
+    return "".join(out), False, stack, string_start if in_string else None
+
+
+def _close_final_string(text: str, stack: list, string_start: int):
+    """
+    `text` patched with the missing closing quote of the string opened at
+    string_start, if all that follows it in the string is exactly the brackets
+    still owed (whitespace and commas allowed between them); otherwise None.
+    """
+    i = len(text)
+    for closer in stack:   # outermost last in the text, so first going backwards
+        i -= 1
+        while i > string_start and (text[i].isspace() or text[i] == ","):
+            i -= 1
+        if i <= string_start or text[i] != closer:
+            return None
+    body = text[string_start + 1:i].rstrip()
+    if not body or (len(body) - len(body.rstrip("\\"))) % 2:
+        return None
+    return text[:string_start + 1] + body + '"' + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> tuple:
+    """
+    (repaired, complete) for the first JSON object or array in `text`; ("", False)
+    if there is none. See the module comment for what is repaired.
+    """
+    if not isinstance(text, str):
+        return "", False
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return "", False
+    start = min(starts)
+
+    repaired, complete, stack, string_start = _scan(text, start)
+    if not complete and string_start is not None:
+        patched = _close_final_string(text, stack, string_start)
+        if patched is not None:
+            closed, ok, _, _ = _scan(patched, start)
+            if ok:
+                return closed, True
+    return repaired, complete
@@ -0,0 +1,148 @@
+# app/llm_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_CACHE_PATH = os.path.join(os.environ.get("FEEDBACK_CACHE_DIR", ".cache"), "llm_responses.sqlite")
+
+
+class LLMCacheMiss(LookupError):
+    """
+    Raised in cache-only mode when a prompt has no stored response.
+    """
+
+
+def make_key(prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+    """
+    Cache key for one completion request: (model, temperature, max_tokens, prompt hash).
+    """
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    material = json.dumps([model, float(temperature), int(max_tokens), prompt_hash])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed store of LLM responses with a TTL and LRU eviction.
+
+    Entries older than `ttl_seconds` are treated as misses and deleted on read.
+    Once more than `max_entries` rows exist, the least recently read ones are dropped.
+    The database file is safe to share between processes (WAL mode, one short
+    transaction per call). Hit/miss counters are kept per process in `stats`.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 5000,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0}
+        self._stats_lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key         TEXT PRIMARY KEY,
+                    model       TEXT NOT NULL,
+                    response    TEXT NOT NULL,
+                    created_at  REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def get(self, key: str):
+        """
+        Return the cached response for `key`, or None on a miss / expired entry.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            response, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count("expired")
+                self._count("misses")
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return response
+
+    def put(self, key: str, response: str, model: str = ""):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            # LRU eviction: keep only the max_entries most recently used rows
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "  SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            )
+        self._count("writes")
+
+    def delete(self, key: str):
+        """
+        Drop the response stored for `key`, e.g. one that turned out to be unusable.
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """
+    Process-wide LLMCache used by get_completion.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
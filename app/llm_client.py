@@ -1,61 +1,500 @@
-# app/llm_client.py
-
-import requests
-
-# ─── Hard-code your Groq API Key here ───────────────────────────────────────────────
-GROQ_API_KEY = "put ur api key"
-
-GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_TEXT_URL = "https://api.groq.com/v1/completions"
-API_URL = GROQ_CHAT_URL  # or switch to GROQ_TEXT_URL if needed
-
-def _get_api_key() -> str:
-    if not isinstance(GROQ_API_KEY, str) or not GROQ_API_KEY.strip():
-        raise EnvironmentError(
-            "GROQ_API_KEY is not set correctly in app/llm_client.py."
-        )
-    return GROQ_API_KEY.strip()
-
-def get_completion(
-    prompt: str,
-    model: str = "meta-llama/llama-4-scout-17b-16e-instruct",
-    max_tokens: int = 2000,
-    temperature: float = 0.7,
-) -> str:
-    api_key = _get_api_key()
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-
-    if API_URL == GROQ_CHAT_URL:
-        payload = {
-            "model": model,
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "n": 1
-        }
-    else:
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "n": 1
-        }
-
-    resp = requests.post(API_URL, headers=headers, json=payload)
-    resp.raise_for_status()
-    data = resp.json()
-
-    if API_URL == GROQ_CHAT_URL:
-        try:
-            return data["choices"][0]["message"]["content"]
-        except (KeyError, IndexError):
-            raise ValueError(f"Unexpected chat response: {data}")
-    else:
-        try:
-            return data["choices"][0]["text"]
-        except (KeyError, IndexError):
-            raise ValueError(f"Unexpected text response: {data}")
+# app/llm_client.py
+
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.llm_cache import LLMCacheMiss, get_llm_cache, make_key
+from app.metrics import METRICS_ENABLED, span
+from app.prompt_builder import count_tokens
+
+# ─── Hard-code your Groq API Key here ───────────────────────────────────────────────
+GROQ_API_KEY = "put ur api key"
+
+GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_TEXT_URL = "https://api.groq.com/v1/completions"
+API_URL = GROQ_CHAT_URL  # or switch to GROQ_TEXT_URL if needed
+
+DEFAULT_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+# Response cache mode (see app/llm_cache.py):
+#   "readwrite" – serve identical requests from the cache, store new responses (default)
+#   "off"       – always call the API
+#   "only"      – never call the API; a miss raises LLMCacheMiss (useful for offline tests)
+LLM_CACHE_MODE = os.environ.get("LLM_CACHE_MODE", "readwrite")
+
+# HTTP statuses worth retrying: rate limiting and transient server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def _get_api_key() -> str:
+    if not isinstance(GROQ_API_KEY, str) or not GROQ_API_KEY.strip():
+        raise EnvironmentError(
+            "GROQ_API_KEY is not set correctly in app/llm_client.py."
+        )
+    return GROQ_API_KEY.strip()
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    Local token estimate used for rate limiting (see prompt_builder.count_tokens).
+    """
+    return max(1, count_tokens(text))
+
+
+def _record_usage(usage, prompt: str, content: str, api_usage=None, source: str = "api", cache_key: str = None):
+    """
+    Fill the caller's `usage` dict (if any) with prompt/completion token counts:
+    the API's own numbers when it reported them, else local estimates. `cache_key`
+    is the response cache entry the content came from or went to (see forget_completion).
+    """
+    if usage is None:
+        return
+    if api_usage and "prompt_tokens" in api_usage:
+        prompt_tokens = api_usage["prompt_tokens"]
+        completion_tokens = api_usage.get("completion_tokens", 0)
+    else:
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(content)
+        if source == "api":
+            source = "estimate"
+    usage.update({
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "source": source,       # "api", "estimate" (API sent no usage) or "cache"
+    })
+    if cache_key is not None:
+        usage["cache_key"] = cache_key
+
+
+def _parse_retry_after(value):
+    """
+    Retry-After may be delta-seconds or an HTTP date. Returns seconds, or None.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenRateLimiter:
+    """
+    Token bucket enforcing a tokens-per-minute budget across threads.
+    A request larger than the whole bucket is let through once the bucket is full.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: int):
+        needed = min(float(tokens), self.capacity)
+        with self._cond:
+            while True:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= needed
+                    return
+                self._cond.wait((needed - self._tokens) / self.rate)
+
+    def refund(self, tokens: int):
+        """
+        Give back tokens that were reserved but not used (estimate minus actual usage).
+        Negative values charge extra.
+        """
+        with self._cond:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + tokens)
+            self._cond.notify_all()
+
+
+class LLMClient:
+    """
+    Reusable client for the Groq completions API.
+
+      - one pooled requests.Session, so keep-alive and TLS sessions are reused
+      - separate connect/read timeouts
+      - retries on 429/5xx and connection errors with exponential backoff and full
+        jitter; a Retry-After header, when sent, takes precedence
+      - optional tokens-per-minute limiter shared by all threads using the client
+      - get_completions() fans a list of prompts out over a bounded thread pool
+
+    `api_url` and `api_key` can point at a local stub server for testing.
+    """
+
+    def __init__(
+        self,
+        api_url: str = None,
+        api_key: str = None,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 120.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        pool_size: int = 32,
+        tokens_per_minute: int = None,
+    ):
+        self.api_url = api_url or API_URL
+        self.chat = self.api_url != GROQ_TEXT_URL
+        self._api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = TokenRateLimiter(tokens_per_minute) if tokens_per_minute else None
+
+        # requests is imported by the first client, not by importing this module
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ─── Single completion ───────────────────────────────────────────────────────
+
+    def complete(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 2000,
+        temperature: float = 0.7,
+        cache_mode: str = None,
+        usage: dict = None,
+    ) -> str:
+        """
+        Return the completion text for `prompt`, going through the response cache
+        according to `cache_mode` (defaults to LLM_CACHE_MODE). If a `usage` dict is
+        passed, it is filled with this call's token counts (see _record_usage).
+        """
+        mode = cache_mode or LLM_CACHE_MODE
+        if mode not in ("readwrite", "off", "only"):
+            raise ValueError(f"Unknown LLM cache mode: {mode!r}")
+
+        if mode != "off":
+            cache = get_llm_cache()
+            key = make_key(prompt, model, temperature, max_tokens)
+            cached = cache.get(key)
+            if cached is not None:
+                _record_usage(usage, prompt, cached, source="cache", cache_key=key)
+                return cached
+            if mode == "only":
+                raise LLMCacheMiss(f"No cached LLM response for key {key[:12]}… (cache-only mode).")
+
+        content, api_usage = self._request_completion(prompt, model, max_tokens, temperature)
+        if mode == "readwrite":
+            cache.put(key, content, model=model)
+            _record_usage(usage, prompt, content, api_usage, cache_key=key)
+        else:
+            _record_usage(usage, prompt, content, api_usage)
+        return content
+
+    def _build_payload(self, prompt: str, model: str, max_tokens: int, temperature: float) -> dict:
+        if self.chat:
+            return {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "n": 1
+            }
+        return {
+            "model": model,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "n": 1
+        }
+
+    def _backoff(self, attempt: int, retry_after=None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _post(self, payload: dict, stream: bool = False):
+        """
+        POST with retries. Returns the decoded JSON body of the first successful
+        response, or with stream=True the open response itself (only the status is
+        retried; once the body starts arriving the caller owns it).
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self._api_key or _get_api_key()}"
+        }
+        import requests
+
+        attempt = 0
+        while True:
+            try:
+                resp = self.session.post(
+                    self.api_url, headers=headers, json=payload, timeout=self.timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if resp.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+                resp.close()
+                time.sleep(self._backoff(attempt, retry_after))
+                attempt += 1
+                continue
+
+            if stream:
+                if not resp.ok:
+                    resp.close()
+                resp.raise_for_status()
+                return resp
+            resp.raise_for_status()
+            return resp.json()
+
+    def _request_completion(self, prompt: str, model: str, max_tokens: int, temperature: float):
+        """
+        One uncached API call. Returns (content, usage dict from the API or None).
+        """
+        reserved = _estimate_tokens(prompt) + max_tokens
+        if self.limiter:
+            self.limiter.acquire(reserved)
+
+        data = self._post(self._build_payload(prompt, model, max_tokens, temperature))
+        api_usage = data.get("usage")
+
+        if self.limiter:
+            used = (api_usage or {}).get("total_tokens")
+            if used is not None:
+                self.limiter.refund(reserved - used)
+
+        if self.chat:
+            try:
+                return data["choices"][0]["message"]["content"], api_usage
+            except (KeyError, IndexError):
+                raise ValueError(f"Unexpected chat response: {data}")
+        else:
+            try:
+                return data["choices"][0]["text"], api_usage
+            except (KeyError, IndexError):
+                raise ValueError(f"Unexpected text response: {data}")
+
+    # ─── Streaming completion ────────────────────────────────────────────────────
+
+    def stream_complete(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 2000,
+        temperature: float = 0.7,
+        cache_mode: str = None,
+        usage: dict = None,
+    ):
+        """
+        Generator yielding the completion text in chunks as the API streams it
+        (server-sent events, `"stream": true`). A cache hit is yielded as one chunk;
+        a fully received stream is stored in the cache like complete() would.
+        A `usage` dict is filled once the stream has finished.
+        """
+        mode = cache_mode or LLM_CACHE_MODE
+        if mode not in ("readwrite", "off", "only"):
+            raise ValueError(f"Unknown LLM cache mode: {mode!r}")
+
+        if mode != "off":
+            cache = get_llm_cache()
+            key = make_key(prompt, model, temperature, max_tokens)
+            cached = cache.get(key)
+            if cached is not None:
+                _record_usage(usage, prompt, cached, source="cache", cache_key=key)
+                yield cached
+                return
+            if mode == "only":
+                raise LLMCacheMiss(f"No cached LLM response for key {key[:12]}… (cache-only mode).")
+
+        reserved = _estimate_tokens(prompt) + max_tokens
+        if self.limiter:
+            self.limiter.acquire(reserved)
+
+        payload = self._build_payload(prompt, model, max_tokens, temperature)
+        payload["stream"] = True
+
+        parts = []
+        api_usage = None
+        resp = self._post(payload, stream=True)
+        try:
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    raise ValueError(f"Unexpected stream event: {data}")
+                # Usage arrives on the last event (OpenAI-style "usage" or Groq's "x_groq")
+                api_usage = event.get("usage") or event.get("x_groq", {}).get("usage") or api_usage
+                if not event.get("choices"):
+                    if api_usage is None:
+                        raise ValueError(f"Unexpected stream event: {data}")
+                    continue
+                choice = event["choices"][0]
+                if self.chat:
+                    delta = choice.get("delta", {}).get("content")
+                else:
+                    delta = choice.get("text")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            resp.close()
+
+        content = "".join(parts)
+        if self.limiter and api_usage and api_usage.get("total_tokens") is not None:
+            self.limiter.refund(reserved - api_usage["total_tokens"])
+        if mode == "readwrite":
+            cache.put(key, content, model=model)
+            _record_usage(usage, prompt, content, api_usage, cache_key=key)
+        else:
+            _record_usage(usage, prompt, content, api_usage)
+
+    # ─── Bulk completions ────────────────────────────────────────────────────────
+
+    def get_completions(
+        self,
+        prompts: list,
+        max_concurrency: int = 8,
+        return_exceptions: bool = False,
+        **kwargs,
+    ) -> list:
+        """
+        Complete every prompt with at most `max_concurrency` requests in flight.
+        Results come back in the order of `prompts`. With return_exceptions=True a
+        failed prompt yields its exception instead of aborting the whole batch.
+        `kwargs` are passed through to complete().
+        """
+        def _one(prompt):
+            try:
+                return self.complete(prompt, **kwargs)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            return list(pool.map(_one, prompts))
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_default_client() -> LLMClient:
+    """
+    Process-wide LLMClient, so every call shares one connection pool.
+    """
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = LLMClient()
+        return _default_client
+
+
+def get_completion(
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = 2000,
+    temperature: float = 0.7,
+    cache_mode: str = None,
+    stream: bool = False,
+    usage: dict = None,
+):
+    """
+    Return the completion text for `prompt` using the shared client. Identical
+    requests (same model, temperature, max_tokens and prompt) are served from the
+    local response cache according to `cache_mode` (defaults to LLM_CACHE_MODE).
+    With stream=True, return an iterator of text chunks instead (see stream_complete).
+    Pass a dict as `usage` to receive the call's prompt/completion token counts.
+    """
+    client = get_default_client()
+    if METRICS_ENABLED and usage is None:
+        usage = {}   # token counts for the span
+    if stream:
+        chunks = client.stream_complete(
+            prompt, model=model, max_tokens=max_tokens, temperature=temperature,
+            cache_mode=cache_mode, usage=usage,
+        )
+        return _measured_stream(chunks, usage)
+    with span("get_completion") as s:
+        content = client.complete(
+            prompt, model=model, max_tokens=max_tokens, temperature=temperature,
+            cache_mode=cache_mode, usage=usage,
+        )
+        _add_usage(s, usage, len(content.encode("utf-8")))
+    return content
+
+
+def _measured_stream(chunks, usage):
+    """
+    Yield from `chunks` inside a get_completion span that covers the whole stream.
+    """
+    with span("get_completion") as s:
+        size = 0
+        for chunk in chunks:
+            size += len(chunk.encode("utf-8"))
+            yield chunk
+        _add_usage(s, usage, size)
+
+
+def _add_usage(s, usage, size: int):
+    s.add("bytes", size)
+    if usage:
+        s.add("prompt_tokens", usage.get("prompt_tokens", 0))
+        s.add("completion_tokens", usage.get("completion_tokens", 0))
+        s.cache(usage.get("source") == "cache")
+
+
+def get_completions(prompts: list, max_concurrency: int = 8, **kwargs) -> list:
+    """
+    Bulk variant of get_completion; see LLMClient.get_completions.
+    """
+    return get_default_client().get_completions(prompts, max_concurrency=max_concurrency, **kwargs)
+
+
+def forget_completion(usage: dict):
+    """
+    Drop the cached response that filled `usage` (see get_completion), for a reply
+    the caller could not use: the next identical request then asks the API again
+    instead of replaying the same unusable text for as long as the cache keeps it.
+    """
+    key = (usage or {}).get("cache_key")
+    if key:
+        get_llm_cache().delete(key)
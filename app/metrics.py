@@ -0,0 +1,332 @@
+# app/metrics.py
+#
+# Timing spans for the hot paths: parsing, chart rendering, the LLM round-trip,
+# response parsing and PDF building.
+#
+#   with span("create_pdf_report") as s:
+#       pdf_bytes = ...
+#       s.add("bytes", len(pdf_bytes))
+#
+#   @timed()
+#   def plot_chapter_breakdown(...): ...
+#
+# Every span name gets a latency histogram (cumulative buckets, as Prometheus expects)
+# plus its last RECENT_SAMPLES durations for exact p50/p95/p99. It also gets a size
+# histogram for "bytes", running totals for anything else passed to add() (tokens,
+# cache hits/misses) and an error count. Recording takes a couple of microseconds and
+# one lock.
+#
+# Metrics live in the process that recorded them: the Streamlit server, or the parent
+# process of app.batch (spans recorded in its worker processes are not collected there;
+# the batch log has per-stage timings). Export with to_prometheus() or to_otel_json()
+# (OTLP/JSON). FEEDBACK_METRICS=off turns spans into no-ops.
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+METRICS_ENABLED = os.environ.get("FEEDBACK_METRICS", "on").lower() not in ("off", "0", "false")
+
+# Latency bucket bounds (seconds): 1 ms … 2 min
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Size bucket bounds (bytes): 1 KB … 16 MB
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(8))
+
+# Durations kept per span for exact percentiles over recent calls
+RECENT_SAMPLES = 1024
+
+QUANTILES = (0.50, 0.95, 0.99)
+
+
+# ─── Aggregates ───────────────────────────────────────────────────────────────────
+
+class _Histogram:
+    """
+    Cumulative-bucket histogram: counts[i] is the number of observations <= bounds[i]
+    (and not <= bounds[i - 1]); the last count is the +Inf overflow bucket.
+    """
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        total, out = 0, []
+        for c in self.counts:
+            total += c
+            out.append(total)
+        return out
+
+
+class SpanStats:
+    """
+    Everything recorded for one span name.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = _Histogram(LATENCY_BUCKETS)
+        self.size = _Histogram(SIZE_BUCKETS)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self.errors = 0
+        self.totals = {}
+
+    def quantiles(self, qs=QUANTILES) -> list:
+        """
+        Durations (seconds) at quantiles `qs` over the last RECENT_SAMPLES calls.
+        """
+        ordered = sorted(self.recent)
+        if not ordered:
+            return [None] * len(qs)
+        return [ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in qs]
+
+    def as_dict(self) -> dict:
+        p50, p95, p99 = self.quantiles()
+        ms = lambda s: round(s * 1000, 2) if s is not None else None
+        return {
+            "span": self.name,
+            "count": self.latency.count,
+            "errors": self.errors,
+            "mean_ms": ms(self.latency.sum / self.latency.count) if self.latency.count else None,
+            "p50_ms": ms(p50),
+            "p95_ms": ms(p95),
+            "p99_ms": ms(p99),
+            "mean_bytes": round(self.size.sum / self.size.count) if self.size.count else None,
+            **{key: value for key, value in sorted(self.totals.items())},
+        }
+
+
+class MetricsRegistry:
+    """
+    Process-wide span statistics, keyed by span name.
+    """
+
+    def __init__(self):
+        self._spans = {}
+        self._lock = threading.Lock()
+        self.start_time_ns = time.time_ns()
+
+    def record(self, name: str, seconds: float, error: bool = False, size: int = None, totals: dict = None):
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = SpanStats(name)
+            stats.latency.observe(seconds)
+            stats.recent.append(seconds)
+            if error:
+                stats.errors += 1
+            if size is not None:
+                stats.size.observe(size)
+            for key, amount in (totals or {}).items():
+                stats.totals[key] = stats.totals.get(key, 0) + amount
+
+    def snapshot(self) -> list:
+        """
+        One as_dict() row per span name, sorted by name.
+        """
+        with self._lock:
+            return [self._spans[name].as_dict() for name in sorted(self._spans)]
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self.start_time_ns = time.time_ns()
+
+    # ─── Exporters ────────────────────────────────────────────────────────────────
+
+    def to_prometheus(self, prefix: str = "feedback") -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            spans = [self._spans[name] for name in sorted(self._spans)]
+            lines = []
+
+            def _histogram(metric: str, help_text: str, attr: str):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for s in spans:
+                    h = getattr(s, attr)
+                    if not h.count:
+                        continue
+                    label = _prom_label(s.name)
+                    for bound, count in zip(h.bounds + (float("inf"),), h.cumulative()):
+                        le = "+Inf" if bound == float("inf") else repr(float(bound))
+                        lines.append(f'{metric}_bucket{{span="{label}",le="{le}"}} {count}')
+                    lines.append(f'{metric}_sum{{span="{label}"}} {h.sum!r}')
+                    lines.append(f'{metric}_count{{span="{label}"}} {h.count}')
+
+            _histogram(f"{prefix}_span_duration_seconds", "Duration of instrumented operations.", "latency")
+            _histogram(f"{prefix}_span_size_bytes", "Size of the data instrumented operations produced or read.", "size")
+
+            lines.append(f"# HELP {prefix}_span_errors_total Instrumented operations that raised.")
+            lines.append(f"# TYPE {prefix}_span_errors_total counter")
+            for s in spans:
+                lines.append(f'{prefix}_span_errors_total{{span="{_prom_label(s.name)}"}} {s.errors}')
+
+            for key in sorted({key for s in spans for key in s.totals}):
+                metric = f"{prefix}_span_{key}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for s in spans:
+                    if key in s.totals:
+                        lines.append(f'{metric}{{span="{_prom_label(s.name)}"}} {s.totals[key]}')
+        return "\n".join(lines) + "\n"
+
+    def to_otel_json(self, service_name: str = "mathongo-feedback") -> dict:
+        """
+        The metrics as an OTLP/JSON ExportMetricsServiceRequest (cumulative
+        temporality), ready to POST to a collector's /v1/metrics endpoint.
+        """
+        now = str(time.time_ns())
+        with self._lock:
+            start = str(self.start_time_ns)
+            spans = [self._spans[name] for name in sorted(self._spans)]
+
+            def _point(s: SpanStats, **fields) -> dict:
+                return {
+                    "attributes": [{"key": "span", "value": {"stringValue": s.name}}],
+                    "startTimeUnixNano": start,
+                    "timeUnixNano": now,
+                    **fields,
+                }
+
+            def _histogram(name: str, unit: str, attr: str) -> dict:
+                points = []
+                for s in spans:
+                    h = getattr(s, attr)
+                    if h.count:
+                        points.append(_point(
+                            s,
+                            count=str(h.count),
+                            sum=h.sum,
+                            bucketCounts=[str(c) for c in h.counts],
+                            explicitBounds=[float(b) for b in h.bounds],
+                        ))
+                return {"name": name, "unit": unit, "histogram": {"aggregationTemporality": 2, "dataPoints": points}}
+
+            def _counter(name: str, values: list) -> dict:
+                points = [_point(s, asInt=str(int(v))) for s, v in values]
+                return {"name": name, "unit": "1",
+                        "sum": {"aggregationTemporality": 2, "isMonotonic": True, "dataPoints": points}}
+
+            metrics = [
+                _histogram("feedback.span.duration", "s", "latency"),
+                _histogram("feedback.span.size", "By", "size"),
+                _counter("feedback.span.errors", [(s, s.errors) for s in spans]),
+            ]
+            for key in sorted({key for s in spans for key in s.totals}):
+                metrics.append(_counter(f"feedback.span.{key}", [(s, s.totals[key]) for s in spans if key in s.totals]))
+
+        return {"resourceMetrics": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeMetrics": [{"scope": {"name": "app.metrics"}, "metrics": metrics}],
+        }]}
+
+
+def _prom_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    The process-wide MetricsRegistry.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+# ─── Spans ────────────────────────────────────────────────────────────────────────
+
+class Span:
+    """
+    Handle yielded by span(): attach sizes, token counts and cache outcomes.
+    """
+
+    __slots__ = ("name", "size", "totals")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.size = None
+        self.totals = {}
+
+    def add(self, key: str, amount=1):
+        """
+        Add `amount` to the span's `key` total. "bytes" goes to the size histogram.
+        """
+        if key == "bytes":
+            self.size = (self.size or 0) + amount
+        elif amount:
+            self.totals[key] = self.totals.get(key, 0) + amount
+
+    def cache(self, hit: bool):
+        self.add("cache_hits" if hit else "cache_misses")
+
+
+class _NoopSpan(Span):
+    def add(self, key: str, amount=1):
+        pass
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time the block as span `name`. An exception is counted as an error and re-raised.
+    """
+    if not METRICS_ENABLED:
+        yield _NoopSpan(name)
+        return
+    s = Span(name)
+    error = False
+    start = time.perf_counter()
+    try:
+        yield s
+    except GeneratorExit:
+        raise   # a generator closed early (e.g. an abandoned stream) is not a failure
+    except BaseException:
+        error = True
+        raise
+    finally:
+        get_metrics().record(name, time.perf_counter() - start, error=error, size=s.size, totals=s.totals)
+
+
+def timed(name: str = None):
+    """
+    Decorator form of span(); the span is named after the function by default.
+    """
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def to_prometheus() -> str:
+    return get_metrics().to_prometheus()
+
+
+def to_otel_json() -> str:
+    return json.dumps(get_metrics().to_otel_json())
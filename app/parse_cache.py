@@ -0,0 +1,229 @@
+# app/parse_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+from app.data_processor import parse_json_to_df
+from app.metrics import span
+
+# Where parsed submissions are persisted between server restarts
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("FEEDBACK_CACHE_DIR", ".cache"), "parsed")
+
+# Bumped whenever parse_json_to_df's output changes, so older disk entries are
+# re-parsed instead of served (2: chapter accuracy in % rather than a 0–1 fraction,
+# 3: chapter correct counts)
+CACHE_FORMAT = 3
+
+# summary_dict DataFrames written to disk, and the file each one lives in
+_FRAME_FILES = {
+    "subject_summary_df": "subjects.parquet",
+    "chapter_summary_df": "chapters.parquet",
+    "question_tags_df": "tags.parquet",
+    "tag_summary_df": "tag_summary.parquet",
+}
+
+
+def content_key(raw_bytes: bytes) -> str:
+    """
+    SHA-256 of the uploaded bytes; identical uploads map to the same cache entry.
+    """
+    return hashlib.sha256(raw_bytes).hexdigest()
+
+
+def _parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ParseCache:
+    """
+    Two-tier, content-addressed cache of parse_json_to_df results.
+
+      - memory tier: LRU of the last `max_memory_entries` results (returned as-is,
+        so callers must treat the DataFrames as read-only)
+      - disk tier:   one directory of Parquet files per content hash under `cache_dir`,
+        evicted oldest-access-first once the total exceeds `max_disk_bytes`.
+        Disk hits survive a restart but carry summary_dict["raw_json"] = None.
+
+    The disk tier is skipped when pyarrow is not installed.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_memory_entries: int = 32,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        parser=parse_json_to_df,
+    ):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.parser = parser
+        self.disk_enabled = bool(cache_dir) and _parquet_available()
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    # ─── Public API ───────────────────────────────────────────────────────────────
+
+    def get_or_parse(self, raw_bytes: bytes):
+        """
+        Return (df_questions, summary_dict) for `raw_bytes`, parsing only on a full miss.
+        """
+        with span("ParseCache.get_or_parse") as s:
+            key = content_key(raw_bytes)
+
+            result = self._memory_get(key)
+            if result is not None:
+                self.stats["memory_hits"] += 1
+                s.cache(hit=True)
+                return result
+
+            result = self._disk_get(key)
+            if result is not None:
+                self.stats["disk_hits"] += 1
+                s.cache(hit=True)
+                self._memory_put(key, result)
+                return result
+
+            self.stats["misses"] += 1
+            s.cache(hit=False)
+            result = self.parser(raw_bytes)
+            self._memory_put(key, result)
+            self._disk_put(key, result)
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk_enabled and os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    # ─── Memory tier ──────────────────────────────────────────────────────────────
+
+    def _memory_get(self, key: str):
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+            return result
+
+    def _memory_put(self, key: str, result):
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    # ─── Disk tier ────────────────────────────────────────────────────────────────
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _disk_get(self, key: str):
+        if not self.disk_enabled:
+            return None
+        entry = self._entry_dir(key)
+        meta_path = os.path.join(entry, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != CACHE_FORMAT:
+                raise ValueError("parsed with an older format")
+            df_questions = pd.read_parquet(os.path.join(entry, "questions.parquet"))
+            summary_dict = {"student_name": meta.get("student_name", "Student")}
+            for name, filename in _FRAME_FILES.items():
+                summary_dict[name] = pd.read_parquet(os.path.join(entry, filename))
+        except (OSError, ValueError):
+            # A half-written, corrupted or outdated entry is just a miss; drop it and re-parse
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        summary_dict["raw_json"] = None
+
+        # Touch the entry so eviction sees it as recently used
+        os.utime(meta_path)
+        return df_questions, summary_dict
+
+    def _disk_put(self, key: str, result):
+        if not self.disk_enabled:
+            return
+        df_questions, summary_dict = result
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Write into a private temp dir, then rename, so readers never see a partial entry
+        tmp = os.path.join(self.cache_dir, f".tmp-{key}-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            df_questions.to_parquet(os.path.join(tmp, "questions.parquet"))
+            for name, filename in _FRAME_FILES.items():
+                frame = summary_dict.get(name)
+                if frame is None:
+                    frame = pd.DataFrame()
+                frame.to_parquet(os.path.join(tmp, filename))
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"format": CACHE_FORMAT, "student_name": summary_dict.get("student_name", "Student")}, f)
+            os.replace(tmp, self._entry_dir(key))
+        except OSError:
+            # Another process already stored this key (or the disk is full): not fatal
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self._evict()
+
+    def _evict(self):
+        """
+        Drop least-recently-used entries until the disk tier fits in max_disk_bytes.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(e.stat().st_size for e in os.scandir(path))
+                last_used = os.path.getmtime(os.path.join(path, "meta.json"))
+            except OSError:
+                continue
+            entries.append((last_used, size, path))
+            total += size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_parse_cache() -> ParseCache:
+    """
+    Process-wide ParseCache shared by every Streamlit session.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ParseCache()
+        return _default_cache
+
+
+def cached_parse_json_to_df(raw_bytes: bytes):
+    """
+    Drop-in replacement for parse_json_to_df that goes through the shared ParseCache.
+    """
+    return get_parse_cache().get_or_parse(raw_bytes)
@@ -1,155 +1,250 @@
-# File: app/pdf_generator.py
-
-import io
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.lib.utils import simpleSplit
-from PIL import Image
-
-
-def _sanitize_pdf_text(s: str) -> str:
-    """
-    Replace any Unicode punctuation that Helvetica cannot render:
-      – (en-dash)  → -
-      — (em-dash)  → -
-      “ ” (curly quotes) → "
-      ‘ ’ (curly quotes) → '
-    Remove any control character in U+0000–U+001F except \n, \r, \t.
-    """
-    if not isinstance(s, str):
-        s = str(s)
-
-    s = s.replace("–", "-").replace("—", "-")
-    s = s.replace("“", '"').replace("”", '"')
-    s = s.replace("‘", "'").replace("’", "'")
-
-    sanitized = []
-    for ch in s:
-        code = ord(ch)
-        if 0x00 <= code <= 0x1F and ch not in ("\n", "\r", "\t"):
-            continue
-        sanitized.append(ch)
-    return "".join(sanitized)
-
-
-def create_pdf_report(
-    student_name: str,
-    feedback: dict,
-    chart_figs: list
-) -> bytes:
-    """
-    Build a PDF report using only standard PDF fonts (Helvetica / Helvetica-Bold).
-    Wraps and paginates long text so content does not overflow. Inserts charts
-    on separate pages after text.
-    """
-
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-
-    # Margins and layout constants
-    left_margin = 0.75 * inch
-    right_margin = 0.75 * inch
-    top_margin = 0.75 * inch
-    bottom_margin = 0.75 * inch
-    page_width, page_height = letter
-    max_text_width = page_width - left_margin - right_margin
-    leading = 14  # line height
-
-    def _move_to_next_line(y):
-        return y - leading
-
-    def _start_new_page():
-        c.showPage()
-        return page_height - top_margin
-
-    def _draw_wrapped_text(text: str, start_x: float, start_y: float, font_name: str, font_size: int):
-        """
-        Draws wrapped text starting at (start_x, start_y). If text exceeds bottom_margin,
-        starts a new page and continues. Returns the final y position after drawing.
-        """
-        sanitized = _sanitize_pdf_text(text)
-        wrapped_lines = simpleSplit(sanitized, font_name, font_size, max_text_width)
-        y = start_y
-        c.setFont(font_name, font_size)
-        for line in wrapped_lines:
-            if y < bottom_margin + leading:
-                y = _start_new_page()
-                c.setFont(font_name, font_size)
-            c.drawString(start_x, y, line)
-            y = _move_to_next_line(y)
-        return y
-
-    # 1) Title
-    y = page_height - top_margin
-    c.setFont("Helvetica-Bold", 18)
-    title_text = _sanitize_pdf_text(f"{student_name} - Performance Feedback")
-    c.drawString(left_margin, y, title_text)
-    y = _move_to_next_line(y) - 10  # extra space after title
-
-    # 2) Intro paragraph
-    intro = feedback.get("intro", "")
-    y = _draw_wrapped_text(intro, left_margin, y, "Helvetica", 12)
-    y -= 20  # extra space before next section
-
-    # 3) “Performance Breakdown” section
-    c.setFont("Helvetica-Bold", 14)
-    if y < bottom_margin + leading + 20:
-        y = _start_new_page()
-    c.drawString(left_margin, y, _sanitize_pdf_text("Performance Breakdown"))
-    y -= leading + 10  # move below heading
-
-    breakdown = feedback.get("breakdown", "")
-    y = _draw_wrapped_text(breakdown, left_margin, y, "Helvetica", 12)
-    y -= 20  # extra space
-
-    # 4) “Actionable Suggestions” section
-    c.setFont("Helvetica-Bold", 14)
-    if y < bottom_margin + leading + 20:
-        y = _start_new_page()
-    c.drawString(left_margin, y, _sanitize_pdf_text("Actionable Suggestions"))
-    y -= leading + 10
-
-    suggestions = feedback.get("suggestions", [])
-    for sugg in suggestions:
-        # Draw bullet point
-        bullet_text = "• " + sugg
-        y = _draw_wrapped_text(bullet_text, left_margin, y, "Helvetica", 12)
-        y -= 5  # slight gap between bullets
-        if y < bottom_margin + leading:
-            y = _start_new_page()
-
-    # 5) Insert charts (each on its own page)
-    for fig in chart_figs:
-        y = _start_new_page()
-        # Save chart to buffer
-        img_buffer = io.BytesIO()
-        fig.savefig(img_buffer, format="png", bbox_inches="tight")
-        img_buffer.seek(0)
-        img = Image.open(img_buffer)
-        orig_width, orig_height = img.size
-
-        max_img_width = page_width - left_margin - right_margin
-        display_width = max_img_width
-        display_height = orig_height * (display_width / orig_width)
-
-        # If the display height exceeds printable area, scale down
-        max_display_height = page_height - top_margin - bottom_margin
-        if display_height > max_display_height:
-            scale = max_display_height / display_height
-            display_height = max_display_height
-            display_width = display_width * scale
-
-        c.drawInlineImage(
-            img,
-            left_margin,
-            page_height - top_margin - display_height,
-            width=display_width,
-            height=display_height
-        )
-
-    # 6) Finalize
-    c.save()
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-    return pdf_bytes
+# File: app/pdf_generator.py
+#
+# Report PDFs with ReportLab's canvas, tuned for batches of thousands:
+#   - page layout (margins, text width, heading positions) is computed once
+#   - text is sanitized with one str.translate call and wrapped with cached word widths
+#   - chart PNGs are decoded once per chart, not once per report (_chart_reader)
+#   - create_pdf_reports() spreads many reports over a process pool
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from app.charts import ChartImage
+from app.metrics import span
+
+
+# ─── Text ─────────────────────────────────────────────────────────────────────────
+
+# Unicode punctuation Helvetica cannot render → ASCII; control characters
+# U+0000–U+001F (except \n, \r, \t) → removed
+_PDF_TRANSLATION = str.maketrans({
+    "–": "-", "—": "-",
+    "“": '"', "”": '"',
+    "‘": "'", "’": "'",
+    **{chr(code): None for code in range(0x20) if chr(code) not in "\n\r\t"},
+})
+
+
+def _sanitize_pdf_text(s: str) -> str:
+    """
+    Replace any Unicode punctuation that Helvetica cannot render:
+      – (en-dash)  → -
+      — (em-dash)  → -
+      “ ” (curly quotes) → "
+      ‘ ’ (curly quotes) → '
+    Remove any control character in U+0000–U+001F except \n, \r, \t.
+    """
+    if not isinstance(s, str):
+        s = str(s)
+    return s.translate(_PDF_TRANSLATION)
+
+
+@lru_cache(maxsize=65536)
+def _word_width(word: str, font_name: str) -> float:
+    """
+    Width of `word` at 1 pt. Feedback text reuses the same words (chapter names,
+    "accuracy", "questions", …) across reports, so most lookups are cache hits.
+    """
+    return stringWidth(word, font_name, 1)
+
+
+def _wrap_text(text: str, font_name: str, font_size: float, max_width: float) -> list:
+    """
+    Same line breaks as reportlab's simpleSplit (greedy, on whitespace, one list
+    entry per line, blank lines dropped), with word widths from _word_width.
+    """
+    space = _word_width(" ", font_name) * font_size
+    lines = []
+    for paragraph in text.split("\n"):
+        line = []
+        width = -space
+        for word in paragraph.split():
+            w = _word_width(word, font_name) * font_size
+            if width + space + w <= max_width or not line:
+                line.append(word)
+                width += space + w
+            else:
+                lines.append(" ".join(line))
+                line = [word]
+                width = w
+        if line:
+            lines.append(" ".join(line))
+    return lines
+
+
+# ─── Page layout (computed once) ──────────────────────────────────────────────────
+
+class _PageLayout:
+    """
+    Page geometry shared by every report.
+    """
+
+    def __init__(self, pagesize=letter, margin: float = 0.75 * inch, leading: int = 14):
+        self.pagesize = pagesize
+        self.page_width, self.page_height = pagesize
+        self.left = margin
+        self.top = self.page_height - margin
+        self.bottom = margin
+        self.text_width = self.page_width - 2 * margin
+        self.image_height = self.page_height - 2 * margin
+        self.leading = leading
+
+    def image_box(self, width: int, height: int) -> tuple:
+        """
+        (x, y, w, h) of a chart of `width`×`height` px: full text width, scaled
+        down if it would be taller than the printable area, top-aligned.
+        """
+        w = self.text_width
+        h = height * (w / width)
+        if h > self.image_height:
+            w *= self.image_height / h
+            h = self.image_height
+        return self.left, self.top - h, w, h
+
+
+LAYOUT = _PageLayout()
+
+_SECTION_HEADINGS = ("Performance Breakdown", "Actionable Suggestions")
+
+
+# ─── Charts ───────────────────────────────────────────────────────────────────────
+
+# Readers of recently drawn charts. An ImageReader decodes its PNG once and keeps
+# the pixels, so the same chart drawn into many reports (or twice into one) is not
+# decoded again; each document still embeds it only once (drawImage dedups by content).
+CHART_READER_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=CHART_READER_CACHE_SIZE)
+def _chart_reader(png: bytes) -> ImageReader:
+    return ImageReader(io.BytesIO(png))
+
+
+def _draw_chart(c: canvas.Canvas, chart: ChartImage, x: float, y: float, w: float, h: float):
+    """
+    Draw `chart` with the public drawImage, reusing the cached reader of its PNG.
+    """
+    c.drawImage(_chart_reader(chart.png), x, y, width=w, height=h)
+
+
+# ─── Report ───────────────────────────────────────────────────────────────────────
+
+def create_pdf_report(
+    student_name: str,
+    feedback: dict,
+    chart_figs: list
+) -> bytes:
+    """
+    Build a PDF report using only standard PDF fonts (Helvetica / Helvetica-Bold).
+    Wraps and paginates long text so content does not overflow. Inserts charts
+    (ChartImage, PNG bytes or Matplotlib figures) on separate pages after text.
+    """
+    with span("create_pdf_report") as s:
+        pdf_bytes = _build_pdf(student_name, feedback, chart_figs)
+        s.add("bytes", len(pdf_bytes))
+    return pdf_bytes
+
+
+def _build_pdf(student_name: str, feedback: dict, chart_figs: list) -> bytes:
+    layout = LAYOUT
+    leading = layout.leading
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=layout.pagesize)
+
+    def _start_new_page():
+        c.showPage()
+        return layout.top
+
+    def _draw_wrapped_text(text: str, y: float, font_name: str, font_size: int):
+        """
+        Draws wrapped text starting at y. If text exceeds the bottom margin,
+        starts a new page and continues. Returns the final y position after drawing.
+        """
+        lines = _wrap_text(_sanitize_pdf_text(text), font_name, font_size, layout.text_width)
+        c.setFont(font_name, font_size)
+        for line in lines:
+            if y < layout.bottom + leading:
+                y = _start_new_page()
+                c.setFont(font_name, font_size)
+            c.drawString(layout.left, y, line)
+            y -= leading
+        return y
+
+    def _draw_heading(title: str, y: float):
+        c.setFont("Helvetica-Bold", 14)
+        if y < layout.bottom + leading + 20:
+            y = _start_new_page()
+        c.drawString(layout.left, y, title)
+        return y - leading - 10  # move below heading
+
+    # 1) Title
+    y = layout.top
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(layout.left, y, _sanitize_pdf_text(f"{student_name} - Performance Feedback"))
+    y -= leading + 10  # extra space after title
+
+    # 2) Intro paragraph
+    y = _draw_wrapped_text(feedback.get("intro", ""), y, "Helvetica", 12)
+    y -= 20  # extra space before next section
+
+    # 3) “Performance Breakdown” section
+    y = _draw_heading(_SECTION_HEADINGS[0], y)
+    y = _draw_wrapped_text(feedback.get("breakdown", ""), y, "Helvetica", 12)
+    y -= 20  # extra space
+
+    # 4) “Actionable Suggestions” section
+    y = _draw_heading(_SECTION_HEADINGS[1], y)
+    for sugg in feedback.get("suggestions", []):
+        y = _draw_wrapped_text("• " + sugg, y, "Helvetica", 12)
+        y -= 5  # slight gap between bullets
+        if y < layout.bottom + leading:
+            y = _start_new_page()
+
+    # 5) Insert charts (each on its own page). Each entry is a ChartImage (rendered
+    #    once and shared with the UI), raw PNG bytes, or a Matplotlib figure.
+    for chart in chart_figs:
+        _start_new_page()
+        if not isinstance(chart, ChartImage):
+            chart = ChartImage(chart) if isinstance(chart, (bytes, bytearray)) else ChartImage.from_figure(chart)
+        _draw_chart(c, chart, *layout.image_box(chart.width, chart.height))
+
+    # 6) Finalize
+    c.save()
+    pdf_bytes = buffer.getvalue()
+    buffer.close()
+    return pdf_bytes
+
+
+# ─── Many reports ─────────────────────────────────────────────────────────────────
+
+def _create_pdf_report_from(report: dict) -> bytes:
+    return create_pdf_report(report["student_name"], report["feedback"], report.get("chart_figs", []))
+
+
+def create_pdf_reports(reports: list, workers: int = None, chunksize: int = 4) -> list:
+    """
+    Build many reports in parallel. `reports` is a list of dicts with the
+    arguments of create_pdf_report ("student_name", "feedback", "chart_figs"); charts
+    must be ChartImages or PNG bytes, since figures cannot be sent to a worker.
+    Returns the PDF bytes in the order of `reports`.
+
+    Uses up to `workers` processes (default: CPU count), `chunksize` reports per
+    task; with one worker or one report everything runs in this process.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(reports))
+    if workers <= 1:
+        return [_create_pdf_report_from(r) for r in reports]
+
+    from app.warm_worker import process_context
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=process_context()) as pool:
+        return list(pool.map(_create_pdf_report_from, reports, chunksize=chunksize))
@@ -0,0 +1,313 @@
+# app/prompt_builder.py
+#
+# Builds the feedback prompt within a token budget:
+#   - the template is read and split around {JSON_DATA} once, with its fixed token
+#     cost counted once (reloaded only if the file changes)
+#   - the data is serialized compactly (no indentation, short floats)
+#   - when the data would push the prompt past the budget, the least informative
+#     rows are dropped first: concept lists, then middle-of-the-pack chapters
+#     (the weakest and strongest are kept), then subjects
+#   - several students can share one prompt (build_batch_prompt): the instructions
+#     come first and are identical across requests, the per-student data last
+#   - a reply with only some sections usable is followed by a prompt asking for
+#     just the rest (build_missing_prompt), again behind the same instructions
+
+import json
+import math
+import os
+import re
+import threading
+
+PROMPT_PATH = os.path.join(os.path.dirname(__file__), "prompt", "feedback_prompt.txt")
+BATCH_PROMPT_PATH = os.path.join(os.path.dirname(__file__), "prompt", "feedback_batch_prompt.txt")
+MISSING_PROMPT_PATH = os.path.join(os.path.dirname(__file__), "prompt", "feedback_missing_prompt.txt")
+PLACEHOLDER = "{JSON_DATA}"
+
+# Token budget for the whole prompt (template + data); the reply needs room too
+PROMPT_TOKEN_BUDGET = int(os.environ.get("FEEDBACK_PROMPT_TOKENS", "4000"))
+
+# Rough shape of a BPE pre-tokenizer: words with their leading space, runs of up
+# to 3 digits, single punctuation/symbols, and whitespace runs
+_PIECE_RE = re.compile(r" ?[A-Za-z]+| ?\d{1,3}| ?[^\sA-Za-z\d]|\s+")
+
+
+# ─── Token counting ───────────────────────────────────────────────────────────────
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    """
+    tiktoken's cl100k_base encoder when tiktoken (and its encoding file) is
+    available, else False. Only a closer estimate: the served model has its own
+    tokenizer, so counts are never exact either way.
+    """
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            try:
+                import tiktoken
+                _encoder = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                _encoder = False
+        return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """
+    Local token count for `text`, without calling the API. Uses tiktoken when
+    installed; otherwise a regex approximation of BPE pre-tokenization (long words
+    count one extra token per 6 letters), typically within ~10% on English/JSON.
+    """
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder:
+        return len(encoder.encode(text, disallowed_special=()))
+    count = 0
+    for piece in _PIECE_RE.findall(text):
+        count += 1 + (len(piece.strip()) - 1) // 6 if piece[-1:].isalpha() else 1
+    return count
+
+
+# ─── Template ─────────────────────────────────────────────────────────────────────
+
+class PromptTemplate:
+    """
+    The prompt file split around its {JSON_DATA} placeholder, with the token count
+    of the fixed text precomputed.
+    """
+
+    def __init__(self, text: str):
+        if text.count(PLACEHOLDER) != 1:
+            raise ValueError(f"Prompt template must contain exactly one {PLACEHOLDER} placeholder.")
+        # The template used to go through str.format, so honour its brace escapes
+        self.prefix, self.suffix = (part.replace("{{", "{").replace("}}", "}") for part in text.split(PLACEHOLDER))
+        self.fixed_tokens = count_tokens(self.prefix) + count_tokens(self.suffix)
+
+    def render(self, json_data: str) -> str:
+        return self.prefix + json_data + self.suffix
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(path: str = PROMPT_PATH) -> PromptTemplate:
+    """
+    Compiled template for `path`, cached per process and reloaded when the file's
+    mtime changes (so prompt edits show up without a restart).
+    """
+    mtime = os.path.getmtime(path)
+    with _templates_lock:
+        cached = _templates.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        template = PromptTemplate(f.read())
+    with _templates_lock:
+        _templates[path] = (mtime, template)
+    return template
+
+
+# ─── Context ──────────────────────────────────────────────────────────────────────
+
+def _compact(value):
+    """
+    JSON-ready copy of `value`: floats to 1 decimal (NaN → null), numpy scalars to
+    Python numbers.
+    """
+    if isinstance(value, dict):
+        return {k: _compact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_compact(v) for v in value]
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if isinstance(value, float):
+        return None if math.isnan(value) else round(value, 1)
+    return value
+
+
+def dumps_compact(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _extremes_first(records: list, key: str) -> list:
+    """
+    Indices of `records` ordered weakest, strongest, 2nd weakest, 2nd strongest, …
+    so trimming from the end drops the middle of the pack first.
+    """
+    order = sorted(
+        range(len(records)),
+        key=lambda i: (records[i].get(key) is None, records[i].get(key) or 0),
+    )
+    ranked = []
+    lo, hi = 0, len(order) - 1
+    while lo <= hi:
+        ranked.append(order[lo])
+        if lo != hi:
+            ranked.append(order[hi])
+        lo += 1
+        hi -= 1
+    return ranked
+
+
+class BuiltPrompt:
+    """
+    A rendered prompt plus what went into it.
+    """
+
+    __slots__ = ("text", "prompt_tokens", "budget", "context", "omitted")
+
+    def __init__(self, text: str, prompt_tokens: int, budget: int, context: dict, omitted: dict):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.budget = budget
+        self.context = context
+        self.omitted = omitted
+
+    def __repr__(self):
+        return f"BuiltPrompt({self.prompt_tokens}/{self.budget} tokens, omitted={self.omitted})"
+
+
+def fit_context(slim_context: dict, budget: int) -> tuple:
+    """
+    Compact `slim_context` and trim it until its serialized form fits in `budget`
+    tokens. Returns (data, omitted, data_tokens), where `omitted` counts the rows
+    dropped per list.
+
+    Trimming order when over budget: "slowest_concepts", then "weakest_concepts"
+    (from the end), then chapters (middle of the accuracy ranking first), then
+    subjects (likewise). Dropped counts are reported in the data as
+    "omitted_chapters"/"omitted_subjects" so the model knows the list is partial.
+    """
+    context = _compact(slim_context)
+
+    lists = [k for k in ("slowest_concepts", "weakest_concepts", "chapters", "subjects") if context.get(k)]
+    scalars = {k: v for k, v in context.items() if k not in lists}
+
+    # Token cost of each row, counted once; a row costs its JSON plus a separator
+    row_tokens = {k: [count_tokens(dumps_compact(row)) + 1 for row in context[k]] for k in lists}
+    keep = {k: list(range(len(context[k]))) for k in lists}
+    ranking = {
+        "slowest_concepts": list(range(len(context.get("slowest_concepts", [])))),
+        "weakest_concepts": list(range(len(context.get("weakest_concepts", [])))),
+        "chapters": _extremes_first(context.get("chapters", []), "accuracy"),
+        "subjects": _extremes_first(context.get("subjects", []), "accuracy"),
+    }
+
+    # Fixed part: scalars + list keys/brackets (+ room for the omitted counters)
+    overhead = count_tokens(dumps_compact(scalars)) + 8 * len(lists) + 16
+    total = overhead + sum(sum(t) for t in row_tokens.values())
+
+    omitted = {}
+    for k in lists:
+        if total <= budget:
+            break
+        # Drop from the end of the ranking; rows stay in their original order below
+        kept_ranked = list(ranking[k])
+        dropped = set()
+        while kept_ranked and total > budget:
+            i = kept_ranked.pop()
+            total -= row_tokens[k][i]
+            dropped.add(i)
+        if dropped:
+            keep[k] = [i for i in keep[k] if i not in dropped]
+            omitted[k] = len(dropped)
+
+    data = dict(scalars)
+    for k in ("subjects", "chapters", "weakest_concepts", "slowest_concepts"):
+        if keep.get(k):
+            data[k] = [context[k][i] for i in keep[k]]
+    for k in ("subjects", "chapters"):
+        if omitted.get(k):
+            data[f"omitted_{k}"] = omitted[k]
+    return data, omitted, total
+
+
+def build_feedback_prompt(slim_context: dict, budget: int = None, template: PromptTemplate = None) -> BuiltPrompt:
+    """
+    Serialize `slim_context` compactly and fit it into `budget` tokens (default
+    PROMPT_TOKEN_BUDGET) together with the template (see fit_context for what is
+    dropped first).
+    """
+    budget = budget or PROMPT_TOKEN_BUDGET
+    template = template or get_template()
+    data, omitted, _ = fit_context(slim_context, budget - template.fixed_tokens)
+
+    text = template.render(dumps_compact(data))
+    return BuiltPrompt(text, count_tokens(text), budget, data, omitted)
+
+
+# ─── Multi-student prompts ────────────────────────────────────────────────────────
+
+def get_batch_template(path: str = BATCH_PROMPT_PATH, single_path: str = PROMPT_PATH) -> PromptTemplate:
+    """
+    Template for one request covering several students: the single-student
+    instructions (everything before its "DATA:" header, byte for byte), then the
+    batch rules from `path`, which end with the {JSON_DATA} placeholder.
+
+    Everything up to the data is identical for every batch, and the instructions
+    are also the start of every single-student prompt, so the provider's prompt
+    cache can serve that shared prefix instead of re-reading it per request.
+    """
+    single = get_template(single_path)
+    mtime = (os.path.getmtime(path), os.path.getmtime(single_path))
+    with _templates_lock:
+        cached = _templates.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    instructions = single.prefix.rstrip()
+    if instructions.endswith("DATA:"):
+        instructions = instructions[: -len("DATA:")].rstrip()
+    with open(path, "r", encoding="utf-8") as f:
+        template = PromptTemplate(instructions + "\n\n" + f.read())
+    with _templates_lock:
+        _templates[path] = (mtime, template)
+    return template
+
+
+def build_batch_prompt(slim_contexts: dict, budget: int = None, template: PromptTemplate = None) -> BuiltPrompt:
+    """
+    One prompt for several students. `slim_contexts` maps a short id (echoed back
+    by the model as "id") to that student's slim context. Each student gets the
+    same data budget as a single-student prompt built with `budget`, so batching
+    never changes what the model sees about a student.
+
+    The returned BuiltPrompt's `context` is the list of entries sent, and its
+    `omitted` maps ids to what was trimmed for that student (if anything).
+    """
+    budget = budget or PROMPT_TOKEN_BUDGET
+    template = template or get_batch_template()
+    per_student = budget - get_template().fixed_tokens
+
+    entries, omitted = [], {}
+    for student_id, slim_context in slim_contexts.items():
+        data, dropped, _ = fit_context(slim_context, per_student)
+        entries.append({"id": student_id, **data})
+        if dropped:
+            omitted[student_id] = dropped
+
+    # One entry per line keeps the array readable without costing indentation
+    json_data = "[\n" + ",\n".join(dumps_compact(entry) for entry in entries) + "\n]"
+    text = template.render(json_data)
+    return BuiltPrompt(text, count_tokens(text), template.fixed_tokens + per_student * len(entries), entries, omitted)
+
+
+# ─── Follow-up prompts ────────────────────────────────────────────────────────────
+
+def build_missing_prompt(data: dict, sections: list, budget: int = None, path: str = MISSING_PROMPT_PATH) -> BuiltPrompt:
+    """
+    Prompt asking again for only `sections` of a student's feedback, for a reply
+    that came back with the others usable. `data` is the context the first prompt
+    sent (its BuiltPrompt's `context`), so it is not fitted again.
+
+    The template is put together like the batch one (see get_batch_template): the
+    single-student instructions first, so the provider's prompt cache serves them,
+    and the reply only has to hold the missing sections.
+    """
+    template = get_batch_template(path)
+    text = template.render(dumps_compact({"sections_to_write": list(sections), "student": data}))
+    return BuiltPrompt(text, count_tokens(text), budget or PROMPT_TOKEN_BUDGET, data, {})
@@ -0,0 +1,232 @@
+# app/rule_feedback.py
+#
+# Rule-based feedback: the same {"intro", "breakdown", "suggestions"} structure the
+# LLM returns, written from the summary tables alone in a few milliseconds. Used as
+# an instant draft while the LLM streams, as the fallback when the API is slow or
+# down, and as the default for bulk jobs. Output is deterministic: the same summary
+# always gives the same text.
+
+import math
+
+# Chapter accuracy bands (%)
+STRONG_ACCURACY = 70.0
+WEAK_ACCURACY = 50.0
+
+# A chapter is "slow" / "rushed" when its average time per question is this many
+# times above / below the student's overall average
+SLOW_FACTOR = 1.5
+RUSHED_FACTOR = 0.5
+
+MAX_SUGGESTIONS = 6
+
+WELLBEING_TIPS = (
+    "Study in focused 30-minute blocks with a two-minute break in between: stand up, "
+    "stretch and take a few slow breaths before the next block.",
+    "Protect 7–8 hours of sleep before test days; a rested mind recalls formulas and "
+    "spots mistakes far more reliably than a tired one.",
+)
+
+
+def _num(value):
+    """
+    float(value), or None for missing/NaN values.
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _fmt_pct(value) -> str:
+    return f"{value:.0f}%" if value is not None else "n/a"
+
+
+def _fmt_seconds(value) -> str:
+    if value is None:
+        return "n/a"
+    return f"{value / 60:.1f} min" if value >= 120 else f"{value:.0f} s"
+
+
+def _subject_rows(subject_df) -> list:
+    """
+    Subject rows as dicts, labelled "Subject 1", "Subject 2", … (the data has no
+    subject names, only ids).
+    """
+    if subject_df is None or len(subject_df) == 0:
+        return []
+    rows = []
+    for i, rec in enumerate(subject_df.to_dict(orient="records"), start=1):
+        attempted = _num(rec.get("total_attempted"))
+        total_time = _num(rec.get("total_time_spent"))
+        rows.append({
+            "label": f"Subject {i}",
+            "accuracy": _num(rec.get("accuracy")),
+            "attempted": int(attempted) if attempted is not None else None,
+            "correct": int(_num(rec.get("total_correct")) or 0),
+            "total_time": total_time,
+            "per_question": total_time / attempted if total_time is not None and attempted else None,
+            "percentile": _num(rec.get("accuracy_percentile")),
+        })
+    return rows
+
+
+def _chapter_rows(chapter_df) -> list:
+    """
+    Chapter rows as dicts. Accuracy (%) is recomputed from the correct count when
+    there is one, so a chapter is banded on its exact value rather than the rounded
+    one in chapter_summary_df (66.66…% is not "strong" at 70%).
+    """
+    if chapter_df is None or len(chapter_df) == 0:
+        return []
+    rows = []
+    for rec in chapter_df.to_dict(orient="records"):
+        questions = int(_num(rec.get("num_questions")) or 0)
+        correct = _num(rec.get("correct"))
+        if correct is not None and questions:
+            accuracy = 100.0 * correct / questions
+        else:
+            accuracy = _num(rec.get("accuracy"))
+            correct = round(accuracy / 100 * questions) if accuracy is not None else None
+        rows.append({
+            "chapter": str(rec.get("chapter")),
+            "accuracy": accuracy,
+            "correct": int(correct) if correct is not None else None,
+            "avg_time": _num(rec.get("avg_time_spent")),
+            "questions": questions,
+            "percentile": _num(rec.get("accuracy_percentile")),
+        })
+    return rows
+
+
+def _classify(row: dict, overall_time) -> str:
+    """
+    One of "rushed", "gap", "review", "slow", "strong", "steady".
+    """
+    accuracy, avg_time = row["accuracy"], row["avg_time"]
+    slow = avg_time is not None and overall_time and avg_time > SLOW_FACTOR * overall_time
+    rushed = avg_time is not None and overall_time and avg_time < RUSHED_FACTOR * overall_time
+    if accuracy is None:
+        return "steady"
+    if accuracy < WEAK_ACCURACY:
+        return "rushed" if rushed else "gap" if slow else "review"
+    if accuracy >= STRONG_ACCURACY:
+        return "slow" if slow else "strong"
+    return "slow" if slow else "steady"
+
+
+_CHAPTER_NOTES = {
+    "rushed": "answered quickly but mostly incorrectly, which points to rushing or guessing rather than not knowing the material",
+    "gap": "both slow and inaccurate, the clearest sign of a concept gap",
+    "review": "below the 50% mark, so the fundamentals here need another pass",
+    "slow": "accurate, but slower than your average; speed is the next step",
+    "strong": "a real strength, both accurate and well paced",
+    "steady": "a solid base with room to push higher",
+}
+
+
+def generate_rule_feedback(summary_dict: dict) -> dict:
+    """
+    Feedback for one student built by rules from summary_dict's subject, chapter
+    and (when present) tag summaries. Same keys as generate_feedback_sections,
+    with a zero-token "usage" whose source is "rules".
+    """
+    name = summary_dict.get("student_name") or "Student"
+    subjects = _subject_rows(summary_dict.get("subject_summary_df"))
+    chapters = _chapter_rows(summary_dict.get("chapter_summary_df"))
+
+    # 1) Overall numbers: from the subject totals, else from the chapter table
+    if subjects and all(s["attempted"] is not None for s in subjects):
+        attempted = sum(s["attempted"] for s in subjects)
+        correct = sum(s["correct"] for s in subjects)
+        total_time = sum(s["total_time"] or 0 for s in subjects)
+    else:
+        attempted = sum(c["questions"] for c in chapters)
+        correct = sum(c["correct"] or 0 for c in chapters)
+        total_time = sum((c["avg_time"] or 0) * c["questions"] for c in chapters)
+    overall_acc = 100 * correct / attempted if attempted else None
+    overall_time = total_time / attempted if attempted and total_time else None
+
+    for row in chapters:
+        row["kind"] = _classify(row, overall_time)
+    ranked = sorted(
+        (c for c in chapters if c["accuracy"] is not None),
+        key=lambda c: (c["accuracy"], -c["questions"], c["chapter"]),
+    )
+    weakest = [c for c in ranked if c["accuracy"] < STRONG_ACCURACY][:2]
+    strongest = max(ranked, key=lambda c: (c["accuracy"], c["questions"]), default=None)
+    if strongest is not None and strongest["accuracy"] < WEAK_ACCURACY:
+        strongest = None
+
+    # 2) Intro
+    intro = [f"Hi {name}! You answered {correct} of {attempted} questions correctly"
+             f" ({_fmt_pct(overall_acc)})" if attempted else f"Hi {name}!"]
+    if subjects and attempted:
+        intro[0] += f" across {len(subjects)} subjects"
+    intro[0] += "."
+    if strongest is not None:
+        intro.append(f"{strongest['chapter']} stands out at {_fmt_pct(strongest['accuracy'])} over "
+                     f"{strongest['questions']} questions, so the understanding is clearly there.")
+    if weakest:
+        intro.append(f"The biggest gains are waiting in {' and '.join(c['chapter'] for c in weakest)}, "
+                     f"and the plan below starts there.")
+
+    # 3) Breakdown: subjects, chapters (weakest first), concepts
+    parts = []
+    if subjects:
+        lines = ["By Subject:"]
+        for s in subjects:
+            line = (f"- {s['label']}: {_fmt_pct(s['accuracy'])} accuracy ({s['correct']}/{s['attempted']} correct), "
+                    f"{_fmt_seconds(s['total_time'])} in total, {_fmt_seconds(s['per_question'])} per question")
+            if s["percentile"] is not None:
+                line += f", ahead of {s['percentile']:.0f}% of students on this test"
+            lines.append(line + ".")
+        parts.append("\n".join(lines))
+    if chapters:
+        lines = ["By Chapter:"]
+        for c in ranked + [c for c in chapters if c["accuracy"] is None]:
+            line = (f"- {c['chapter']}: {_fmt_pct(c['accuracy'])} over {c['questions']} questions at "
+                    f"{_fmt_seconds(c['avg_time'])} per question, {_CHAPTER_NOTES[c['kind']]}")
+            if c["percentile"] is not None:
+                line += f" (ahead of {c['percentile']:.0f}% of students)"
+            lines.append(line + ".")
+        parts.append("\n".join(lines))
+
+    concepts = []
+    tag_df = summary_dict.get("tag_summary_df")
+    if tag_df is not None and len(tag_df):
+        from app.concept_index import top_k_from_summary
+
+        top = top_k_from_summary(tag_df, k=3, by="weakest")
+        concepts = [r for r in top.to_dict(orient="records") if r["accuracy"] < WEAK_ACCURACY]
+        if concepts:
+            lines = ["By Concept:"]
+            lines += [f"- {r['title']}: {int(r['correct'])} of {int(r['attempts'])} correct." for r in concepts]
+            parts.append("\n".join(lines))
+
+    # 4) Suggestions: one per weak/slow/rushed chapter and weak concept, then well-being
+    suggestions = []
+    for c in weakest:
+        if c["kind"] == "rushed":
+            suggestions.append(f"In {c['chapter']}, slow down: write out each step before choosing an answer, "
+                               f"and only mark an option once you can explain why the others are wrong.")
+        else:
+            suggestions.append(f"Rebuild {c['chapter']} from the core ideas: re-read the theory, redo the "
+                               f"{c['questions']} questions from this test, then try a short set of fresh ones.")
+    for c in chapters:
+        if c["kind"] == "slow" and len(suggestions) < MAX_SUGGESTIONS - 2:
+            suggestions.append(f"You know {c['chapter']} well; now do timed sets there, aiming for "
+                               f"{_fmt_seconds(overall_time)} per question.")
+    if concepts:
+        titles = " and ".join(r["title"] for r in concepts[:2])
+        suggestions.append(f"Make a one-page summary of {titles} and practise a few problems on each.")
+    for tip in WELLBEING_TIPS:
+        if len(suggestions) < MAX_SUGGESTIONS:
+            suggestions.append(tip)
+
+    return {
+        "intro": " ".join(intro),
+        "breakdown": "\n\n".join(parts),
+        "suggestions": suggestions,
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "source": "rules"},
+    }
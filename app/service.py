@@ -0,0 +1,464 @@
+# app/service.py
+#
+# HTTP API around the report pipeline (Starlette on uvicorn):
+#
+#   python -m app.service --port 8000 --workers 4 --max-inflight 16 --max-queue 64
+#
+#   POST /v1/summary               submission JSON → summary tables as JSON
+#   POST /v1/feedback?engine=llm   submission JSON → {"student_name", "feedback"}
+#   POST /v1/report?engine=rules   submission JSON → the PDF report, streamed
+#   GET  /healthz                  admission counters and pool sizes
+#   GET  /metrics                  app.metrics spans in Prometheus text format
+#
+# The event loop only does HTTP. Parsing, chart rendering and PDF building run in a
+# process pool (forked warm, see app.warm_worker.process_context); LLM calls run on
+# a thread pool and are awaited, so a slow completion holds a thread, never the loop.
+# Charts render while the feedback is being written, as in app.batch.
+#
+# Backpressure: at most --max-inflight requests are processed at once and at most
+# --max-queue more wait for a slot. Beyond that, or after waiting longer than
+# --queue-timeout, a request gets 503 with Retry-After straight away instead of
+# piling up behind work the server cannot finish in time. Bodies larger than
+# FEEDBACK_SERVICE_MAX_BODY_BYTES get 413 (counted as they arrive, so chunked
+# uploads without a Content-Length are capped too).
+#
+# An LLM call that outlasts FEEDBACK_TIMEOUT_S keeps running on its thread (its
+# reply still lands in the LLM cache). The LLM pool has one thread per in-flight
+# request plus --llm-spare-threads for such calls; while the spares are all taken,
+# new requests get rule-based feedback at once instead of queueing behind them.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.metrics import span, to_prometheus
+from app.warm_worker import process_context
+
+logger = logging.getLogger("app.service")
+
+SERVICE_WORKERS = int(os.environ.get("FEEDBACK_SERVICE_WORKERS", str(os.cpu_count() or 1)))
+SERVICE_MAX_INFLIGHT = int(os.environ.get("FEEDBACK_SERVICE_MAX_INFLIGHT", "16"))
+SERVICE_MAX_QUEUE = int(os.environ.get("FEEDBACK_SERVICE_MAX_QUEUE", "64"))
+SERVICE_QUEUE_TIMEOUT_S = float(os.environ.get("FEEDBACK_SERVICE_QUEUE_TIMEOUT_S", "10"))
+SERVICE_MAX_BODY_BYTES = int(os.environ.get("FEEDBACK_SERVICE_MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+# LLM threads beyond one per in-flight request, for timed-out calls still running
+# (default: as many as --max-inflight)
+SERVICE_LLM_SPARE_THREADS = int(os.environ.get("FEEDBACK_SERVICE_LLM_SPARE_THREADS", "0")) or None
+
+ENGINES = ("rules", "llm")
+
+# PDF bytes handed to the socket per write, so a large report is sent with flow control
+PDF_CHUNK_BYTES = 64 * 1024
+
+
+class Overloaded(Exception):
+    """
+    Raised by AdmissionLimiter when a request cannot get a slot; becomes a 503.
+    """
+
+
+class InvalidSubmission(ValueError):
+    """
+    The request body is not a submission parse_json_to_df can read; becomes a 400.
+    """
+
+
+class BodyTooLarge(Exception):
+    """
+    The request body passed SERVICE_MAX_BODY_BYTES while being read; becomes a 413.
+    """
+
+
+# ─── Admission control ────────────────────────────────────────────────────────────
+
+class AdmissionLimiter:
+    """
+    `max_inflight` concurrent slots with a bounded wait list: a request that finds
+    `max_queue` others already waiting, or waits longer than `queue_timeout`
+    seconds, is rejected with Overloaded.
+    """
+
+    def __init__(self, max_inflight: int, max_queue: int, queue_timeout: float):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_inflight)
+        self.inflight = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            raise Overloaded(f"{self.waiting} requests already waiting")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected_timeout"] += 1
+            raise Overloaded(f"no free slot within {self.queue_timeout:g}s") from None
+        finally:
+            self.waiting -= 1
+        self.inflight += 1
+        self.stats["admitted"] += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._slots.release()
+
+    def retry_after(self) -> int:
+        """
+        Seconds a rejected client should wait: roughly one queue's worth of work.
+        """
+        return max(1, min(30, round(self.waiting / max(1, self.max_inflight))))
+
+
+# ─── Worker-process jobs (top-level so pool processes can run them) ──────────────
+
+def _parse_job(raw_bytes: bytes, cohort_path: str = None):
+    """
+    Parse one submission; raw_json is dropped so only the tables travel back.
+    Bodies above STREAM_THRESHOLD_BYTES go through the streaming parser.
+    """
+    from app.data_processor import STREAM_THRESHOLD_BYTES, parse_json_stream_to_df, parse_json_to_df
+
+    if len(raw_bytes) > STREAM_THRESHOLD_BYTES:
+        df_questions, summary_dict = parse_json_stream_to_df(raw_bytes)
+    else:
+        df_questions, summary_dict = parse_json_to_df(raw_bytes)
+    summary_dict["raw_json"] = None
+    if cohort_path:
+        from app.cohort_stats import load_cohort_benchmark
+
+        cohort = load_cohort_benchmark(cohort_path)
+        if cohort is not None:
+            summary_dict = cohort.with_percentiles(summary_dict)
+    return df_questions, summary_dict
+
+
+_chart_renderer = None
+
+
+def _charts_job(df_questions, summary_dict) -> list:
+    """
+    Report charts as ChartImages, with one ChartRenderer kept per worker process.
+    """
+    global _chart_renderer
+    from app.charts import ChartRenderer
+
+    if _chart_renderer is None:
+        _chart_renderer = ChartRenderer()
+    return _chart_renderer.render_all(df_questions, summary_dict)
+
+
+def _pdf_job(student_name: str, feedback: dict, charts: list) -> bytes:
+    from app.pdf_generator import create_pdf_report
+
+    return create_pdf_report(student_name=student_name, feedback=feedback, chart_figs=charts)
+
+
+# ─── Service ──────────────────────────────────────────────────────────────────────
+
+class FeedbackService:
+    """
+    The pools and limiter behind the routes. Pools start with the app (lifespan)
+    and are shut down with it.
+    """
+
+    def __init__(
+        self,
+        workers: int = SERVICE_WORKERS,
+        max_inflight: int = SERVICE_MAX_INFLIGHT,
+        max_queue: int = SERVICE_MAX_QUEUE,
+        queue_timeout: float = SERVICE_QUEUE_TIMEOUT_S,
+        cohort_path: str = None,
+        llm_spare_threads: int = SERVICE_LLM_SPARE_THREADS,
+    ):
+        self.workers = workers
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.cohort_path = cohort_path
+        self.llm_spare_threads = llm_spare_threads or max_inflight
+        self.limiter = None
+        self.processes = None
+        self.llm_threads = None
+        self.abandoned_llm_calls = 0    # timed out, still holding a thread
+        self.stats = {"llm_timeouts": 0, "llm_skipped": 0}
+
+    def start(self):
+        from app.cohort_stats import DEFAULT_BENCHMARK_PATH
+
+        self.cohort_path = self.cohort_path or DEFAULT_BENCHMARK_PATH
+        self.limiter = AdmissionLimiter(self.max_inflight, self.max_queue, self.queue_timeout)
+        self.processes = ProcessPoolExecutor(max_workers=self.workers, mp_context=process_context())
+        # One thread per in-flight request, so every admitted request can be waiting on the LLM,
+        # plus the spares that timed-out calls run out on
+        self.llm_threads = ThreadPoolExecutor(
+            max_workers=self.max_inflight + self.llm_spare_threads, thread_name_prefix="service-llm",
+        )
+
+    def stop(self):
+        self.processes.shutdown(cancel_futures=True)
+        self.llm_threads.shutdown(wait=False, cancel_futures=True)
+
+    async def _in_process(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.processes, fn, *args)
+
+    async def parse(self, raw_bytes: bytes):
+        try:
+            return await self._in_process(_parse_job, raw_bytes, self.cohort_path)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise InvalidSubmission(f"{type(e).__name__}: {e}") from e
+
+    async def feedback(self, summary_dict: dict, engine: str) -> dict:
+        """
+        Same contract as feedback_generator.generate_feedback: the LLM's sections, or
+        rule-based feedback when the call fails or outlasts FEEDBACK_TIMEOUT_S, or
+        straight away while timed-out calls hold all the spare LLM threads (so a new
+        call never waits for a thread behind them).
+        """
+        from app.feedback_generator import FEEDBACK_TIMEOUT_S, generate_feedback_sections, rule_fallback
+        from app.rule_feedback import generate_rule_feedback
+
+        loop = asyncio.get_running_loop()
+        if engine == "rules":
+            return await loop.run_in_executor(self.llm_threads, generate_rule_feedback, summary_dict)
+
+        if self.abandoned_llm_calls >= self.llm_spare_threads:
+            self.stats["llm_skipped"] += 1
+            return rule_fallback(summary_dict, f"{self.abandoned_llm_calls} timed-out LLM calls still running")
+
+        call = loop.run_in_executor(self.llm_threads, generate_feedback_sections, summary_dict)
+        try:
+            # shield: a timed-out call still finishes in the background and lands in the LLM cache
+            return await asyncio.wait_for(asyncio.shield(call), FEEDBACK_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            self.stats["llm_timeouts"] += 1
+            self.abandoned_llm_calls += 1
+            call.add_done_callback(self._abandoned_call_done)
+            return rule_fallback(summary_dict, f"no reply within {FEEDBACK_TIMEOUT_S:g}s")
+        except Exception as e:
+            return rule_fallback(summary_dict, f"{type(e).__name__}: {e}")
+
+    def _abandoned_call_done(self, call):
+        self.abandoned_llm_calls -= 1
+        if not call.cancelled():
+            call.exception()   # retrieved, so asyncio does not log it as unhandled
+
+    async def report(self, raw_bytes: bytes, engine: str) -> tuple:
+        """
+        (student name, PDF bytes). Charts and feedback only depend on the parsed
+        data, so they run side by side.
+        """
+        df_questions, summary_dict = await self.parse(raw_bytes)
+        charts, feedback = await asyncio.gather(
+            self._in_process(_charts_job, df_questions, summary_dict),
+            self.feedback(summary_dict, engine),
+        )
+        student_name = summary_dict["student_name"]
+        return student_name, await self._in_process(_pdf_job, student_name, feedback, charts)
+
+
+# ─── Routes ───────────────────────────────────────────────────────────────────────
+
+def _error(status: int, message: str, headers: dict = None) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status, headers=headers)
+
+
+async def _read_body(request: Request) -> bytes:
+    """
+    The request body, counted as it arrives: raises BodyTooLarge as soon as it
+    passes SERVICE_MAX_BODY_BYTES, whatever the Content-Length header said.
+    """
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > SERVICE_MAX_BODY_BYTES:
+            raise BodyTooLarge(f"body larger than {SERVICE_MAX_BODY_BYTES} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _frame_records(df) -> list:
+    # DataFrame.to_json turns NaN into null, which json.dumps would not
+    return json.loads(df.to_json(orient="records"))
+
+
+def _handler(name: str, body_fn):
+    """
+    Wrap `body_fn(service, request, raw_bytes)` with the body-size check, admission
+    control, a "service.<name>" span and the error → status mapping.
+    """
+    async def endpoint(request: Request):
+        service = request.app.state.service
+        engine = request.query_params.get("engine")
+        if engine is not None and engine not in ENGINES:
+            return _error(400, f"engine must be one of {', '.join(ENGINES)}")
+        declared = request.headers.get("content-length")
+        if declared:
+            try:
+                declared = int(declared)
+            except ValueError:
+                return _error(400, f"malformed Content-Length: {declared!r}")
+            if declared > SERVICE_MAX_BODY_BYTES:
+                return _error(413, f"body larger than {SERVICE_MAX_BODY_BYTES} bytes")
+        try:
+            async with service.limiter.slot():
+                with span(f"service.{name}") as s:
+                    raw_bytes = await _read_body(request)
+                    s.add("bytes", len(raw_bytes))
+                    if not raw_bytes:
+                        return _error(400, "empty body: expected a submission JSON")
+                    return await body_fn(service, request, raw_bytes)
+        except Overloaded as e:
+            return _error(503, f"overloaded: {e}", {"Retry-After": str(service.limiter.retry_after())})
+        except InvalidSubmission as e:
+            return _error(400, f"invalid submission: {e}")
+        except BodyTooLarge as e:
+            return _error(413, str(e))
+
+    endpoint.__name__ = name
+    return endpoint
+
+
+async def _summary(service: FeedbackService, request: Request, raw_bytes: bytes):
+    df_questions, summary_dict = await service.parse(raw_bytes)
+    return JSONResponse({
+        "student_name": summary_dict["student_name"],
+        "questions": len(df_questions),
+        "subjects": _frame_records(summary_dict["subject_summary_df"]),
+        "chapters": _frame_records(summary_dict["chapter_summary_df"]),
+        "tags": _frame_records(summary_dict["tag_summary_df"]),
+    })
+
+
+async def _feedback(service: FeedbackService, request: Request, raw_bytes: bytes):
+    from app.feedback_generator import FEEDBACK_ENGINE
+
+    _, summary_dict = await service.parse(raw_bytes)
+    feedback = await service.feedback(summary_dict, request.query_params.get("engine", FEEDBACK_ENGINE))
+    return JSONResponse({"student_name": summary_dict["student_name"], "feedback": feedback})
+
+
+async def _report(service: FeedbackService, request: Request, raw_bytes: bytes):
+    from app.feedback_generator import FEEDBACK_ENGINE
+
+    student_name, pdf_bytes = await service.report(raw_bytes, request.query_params.get("engine", FEEDBACK_ENGINE))
+
+    async def chunks():
+        view = memoryview(pdf_bytes)
+        for start in range(0, len(view), PDF_CHUNK_BYTES):
+            yield bytes(view[start:start + PDF_CHUNK_BYTES])
+
+    filename = "".join(c if c.isalnum() or c in "._-" else "_" for c in student_name) or "report"
+    return StreamingResponse(chunks(), media_type="application/pdf", headers={
+        "Content-Length": str(len(pdf_bytes)),
+        "Content-Disposition": f'attachment; filename="{filename}_report.pdf"',
+    })
+
+
+async def _healthz(request: Request):
+    service = request.app.state.service
+    limiter = service.limiter
+    return JSONResponse({
+        "status": "ok",
+        "uptime_s": round(time.monotonic() - request.app.state.started, 1),
+        "workers": service.workers,
+        "inflight": limiter.inflight,
+        "waiting": limiter.waiting,
+        "max_inflight": limiter.max_inflight,
+        "max_queue": limiter.max_queue,
+        **limiter.stats,
+        "llm_abandoned": service.abandoned_llm_calls,
+        **service.stats,
+    })
+
+
+async def _metrics(request: Request):
+    return PlainTextResponse(to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def create_app(service: FeedbackService = None) -> Starlette:
+    """
+    The Starlette app; `service` defaults to one configured from the environment.
+    """
+    service = service or FeedbackService()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        service.start()
+        app.state.service = service
+        app.state.started = time.monotonic()
+        logger.info(
+            "service up: %d worker processes, %d in flight, %d queued",
+            service.workers, service.max_inflight, service.max_queue,
+        )
+        try:
+            yield
+        finally:
+            service.stop()
+
+    return Starlette(
+        routes=[
+            Route("/v1/summary", _handler("summary", _summary), methods=["POST"]),
+            Route("/v1/feedback", _handler("feedback", _feedback), methods=["POST"]),
+            Route("/v1/report", _handler("report", _report), methods=["POST"]),
+            Route("/healthz", _healthz),
+            Route("/metrics", _metrics),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def run(host: str = "127.0.0.1", port: int = 8000, service: FeedbackService = None, log_level: str = "info"):
+    """
+    Serve until interrupted. One event loop; the parallelism is in the process pool.
+    """
+    import uvicorn
+
+    uvicorn.run(create_app(service), host=host, port=port, log_level=log_level.lower(), access_log=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.service", description="HTTP API for feedback and PDF reports.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="processes for parse/chart/PDF work")
+    parser.add_argument("--max-inflight", type=int, default=SERVICE_MAX_INFLIGHT, help="requests processed at once")
+    parser.add_argument("--max-queue", type=int, default=SERVICE_MAX_QUEUE, help="requests waiting for a slot")
+    parser.add_argument("--queue-timeout", type=float, default=SERVICE_QUEUE_TIMEOUT_S,
+                        help="seconds a request may wait for a slot before a 503")
+    parser.add_argument("--llm-spare-threads", type=int, default=SERVICE_LLM_SPARE_THREADS,
+                        help="LLM threads for timed-out calls still running (default: --max-inflight)")
+    parser.add_argument("--cohort", help="cohort benchmark JSON (default: app.cohort_stats.DEFAULT_BENCHMARK_PATH)")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(message)s")
+    service = FeedbackService(
+        workers=args.workers,
+        max_inflight=args.max_inflight,
+        max_queue=args.max_queue,
+        queue_timeout=args.queue_timeout,
+        cohort_path=args.cohort,
+        llm_spare_threads=args.llm_spare_threads,
+    )
+    run(args.host, args.port, service, args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
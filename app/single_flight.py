@@ -0,0 +1,295 @@
+# app/single_flight.py
+#
+# Single-flight deduplication: while a call for some key is in flight, other callers
+# with the same key wait for it and share its result instead of repeating it.
+#
+#   result = get_single_flight().do(key, lambda: expensive(...))
+#
+#   call = get_single_flight().begin(key)          # when the leader's work is a stream
+#   if call.leader:
+#       try: ...; call.finish(result)
+#       except Exception as e: call.finish(error=e); raise
+#   else:
+#       result = call.wait()      # Abandoned if the leader quit without a result,
+#                                 # TimeoutError after SINGLE_FLIGHT_WAIT_S
+#
+# Within a process, followers wait on an Event and get the leader's result (or its
+# exception). Across processes (Streamlit server, batch/job workers, the HTTP service),
+# the leader also holds an exclusive flock on .cache/inflight/<key>.lock and writes
+# its JSON-serializable result next to it before unlocking; a process that finds the
+# lock taken waits for it and reads that result. A leader in another process that
+# fails leaves no result, so the waiting process then runs the call itself.
+#
+# No caller waits longer than SINGLE_FLIGHT_WAIT_S (FEEDBACK_SINGLE_FLIGHT_WAIT_S,
+# default FEEDBACK_TIMEOUT_S): a caller that would have given up on its own call by
+# then gets TimeoutError rather than keeping its thread blocked behind the leader.
+#
+# FEEDBACK_SINGLE_FLIGHT: "on" (default), "threads" (no lock files), "off".
+
+import json
+import os
+import threading
+import time
+
+from app.metrics import span
+
+SINGLE_FLIGHT_MODE = os.environ.get("FEEDBACK_SINGLE_FLIGHT", "on").lower()
+DEFAULT_LOCK_DIR = os.path.join(os.environ.get("FEEDBACK_CACHE_DIR", ".cache"), "inflight")
+
+# How long a follower waits for the leader (in this process or another) before
+# giving up with TimeoutError; by default as long as generate_feedback waits for a reply
+SINGLE_FLIGHT_WAIT_S = float(
+    os.environ.get("FEEDBACK_SINGLE_FLIGHT_WAIT_S", os.environ.get("FEEDBACK_TIMEOUT_S", "45"))
+)
+LOCK_POLL_S = 0.05
+
+# Result files older than this are removed whenever a leader publishes
+RESULT_TTL_S = 600.0
+
+try:
+    import fcntl
+except ImportError:   # no flock (Windows): coalesce within the process only
+    fcntl = None
+
+
+class Abandoned(Exception):
+    """
+    Raised to followers when the leader gave up without a result (e.g. its stream
+    was closed early); they should start over rather than fail.
+    """
+
+
+class _Call:
+    """
+    One in-flight call. `leader` is True for the caller that must do the work and
+    then finish(); everyone else wait()s.
+    """
+
+    def __init__(self, flight: "SingleFlight", key: str):
+        self.flight = flight
+        self.key = key
+        self.leader = True
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        self._lock_fd = None
+
+    def finish(self, result=None, error: BaseException = None):
+        """
+        Publish the leader's result (or exception) to every follower.
+        """
+        self._result, self._error = result, error
+        self.flight._finish(self, publish=error is None)
+        self._done.set()
+
+    def abandon(self):
+        self.finish(error=Abandoned(f"leader of {self.key[:12]}… gave up"))
+
+    def wait(self, timeout: float = None):
+        """
+        The leader's result; re-raises its exception. TimeoutError if it is not
+        done within `timeout` seconds.
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"no result for {self.key[:12]}… within {timeout:g}s")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class SingleFlight:
+    """
+    In-flight calls keyed by string, with process-wide counters in `stats`:
+    leaders (calls actually made), coalesced (in-process followers) and
+    coalesced_processes (results read from another process's leader).
+    """
+
+    def __init__(self, lock_dir: str = DEFAULT_LOCK_DIR, cross_process: bool = True, wait_timeout: float = None):
+        self.lock_dir = lock_dir
+        self.cross_process = cross_process and fcntl is not None
+        self.wait_timeout = wait_timeout or SINGLE_FLIGHT_WAIT_S
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "coalesced": 0, "coalesced_processes": 0}
+        if self.cross_process:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def begin(self, key: str) -> _Call:
+        """
+        Join the in-flight call for `key`, or start one with the caller as leader.
+        A returned follower call may already be finished (result from another process).
+        Raises TimeoutError if another process held the key for longer than wait_timeout.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats["coalesced"] += 1
+                return _Follower(call, timeout=self.wait_timeout)
+            call = self._calls[key] = _Call(self, key)
+
+        if self.cross_process:
+            try:
+                found, result = self._lock_or_wait(call)
+            except TimeoutError as e:
+                call.finish(error=e)   # this process's followers give up too
+                raise
+            if found:
+                # Another process made the call: hand its result to this process's followers too
+                call.finish(result)
+                return _Follower(call, cross_process=True, timeout=self.wait_timeout)
+        with self._lock:
+            self.stats["leaders"] += 1
+        return call
+
+    def do(self, key: str, fn):
+        """
+        fn() for the first caller with `key`; concurrent callers with the same key get
+        that result (or exception) instead of calling fn themselves.
+        """
+        call = self.begin(key)
+        if not call.leader:
+            return call.wait()
+        try:
+            result = fn()
+        except BaseException as e:
+            call.finish(error=e)
+            raise
+        call.finish(result)
+        return result
+
+    # ─── Lock files ───────────────────────────────────────────────────────────────
+
+    def _paths(self, key: str) -> tuple:
+        base = os.path.join(self.lock_dir, key)
+        return base + ".lock", base + ".json"
+
+    def _lock_or_wait(self, call: _Call) -> tuple:
+        """
+        Take the key's flock (the caller leads; returns (False, None)) or, if another
+        process holds it, wait for it and return (True, result) when that process
+        published one. Without a fresh result the lock is kept and the caller leads.
+        Raises TimeoutError if the lock is still held after wait_timeout.
+        """
+        lock_path, result_path = self._paths(call.key)
+        started = time.time()
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            call._lock_fd = fd
+            return False, None
+        except BlockingIOError:
+            pass
+
+        with span("single_flight.wait") as s:
+            deadline = time.monotonic() + self.wait_timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        os.close(fd)
+                        raise TimeoutError(
+                            f"another process still holds {call.key[:12]}… after {self.wait_timeout:g}s"
+                        ) from None
+                    time.sleep(LOCK_POLL_S)
+            try:
+                if os.path.getmtime(result_path) >= started:
+                    with open(result_path, encoding="utf-8") as f:
+                        result = json.load(f)
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+                    s.add("coalesced_processes")
+                    with self._lock:
+                        self.stats["coalesced_processes"] += 1
+                    return True, result
+            except (OSError, ValueError):
+                pass
+        call._lock_fd = fd
+        return False, None
+
+    def _finish(self, call: _Call, publish: bool):
+        with self._lock:
+            if self._calls.get(call.key) is call:
+                del self._calls[call.key]
+        if call._lock_fd is None:
+            return
+        try:
+            if publish:
+                self._publish(call)
+                self._remove_stale_files()
+        finally:
+            fcntl.flock(call._lock_fd, fcntl.LOCK_UN)
+            os.close(call._lock_fd)
+            call._lock_fd = None
+
+    def _publish(self, call: _Call):
+        _, result_path = self._paths(call.key)
+        tmp_path = f"{result_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(call._result, f)
+            os.replace(tmp_path, result_path)
+        except (OSError, TypeError, ValueError):
+            # Not JSON-serializable or not writable: other processes just make the call themselves
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _remove_stale_files(self):
+        """
+        Drop result files older than RESULT_TTL_S, and lock files of that age that
+        nobody holds.
+        """
+        cutoff = time.time() - RESULT_TTL_S
+        for entry in os.scandir(self.lock_dir):
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if not entry.name.endswith(".lock"):
+                    os.remove(entry.path)
+                    continue
+                fd = os.open(entry.path, os.O_RDWR)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.remove(entry.path)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass
+
+
+class _Follower:
+    """
+    A caller that shares another caller's in-flight call.
+    """
+
+    leader = False
+
+    def __init__(self, call: _Call, cross_process: bool = False, timeout: float = None):
+        self._call = call
+        self.cross_process = cross_process
+        self.timeout = timeout
+
+    def wait(self):
+        if self._call._done.is_set():
+            return self._call.wait()
+        with span("single_flight.wait") as s:
+            s.add("coalesced")
+            return self._call.wait(self.timeout)
+
+
+_flight = None
+_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """
+    The process-wide SingleFlight, or None when FEEDBACK_SINGLE_FLIGHT=off.
+    """
+    global _flight
+    if SINGLE_FLIGHT_MODE == "off":
+        return None
+    with _flight_lock:
+        if _flight is None:
+            _flight = SingleFlight(cross_process=SINGLE_FLIGHT_MODE != "threads")
+        return _flight
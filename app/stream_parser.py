@@ -0,0 +1,168 @@
+# app/stream_parser.py
+
+import io
+
+import ijson
+
+
+def _open_stream(source):
+    """
+    Accept raw bytes, a file path, or an already-open binary file object.
+    Returns (fileobj, should_close).
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source), True
+    if hasattr(source, "read"):
+        return source, False
+    return open(source, "rb"), True
+
+
+def iter_submissions(source):
+    """
+    Incrementally walk a submission file and yield one *skeleton* submission dict at a time.
+
+    The file may hold a single submission (dict) or a whole cohort (list of dicts).
+    Only the fields the DataFrame builder needs are kept; question HTML, option payloads,
+    the syllabus, etc. are never materialised. Each yielded dict has the same shape as
+    the source JSON, so it can be passed straight to data_processor._parse_submission:
+
+        {
+          "_id": {"$oid": str},                     # only if present in the source
+          "student_name": str,                      # only if present in the source
+          "subjects": [{"subjectId": {"$oid"}, "accuracy", "totalTimeTaken",
+                        "totalAttempted", "totalCorrect", "totalMarkScored"}, ...],
+          "sections": [{"questions": [
+              {"questionId": {"chapters", "topics", "concepts", "level"},
+               "markedOptions": [{"isCorrect": True}] or [],
+               "inputValue": {"isCorrect": bool},
+               "timeTaken": number}, ...]}]
+        }
+
+    Peak memory is one skeleton submission plus the parser's read buffer.
+    """
+    f, should_close = _open_stream(source)
+    try:
+        events = ijson.parse(f, use_float=True)
+
+        # Peek at the first event to learn whether the top level is a list or a dict
+        try:
+            prefix, event, value = next(events)
+        except StopIteration:
+            return
+        if event == "start_array":
+            base = "item"
+        elif event == "start_map":
+            base = ""
+        else:
+            raise ValueError("Uploaded JSON must be an object or a list of objects.")
+
+        def p(path):
+            return f"{base}.{path}" if base else path
+
+        sub_id = p("_id.$oid")
+        name_key = p("student_name")
+        subjects_key = p("subjects")
+        subj = p("subjects.item")
+        subj_fields = {
+            f"{subj}.accuracy": "accuracy",
+            f"{subj}.totalTimeTaken": "totalTimeTaken",
+            f"{subj}.totalAttempted": "totalAttempted",
+            f"{subj}.totalCorrect": "totalCorrect",
+            f"{subj}.totalMarkScored": "totalMarkScored",
+        }
+        subj_id = f"{subj}.subjectId.$oid"
+        sect = p("sections.item")
+        q = f"{sect}.questions.item"
+        q_chapter = f"{q}.questionId.chapters.item"
+        q_chapter_title = f"{q_chapter}.title"
+        q_topic_title = f"{q}.questionId.topics.item.title"
+        q_concept_title = f"{q}.questionId.concepts.item.title"
+        q_level = f"{q}.questionId.level"
+        q_marked = f"{q}.markedOptions.item.isCorrect"
+        q_input = f"{q}.inputValue.isCorrect"
+        q_time = f"{q}.timeTaken"
+
+        submission = None
+        subject = None
+        section = None
+        question = None
+        chapter_index = 0
+
+        # For a single top-level dict the first event already opened the submission
+        if base == "":
+            submission = {"sections": []}
+
+        for prefix, event, value in events:
+            # ── question-level fields (by far the most frequent events) ──
+            if question is not None:
+                if prefix == q:
+                    if event == "end_map":
+                        section["questions"].append(question)
+                        question = None
+                    continue
+                if prefix == q_chapter and event == "start_map":
+                    chapter_index += 1
+                    if chapter_index == 1:
+                        question["questionId"]["chapters"].append({})
+                elif prefix == q_chapter_title:
+                    if chapter_index == 1:
+                        question["questionId"]["chapters"][0]["title"] = value
+                elif prefix == q_topic_title:
+                    question["questionId"]["topics"].append({"title": value})
+                elif prefix == q_concept_title:
+                    question["questionId"]["concepts"].append({"title": value})
+                elif prefix == q_level:
+                    question["questionId"]["level"] = value
+                elif prefix == q_marked:
+                    if value is True:
+                        question["markedOptions"] = [{"isCorrect": True}]
+                elif prefix == q_input:
+                    question["inputValue"]["isCorrect"] = value is True
+                elif prefix == q_time:
+                    question["timeTaken"] = value
+                continue
+
+            if prefix == q and event == "start_map":
+                question = {
+                    "questionId": {"chapters": [], "topics": [], "concepts": [], "level": None},
+                    "markedOptions": [],
+                    "inputValue": {},
+                    "timeTaken": None,
+                }
+                chapter_index = 0
+
+            # ── section boundaries ──
+            elif prefix == sect:
+                if event == "start_map":
+                    section = {"questions": []}
+                elif event == "end_map":
+                    submission["sections"].append(section)
+                    section = None
+
+            # ── subject-level fields ──
+            elif prefix == subj:
+                if event == "start_map":
+                    subject = {}
+                elif event == "end_map":
+                    submission["subjects"].append(subject)
+                    subject = None
+            elif subject is not None and prefix in subj_fields:
+                subject[subj_fields[prefix]] = value
+            elif subject is not None and prefix == subj_id:
+                subject["subjectId"] = {"$oid": value}
+
+            # ── submission-level fields ──
+            elif prefix == sub_id:
+                submission["_id"] = {"$oid": value}
+            elif prefix == name_key and event == "string":
+                submission["student_name"] = value
+            elif prefix == subjects_key and event == "start_array":
+                submission["subjects"] = []
+            elif prefix == base and event == "start_map":
+                submission = {"sections": []}
+            elif prefix == base and event == "end_map":
+                yield submission
+                submission = None
+    finally:
+        if should_close:
+            f.close()
@@ -0,0 +1,293 @@
+# app/warm_worker.py
+#
+# Warm workers for the command-line tools. A server imports the heavy modules
+# (pandas, matplotlib, reportlab, requests, app.*) once and keeps a few forked
+# children waiting on a Unix socket; `run` hands a command to one of them, which
+# then starts with everything already imported instead of paying ~1 s of imports.
+#
+#   python -m app.warm_worker serve [--workers 2] [--socket PATH]
+#   python -m app.warm_worker run app.batch data/mock_test_1/ --out reports/
+#   python -m app.warm_worker stop
+#
+# `run` falls back to running the command in-process when no server is up. Settings
+# a module reads from the environment at import time (e.g. FEEDBACK_ENGINE) come
+# from the server's environment; everything read later comes from the caller's.
+#
+# The same preload list feeds the forkserver that app.batch / create_pdf_reports
+# worker processes are forked from (process_context()). The server does not start
+# that forkserver itself: a forked child could not check on it (only its parent can
+# waitpid it), so a command that needs a pool starts its own forkserver.
+#
+# Keep the top-level imports light: `run` is the client and must start fast.
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import struct
+import sys
+
+DEFAULT_SOCKET = os.environ.get("FEEDBACK_WORKER_SOCKET", os.path.join(".cache", "warm_worker.sock"))
+
+PRELOAD_MODULES = (
+    "numpy",
+    "pandas",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_agg",
+    "reportlab.pdfgen.canvas",
+    "app.data_processor",
+    "app.charts",
+    "app.pdf_generator",
+    "app.feedback_generator",
+)
+
+_HEADER = struct.Struct(">I")
+
+
+# ─── Preloading ───────────────────────────────────────────────────────────────────
+
+def warm_imports(modules=PRELOAD_MODULES):
+    """
+    Import `modules` (and do the one-off work they defer, such as matplotlib's font
+    lookup), so a process forked afterwards starts warm.
+    """
+    import importlib
+
+    for name in modules:
+        importlib.import_module(name)
+    if "app.charts" in modules:
+        # First text layout loads the font cache; do it here rather than per job
+        from app.charts import _new_figure
+
+        fig = _new_figure()
+        fig.text(0.5, 0.5, "warm")
+        fig.canvas.draw()
+
+
+def process_context():
+    """
+    Start-method context for worker pools: forkserver (with PRELOAD_MODULES
+    imported once in the server, so each worker forks warm) where available, else
+    spawn. Plain fork is avoided since pools are started from processes that may
+    already run LLM threads.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if "forkserver" not in methods:
+        return multiprocessing.get_context("spawn")
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(list(PRELOAD_MODULES))
+    return ctx
+
+
+# ─── Wire format: length-prefixed JSON, stdio passed as file descriptors ──────────
+
+def _send_json(conn: socket.socket, obj, fds=()):
+    data = json.dumps(obj).encode()
+    if fds:
+        socket.send_fds(conn, [_HEADER.pack(len(data)) + data], list(fds))
+    else:
+        conn.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(conn: socket.socket, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = conn.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("warm worker connection closed")
+        buf += chunk
+    return buf
+
+
+def _recv_json(conn: socket.socket, with_fds: int = 0):
+    if with_fds:
+        msg, fds, _, _ = socket.recv_fds(conn, 65536, with_fds)
+        (length,) = _HEADER.unpack(msg[:_HEADER.size])
+        data = msg[_HEADER.size:]
+        if len(data) < length:
+            data += _recv_exact(conn, length - len(data))
+        return json.loads(data), fds
+    (length,) = _HEADER.unpack(_recv_exact(conn, _HEADER.size))
+    return json.loads(_recv_exact(conn, length)), []
+
+
+# ─── Server ───────────────────────────────────────────────────────────────────────
+
+def _handle(conn: socket.socket):
+    """
+    Run one request in this (already forked, warm) process, then exit.
+    """
+    request, fds = _recv_json(conn, with_fds=3)
+    if request.get("cmd") == "stop":
+        os.kill(os.getppid(), signal.SIGTERM)
+        _send_json(conn, {"exit": 0})
+        os._exit(0)
+
+    # Take over the caller's terminal, directory, environment and arguments
+    for target, fd in zip((0, 1, 2), fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    sys.argv = [request["module"]] + request["argv"]
+
+    code = _run_module(request["module"])
+    sys.stdout.flush()
+    sys.stderr.flush()
+    _send_json(conn, {"exit": code})
+    os._exit(code)
+
+
+def _run_module(module: str) -> int:
+    """
+    `python -m module` in this process; returns the exit status.
+    """
+    import runpy
+    import traceback
+
+    try:
+        runpy.run_module(module, run_name="__main__", alter_sys=True)
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def _child(listener: socket.socket):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    conn, _ = listener.accept()
+    listener.close()
+    try:
+        _handle(conn)
+    finally:
+        os._exit(1)
+
+
+def serve(socket_path: str = DEFAULT_SOCKET, workers: int = 2):
+    """
+    Preload, then keep `workers` forked children blocked in accept(). Each child
+    serves exactly one request and exits; the server forks a replacement, so the
+    next request also finds a warm process waiting.
+    """
+    if not hasattr(socket, "AF_UNIX") or not hasattr(os, "fork"):
+        raise SystemExit("Warm workers need a POSIX system (Unix sockets and fork).")
+
+    warm_imports()
+
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(64)
+
+    children = set()
+
+    def _shutdown(*_):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+    print(f"warm worker listening on {socket_path} ({workers} workers)", flush=True)
+
+    while True:
+        while len(children) < workers:
+            pid = os.fork()
+            if pid == 0:
+                _child(listener)
+            children.add(pid)
+        pid, _ = os.wait()
+        children.discard(pid)
+
+
+# ─── Client ───────────────────────────────────────────────────────────────────────
+
+def _connect(socket_path: str):
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(socket_path)
+    except OSError:
+        conn.close()
+        return None
+    return conn
+
+
+def run(module: str, argv: list, socket_path: str = DEFAULT_SOCKET) -> int:
+    """
+    Run `python -m module *argv` in a warm worker, with this process's stdin,
+    stdout, stderr, working directory and environment. Runs it here when no
+    server is listening. Returns the exit status.
+    """
+    conn = _connect(socket_path)
+    if conn is None:
+        sys.argv = [module] + list(argv)
+        return _run_module(module)
+    with conn:
+        request = {"module": module, "argv": list(argv), "cwd": os.getcwd(), "env": dict(os.environ)}
+        _send_json(conn, request, fds=(sys.stdin.fileno(), sys.stdout.fileno(), sys.stderr.fileno()))
+        try:
+            reply, _ = _recv_json(conn)
+        except ConnectionError:
+            return 1
+    return reply.get("exit", 1)
+
+
+def stop(socket_path: str = DEFAULT_SOCKET) -> bool:
+    conn = _connect(socket_path)
+    if conn is None:
+        return False
+    with conn:
+        _send_json(conn, {"cmd": "stop"}, fds=(sys.stdin.fileno(), sys.stdout.fileno(), sys.stderr.fileno()))
+        try:
+            _recv_json(conn)
+        except ConnectionError:
+            pass
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.warm_worker",
+        description="Preloaded worker processes that run app CLIs without import start-up cost.",
+    )
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="preload modules and wait for commands")
+    p_serve.add_argument("--workers", type=int, default=2, help="warm processes kept waiting")
+    p_run = sub.add_parser("run", help="run `python -m MODULE ARGS...` in a warm worker")
+    p_run.add_argument("module")
+    p_run.add_argument("args", nargs=argparse.REMAINDER)
+    sub.add_parser("stop", help="shut the server down")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.socket, args.workers)
+    elif args.command == "run":
+        return run(args.module, args.args, args.socket)
+    elif not stop(args.socket):
+        print(f"no warm worker listening on {args.socket}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
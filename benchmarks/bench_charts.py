@@ -0,0 +1,126 @@
+# benchmarks/bench_charts.py
+#
+# Charts/sec and resident memory while rendering the three report charts many times.
+#
+#   python -m benchmarks.bench_charts                      # 10k renders per mode
+#   python -m benchmarks.bench_charts --renders 2000 --modes renderer pyplot
+#
+# Modes:
+#   pyplot    – the previous implementation: plt.subplots per chart, savefig(bbox_inches="tight"),
+#               figures never closed (memory grows with every render)
+#   figure    – app.charts.plot_* (Figure API on Agg, no pyplot) + figure_to_png, figure dropped
+#   renderer  – app.charts.ChartRenderer: template figures reused, only data swapped
+
+import argparse
+import io
+import os
+import resource
+import time
+
+from app.charts import (
+    ChartRenderer,
+    figure_to_png,
+    plot_accuracy_over_time,
+    plot_chapter_breakdown,
+    plot_subject_breakdown,
+)
+from app.data_processor import parse_json_to_df
+
+SAMPLE = os.path.join("data", "submission1.json")
+
+
+def rss_mb() -> float:
+    """
+    Current resident set size in MB (falls back to peak RSS off Linux).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _pyplot_render(df_all, summary_dict):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    pngs = []
+    for kind in ("line", "chapter", "subject"):
+        fig, ax = plt.subplots(figsize=(6, 4))
+        if kind == "line":
+            ax.plot(df_all["timestamp"], df_all["accuracy"])
+            fig.autofmt_xdate(rotation=25)
+        elif kind == "chapter":
+            df = summary_dict["chapter_summary_df"].sort_values("accuracy")
+            ax.barh(df["chapter"], df["accuracy"], height=0.6)
+        else:
+            df = summary_dict["subject_summary_df"].sort_values("accuracy")
+            ax.barh(df["subject_id"], df["accuracy"], height=0.6)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", bbox_inches="tight")
+        pngs.append(buf.getvalue())
+    return pngs
+
+
+def _figure_render(df_all, summary_dict):
+    return [
+        figure_to_png(plot_accuracy_over_time(df_all)),
+        figure_to_png(plot_chapter_breakdown(summary_dict["chapter_summary_df"])),
+        figure_to_png(plot_subject_breakdown(summary_dict["subject_summary_df"])),
+    ]
+
+
+def run_mode(mode: str, renders: int, df_all, summary_dict, sample_every: int) -> dict:
+    renderer = ChartRenderer() if mode == "renderer" else None
+    render = {
+        "pyplot": _pyplot_render,
+        "figure": _figure_render,
+        "renderer": renderer.render_all if renderer else None,
+    }[mode]
+
+    render(df_all, summary_dict)   # warm-up: fonts, caches, templates
+    rss_start = rss_mb()
+    samples = []
+    start = time.perf_counter()
+    done = 0
+    while done < renders:
+        render(df_all, summary_dict)
+        done += 3
+        if done % sample_every < 3:
+            samples.append(round(rss_mb(), 1))
+    elapsed = time.perf_counter() - start
+    if renderer:
+        renderer.close()
+
+    return {
+        "mode": mode,
+        "charts": done,
+        "charts_per_sec": round(done / elapsed, 1),
+        "rss_start_mb": round(rss_start, 1),
+        "rss_end_mb": round(rss_mb(), 1),
+        "rss_samples_mb": samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chart rendering benchmark")
+    parser.add_argument("--renders", type=int, default=10_000, help="charts to render per mode")
+    parser.add_argument("--modes", nargs="+", default=["renderer", "figure", "pyplot"],
+                        choices=["renderer", "figure", "pyplot"])
+    parser.add_argument("--sample-every", type=int, default=1000)
+    args = parser.parse_args()
+
+    with open(SAMPLE, "rb") as f:
+        df_all, summary_dict = parse_json_to_df(f.read())
+
+    for mode in args.modes:
+        r = run_mode(mode, args.renders, df_all, summary_dict, args.sample_every)
+        print(f"{r['mode']:>9}: {r['charts']:>6} charts | {r['charts_per_sec']:>6.1f} charts/s | "
+              f"RSS {r['rss_start_mb']:.0f} → {r['rss_end_mb']:.0f} MB")
+        print(f"{'':>11}RSS samples: {r['rss_samples_mb']}")
+
+
+if __name__ == "__main__":
+    main()
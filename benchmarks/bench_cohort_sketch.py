@@ -0,0 +1,57 @@
+# benchmarks/bench_cohort_sketch.py
+#
+# Accuracy, memory and speed of app.cohort_stats.KLLSketch against keeping every
+# value, for cohorts of 10k / 100k / 1M students.
+#
+#   python -m benchmarks.bench_cohort_sketch
+#   python -m benchmarks.bench_cohort_sketch --sizes 100000 --k 100 400
+
+import argparse
+import time
+
+import numpy as np
+
+from app.cohort_stats import PERCENTILE_GRID, KLLSketch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cohort quantile sketch benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--k", type=int, nargs="+", default=[200])
+    parser.add_argument("--batch", type=int, default=1_000, help="values per update() call")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    grid = np.linspace(0.0, 1.0, PERCENTILE_GRID)
+
+    print(f"{'students':>9} | {'k':>4} | {'kept':>6} | {'exact KB':>8} | {'sketch KB':>9} | "
+          f"{'update s':>8} | {'max rank err':>12} | {'lookup µs':>9}")
+    for n in args.sizes:
+        # Time per question: skewed, like real data
+        values = rng.lognormal(4.0, 0.8, n)
+        exact = np.sort(values)
+        for k in args.k:
+            sketch = KLLSketch(k, seed=1)
+            start = time.perf_counter()
+            for lo in range(0, n, args.batch):
+                sketch.update(values[lo:lo + args.batch])
+            update_s = time.perf_counter() - start
+
+            table = sketch.quantiles(grid)
+            ranks = np.searchsorted(exact, table) / n
+            rank_err = np.abs(ranks - grid)[1:-1].max()
+
+            probes = rng.choice(values, 10_000)
+            start = time.perf_counter()
+            for v in probes:
+                np.searchsorted(table, v)
+            lookup_us = (time.perf_counter() - start) / len(probes) * 1e6
+
+            kept = sum(len(items) for items in sketch.levels)
+            print(f"{n:>9,} | {k:>4} | {kept:>6} | {exact.nbytes / 1024:>8.0f} | "
+                  f"{(kept * 8 + table.nbytes) / 1024:>9.1f} | {update_s:>8.3f} | "
+                  f"{rank_err:>12.4f} | {lookup_us:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
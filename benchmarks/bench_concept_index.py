@@ -0,0 +1,99 @@
+# benchmarks/bench_concept_index.py
+#
+# Builds app.concept_index.ConceptIndex over a synthetic cohort and times top-k
+# "weakest concepts" queries against the rescan-and-groupby way of answering them.
+#
+#   python -m benchmarks.bench_concept_index
+#   python -m benchmarks.bench_concept_index --students 1000 5000 --queries 200
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.concept_index import ConceptIndex
+
+QUESTIONS_PER_TEST = 75
+TAGS_PER_QUESTION = 2          # one topic + one concept
+N_CONCEPTS = 2000
+N_TOPICS = 400
+
+
+def make_cohort(n_students: int, seed: int = 0):
+    """
+    Question table + exploded tag table for n_students tests of QUESTIONS_PER_TEST
+    questions, in the shape parse_submissions returns.
+    """
+    rng = np.random.default_rng(seed)
+    n = n_students * QUESTIONS_PER_TEST
+    df_questions = pd.DataFrame({
+        "submission_id": pd.Categorical(np.repeat([f"s{i:06d}" for i in range(n_students)], QUESTIONS_PER_TEST)),
+        "accuracy": (rng.random(n) < 0.6).astype(np.int8),
+        "time_spent": rng.integers(5, 300, n).astype(np.float32),
+    })
+    q_idx = np.repeat(np.arange(n, dtype=np.int32), TAGS_PER_QUESTION)
+    titles = np.empty(n * TAGS_PER_QUESTION, dtype=object)
+    titles[0::2] = [f"topic {i}" for i in rng.integers(0, N_TOPICS, n)]
+    titles[1::2] = [f"concept {i}" for i in rng.integers(0, N_CONCEPTS, n)]
+    question_tags_df = pd.DataFrame({
+        "question_idx": q_idx,
+        "tag_type": pd.Categorical(np.tile(["topic", "concept"], n), categories=["topic", "concept"]),
+        "title": pd.Categorical(titles),
+    })
+    return df_questions, question_tags_df
+
+
+def rescan_weakest(df_questions, question_tags_df, student, k: int = 5):
+    """
+    The no-index way: join tags to question rows, filter, group, sort — every query.
+    """
+    rows = question_tags_df.assign(
+        submission_id=df_questions["submission_id"].to_numpy()[question_tags_df["question_idx"]],
+        correct=df_questions["accuracy"].to_numpy()[question_tags_df["question_idx"]],
+    )
+    rows = rows[(rows["submission_id"] == student) & (rows["tag_type"] == "concept")]
+    g = rows.groupby("title", observed=True)["correct"].agg(["size", "mean"])
+    g = g[g["size"] >= 2]
+    return g.sort_values(["mean", "size"], ascending=[True, False]).head(k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concept index benchmark")
+    parser.add_argument("--students", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--rescan-queries", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'students':>8} | {'tag rows':>9} | {'build s':>7} | {'student top-5 µs':>16} | "
+          f"{'cohort top-5 µs':>15} | {'rescan ms':>9} | {'speedup':>8}")
+    for n_students in args.students:
+        df_questions, tags = make_cohort(n_students)
+
+        start = time.perf_counter()
+        index = ConceptIndex(df_questions, tags, student_col="submission_id")
+        build_s = time.perf_counter() - start
+
+        rng = np.random.default_rng(1)
+        students = [index.students[i] for i in rng.integers(0, n_students, args.queries)]
+        start = time.perf_counter()
+        for student in students:
+            index.weakest(5, student=student, min_attempts=1)
+        student_us = (time.perf_counter() - start) / len(students) * 1e6
+
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            index.weakest(5)
+        cohort_us = (time.perf_counter() - start) / args.queries * 1e6
+
+        start = time.perf_counter()
+        for student in students[:args.rescan_queries]:
+            rescan_weakest(df_questions, tags, student)
+        rescan_ms = (time.perf_counter() - start) / args.rescan_queries * 1e3
+
+        print(f"{n_students:>8,} | {len(tags):>9,} | {build_s:>7.2f} | {student_us:>16.0f} | "
+              f"{cohort_us:>15.0f} | {rescan_ms:>9.1f} | {rescan_ms * 1e3 / student_us:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
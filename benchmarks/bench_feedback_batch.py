@@ -0,0 +1,90 @@
+# benchmarks/bench_feedback_batch.py
+#
+# Per-student cost and throughput of feedback generation: one request per student
+# (batch size 1) against several students packed into each request
+# (app.feedback_generator.generate_feedback_batch). Runs against a local stub LLM
+# by default (see benchmarks/stub_llm.py); --api uses the configured provider and
+# spends real tokens.
+#
+#   python -m benchmarks.bench_feedback_batch
+#   python -m benchmarks.bench_feedback_batch --students 64 --batch-sizes 1 4 8 --workers 8
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app.llm_client as llm_client
+from app.data_processor import parse_json_to_df
+from app.feedback_generator import generate_feedback_batch
+from app.prompt_builder import get_template
+from benchmarks.stub_llm import StubLLM
+
+
+def make_summaries(path: str, n: int) -> list:
+    """
+    n copies of the submission at `path` under different student names, so no two
+    prompts are identical.
+    """
+    with open(path, "rb") as f:
+        _, summary_dict = parse_json_to_df(f.read())
+    return [{**summary_dict, "student_name": f"Student {i:03d}"} for i in range(n)]
+
+
+def run(summaries: list, batch_size: int, workers: int) -> tuple:
+    """
+    Generate feedback for every summary, `workers` requests in flight at once.
+    Returns (seconds, feedback list).
+    """
+    groups = [summaries[lo:lo + batch_size] for lo in range(0, len(summaries), batch_size)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(lambda group: generate_feedback_batch(group, batch_size=batch_size), groups))
+    return time.perf_counter() - start, [feedback for part in parts for feedback in part]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-student feedback request benchmark")
+    parser.add_argument("--submission", default="data/submission1.json")
+    parser.add_argument("--students", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--workers", type=int, default=8, help="requests in flight")
+    parser.add_argument("--input-price", type=float, default=0.11, help="$ per 1M prompt tokens")
+    parser.add_argument("--output-price", type=float, default=0.34, help="$ per 1M completion tokens")
+    parser.add_argument("--cached-discount", type=float, default=0.0,
+                        help="discount on prompt tokens served from the provider's prefix cache (0-1)")
+    parser.add_argument("--api", action="store_true", help="call the configured API instead of the stub")
+    args = parser.parse_args()
+
+    # Measure the calls themselves, not the local response cache
+    llm_client.LLM_CACHE_MODE = "off"
+    stub = None
+    if not args.api:
+        stub = StubLLM().start()
+        llm_client._default_client = llm_client.LLMClient(api_url=stub.url, api_key="stub", pool_size=args.workers)
+
+    summaries = make_summaries(args.submission, args.students)
+    instructions = get_template().fixed_tokens   # shared prefix, same for every request
+
+    print(f"{'batch':>5} | {'requests':>8} | {'prompt tok/st':>13} | {'compl tok/st':>12} | "
+          f"{'$ per 1k st':>11} | {'students/s':>10} | {'s total':>7} | {'retried':>7}")
+    try:
+        for batch_size in args.batch_sizes:
+            seconds, feedback = run(summaries, batch_size, args.workers)
+            usages = [f["usage"] for f in feedback]
+            prompt_tokens = sum(u["prompt_tokens"] for u in usages)
+            completion_tokens = sum(u["completion_tokens"] for u in usages)
+            retried = sum(1 for u in usages if batch_size > 1 and "batch_size" not in u)
+            requests = -(-len(summaries) // batch_size) + retried
+
+            cached = max(0, requests - 1) * instructions * args.cached_discount
+            cost = ((prompt_tokens - cached) * args.input_price + completion_tokens * args.output_price) / 1e6
+            n = len(summaries)
+            print(f"{batch_size:>5} | {requests:>8} | {prompt_tokens / n:>13.0f} | {completion_tokens / n:>12.0f} | "
+                  f"{cost / n * 1000:>11.4f} | {n / seconds:>10.2f} | {seconds:>7.2f} | {retried:>7}")
+    finally:
+        if stub is not None:
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
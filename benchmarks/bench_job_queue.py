@@ -0,0 +1,125 @@
+# benchmarks/bench_job_queue.py
+#
+# Throughput of the durable job queue (app/job_queue.py) against the number of
+# worker processes, and the cost of a worker dying mid-job.
+#
+#   python -m benchmarks.bench_job_queue
+#   python -m benchmarks.bench_job_queue --workers 1 2 4 8 --jobs 48 --engine rules
+#
+# Each run enqueues --jobs synthetic submissions into a fresh queue and drains it with
+# a WorkerPool. With --engine llm (default) the workers talk to a local stub LLM
+# (benchmarks/stub_llm.py) with a realistic latency, so the run shows how far extra
+# workers overlap LLM waits; with --engine rules it is CPU-bound.
+#
+# The resume check kills every worker halfway through a run, starts a new pool on
+# the same queue and reports whether all jobs still finish, and how many LLM calls
+# were made in total (jobs whose feedback was checkpointed are not asked again).
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from app.job_queue import JobQueue, WorkerPool
+
+
+def _use_stub(url: str):
+    """
+    WorkerPool initializer: point this worker's LLM client at the stub, cache off.
+    """
+    import app.llm_client as llm_client
+
+    llm_client.LLM_CACHE_MODE = "off"
+    llm_client._default_client = llm_client.LLMClient(api_url=url, api_key="stub")
+
+
+def _fill(root: str, jobs: int, questions: int, engine: str) -> JobQueue:
+    from benchmarks.synthetic import make_submission
+
+    queue = JobQueue(root)
+    for i in range(jobs):
+        queue.enqueue(json.dumps([make_submission(i, questions)]).encode("utf-8"), engine, f"student-{i}")
+    return queue
+
+
+def throughput(workers: int, jobs: int, questions: int, engine: str, stub_url: str) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_jobs_")
+    try:
+        queue = _fill(root, jobs, questions, engine)
+        start = time.perf_counter()
+        pool = WorkerPool(root, workers, poll_interval=0.05, drain=True,
+                          initializer=_use_stub, initargs=(stub_url,)).start()
+        pool.join()
+        wall = time.perf_counter() - start
+        counts = queue.counts()
+        return {"wall_s": wall, "jobs_per_s": counts["done"] / wall, **counts}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def resume_check(workers: int, jobs: int, questions: int, stub) -> dict:
+    """
+    Kill the pool once half the jobs are done, then drain the rest with a new pool.
+    """
+    root = tempfile.mkdtemp(prefix="bench_jobs_")
+    try:
+        queue = _fill(root, jobs, questions, "llm")
+        calls_before = stub.stats["requests"]
+        pool = WorkerPool(root, workers, poll_interval=0.05, initializer=_use_stub, initargs=(stub.url,)).start()
+        while queue.counts()["done"] < jobs // 2:
+            time.sleep(0.05)
+        running = queue.counts()["running"]
+        for process in pool._processes:
+            process.kill()
+        pool.join()
+
+        start = time.perf_counter()
+        WorkerPool(root, workers, poll_interval=0.05, drain=True,
+                   initializer=_use_stub, initargs=(stub.url,)).start().join()
+        return {
+            "interrupted": running,
+            "resume_s": time.perf_counter() - start,
+            "llm_calls": stub.stats["requests"] - calls_before,
+            **queue.counts(),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job queue throughput vs workers, and resume after a crash")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--jobs", type=int, default=32)
+    parser.add_argument("--questions", type=int, default=75)
+    parser.add_argument("--engine", choices=("rules", "llm"), default="llm")
+    parser.add_argument("--stub-overhead", type=float, default=0.35, help="stub LLM seconds per call")
+    parser.add_argument("--stub-decode-tps", type=float, default=400.0)
+    parser.add_argument("--no-resume-check", action="store_true")
+    args = parser.parse_args()
+
+    from benchmarks.stub_llm import StubLLM
+
+    with StubLLM(overhead_s=args.stub_overhead, decode_tps=args.stub_decode_tps) as stub:
+        print(f"{args.jobs} jobs, engine {args.engine}, {os.cpu_count()} CPUs")
+        print(f"{'workers':>7} | {'wall s':>7} | {'jobs/s':>7} | {'speed-up':>8} | {'done':>5} | {'failed':>6}")
+        base = None
+        for workers in args.workers:
+            r = throughput(workers, args.jobs, args.questions, args.engine, stub.url)
+            base = base or r["jobs_per_s"]
+            print(f"{workers:>7} | {r['wall_s']:>7.1f} | {r['jobs_per_s']:>7.2f} | "
+                  f"{r['jobs_per_s'] / base:>7.2f}x | {r['done']:>5} | {r['failed']:>6}")
+
+        if not args.no_resume_check:
+            workers = max(args.workers)
+            r = resume_check(workers, args.jobs, args.questions, stub)
+            print(f"\nresume: killed {workers} workers with {r['interrupted']} jobs running; a new pool finished "
+                  f"the rest in {r['resume_s']:.1f}s → {r['done']}/{args.jobs} done, {r['failed']} failed, "
+                  f"{r['llm_calls']} LLM calls for {args.jobs} jobs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
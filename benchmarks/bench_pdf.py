@@ -0,0 +1,119 @@
+# benchmarks/bench_pdf.py
+#
+# PDFs/sec and pages/sec for report PDFs (rule-based feedback + the four charts).
+#
+#   python -m benchmarks.bench_pdf                         # 500 reports per mode
+#   python -m benchmarks.bench_pdf --reports 2000 --modes engine pool --workers 4
+#
+# Modes:
+#   legacy  – the previous implementation: Pillow-encoded RGBA chart PNGs decoded and
+#             recompressed by drawImage, per-character sanitizer, simpleSplit
+#   engine  – app.pdf_generator.create_pdf_report, one process
+#   pool    – app.pdf_generator.create_pdf_reports over --workers processes
+
+import argparse
+import io
+import os
+import time
+
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfgen import canvas
+
+from app.charts import ChartRenderer
+from app.data_processor import parse_json_to_df
+from app.pdf_generator import LAYOUT, create_pdf_report, create_pdf_reports
+from app.rule_feedback import generate_rule_feedback
+
+SAMPLE = os.path.join("data", "submission1.json")
+
+
+def _legacy_sanitize(s: str) -> str:
+    s = s.replace("–", "-").replace("—", "-").replace("“", '"').replace("”", '"')
+    s = s.replace("‘", "'").replace("’", "'")
+    return "".join(ch for ch in s if not (ord(ch) <= 0x1F and ch not in "\n\r\t"))
+
+
+def _legacy_report(student_name: str, feedback: dict, pngs: list) -> bytes:
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=LAYOUT.pagesize)
+    leading = LAYOUT.leading
+
+    def wrapped(text, y, font, size):
+        c.setFont(font, size)
+        for line in simpleSplit(_legacy_sanitize(text), font, size, LAYOUT.text_width):
+            if y < LAYOUT.bottom + leading:
+                c.showPage()
+                y = LAYOUT.top
+                c.setFont(font, size)
+            c.drawString(LAYOUT.left, y, line)
+            y -= leading
+        return y
+
+    y = LAYOUT.top
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(LAYOUT.left, y, _legacy_sanitize(f"{student_name} - Performance Feedback"))
+    y = wrapped(feedback["intro"], y - leading - 10, "Helvetica", 12) - 20
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(LAYOUT.left, y, "Performance Breakdown")
+    y = wrapped(feedback["breakdown"], y - leading - 10, "Helvetica", 12) - 20
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(LAYOUT.left, y, "Actionable Suggestions")
+    y -= leading + 10
+    for sugg in feedback["suggestions"]:
+        y = wrapped("• " + sugg, y, "Helvetica", 12) - 5
+    for png in pngs:
+        c.showPage()
+        reader = ImageReader(io.BytesIO(png))
+        width, height = reader.getSize()
+        c.drawImage(reader, *LAYOUT.image_box(width, height))
+    c.save()
+    return buffer.getvalue()
+
+
+def _pages(pdf: bytes) -> int:
+    return pdf.count(b"/Type /Page\n") + pdf.count(b"/Type /Page ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF report generation benchmark")
+    parser.add_argument("--reports", type=int, default=500, help="reports per mode")
+    parser.add_argument("--modes", nargs="+", default=["legacy", "engine", "pool"],
+                        choices=["legacy", "engine", "pool"])
+    parser.add_argument("--workers", type=int, default=None, help="pool processes (default: CPU count)")
+    args = parser.parse_args()
+
+    with open(SAMPLE, "rb") as f:
+        df_all, summary_dict = parse_json_to_df(f.read())
+    renderer = ChartRenderer()
+    charts = renderer.render_all(df_all, summary_dict)
+    # What charts looked like before: Pillow-encoded RGBA PNGs
+    legacy_pngs = []
+    for t in renderer._templates.values():
+        buf = io.BytesIO()
+        t["fig"].savefig(buf, format="png", dpi=renderer.dpi, bbox_inches=t["bbox"])
+        legacy_pngs.append(buf.getvalue())
+    feedback = generate_rule_feedback(summary_dict)
+    reports = [
+        {"student_name": f"Student {i:05d}", "feedback": feedback, "chart_figs": charts}
+        for i in range(args.reports)
+    ]
+
+    print(f"{'mode':>7} | {'reports':>7} | {'PDFs/s':>8} | {'pages/s':>8} | {'ms/PDF':>7} | {'avg KB':>7}")
+    for mode in args.modes:
+        if mode == "legacy":
+            run = lambda: [_legacy_report(r["student_name"], feedback, legacy_pngs) for r in reports]
+        elif mode == "engine":
+            run = lambda: [create_pdf_report(r["student_name"], r["feedback"], r["chart_figs"]) for r in reports]
+        else:
+            run = lambda: create_pdf_reports(reports, workers=args.workers)
+
+        start = time.perf_counter()
+        pdfs = run()
+        elapsed = time.perf_counter() - start
+        pages = sum(_pages(pdf) for pdf in pdfs)
+        print(f"{mode:>7} | {len(pdfs):>7} | {len(pdfs) / elapsed:>8.1f} | {pages / elapsed:>8.1f} | "
+              f"{elapsed / len(pdfs) * 1000:>7.1f} | {sum(map(len, pdfs)) / len(pdfs) / 1024:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/bench_question_table.py
+#
+# Compares the columnar question-table builder (app.data_processor._build_question_columns)
+# with the previous row-of-dicts builder at 10k / 100k / 1M question rows.
+#
+#   python -m benchmarks.bench_question_table
+#   python -m benchmarks.bench_question_table --sizes 10000 100000
+
+import argparse
+import gc
+import random
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from app.data_processor import _build_question_columns
+
+CHAPTERS = ["Capacitance", "Electrostatics", "Electrochemistry", "Solutions",
+            "Functions", "Sets and Relations", "Current Electricity", "Thermodynamics"]
+LEVELS = ["easy", "medium", "hard"]
+
+
+def make_sections(n_questions: int, seed: int = 0) -> list:
+    """
+    Synthetic sections→questions in the submission schema (question HTML omitted,
+    it is never read by either builder).
+    """
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(n_questions):
+        chapter = rng.choice(CHAPTERS)
+        questions.append({
+            "questionId": {
+                "chapters": [{"title": chapter}],
+                "topics": [{"title": f"{chapter} topic {rng.randint(1, 6)}"}],
+                "concepts": [{"title": f"{chapter} concept {rng.randint(1, 12)}"}],
+                "level": rng.choice(LEVELS),
+            },
+            "markedOptions": [{"isCorrect": rng.random() < 0.6}],
+            "inputValue": {"value": None, "isCorrect": False},
+            "timeTaken": rng.randint(5, 300),
+        })
+    return [{"questions": questions}]
+
+
+def legacy_build(sections: list) -> pd.DataFrame:
+    """
+    The original parse_json_to_df question loop: one dict per question, list-valued
+    topics/concepts cells, then pd.DataFrame(list_of_dicts).
+    """
+    questions_data = []
+    for section in sections:
+        for q in section.get("questions", []):
+            qid = q.get("questionId", {})
+            chapters = qid.get("chapters", [])
+            chapter_title = chapters[0].get("title") if chapters else "Unknown Chapter"
+            topic_titles = [t.get("title") for t in qid.get("topics", []) if "title" in t]
+            concept_titles = [c.get("title") for c in qid.get("concepts", []) if "title" in c]
+            accuracy_flag = 0
+            for mo in q.get("markedOptions", []):
+                if mo.get("isCorrect", False):
+                    accuracy_flag = 1
+                    break
+            if q.get("inputValue", {}).get("isCorrect", False):
+                accuracy_flag = 1
+            questions_data.append({
+                "timestamp": None,
+                "chapter": chapter_title,
+                "topics": topic_titles,
+                "concepts": concept_titles,
+                "difficulty": qid.get("level", None),
+                "accuracy": accuracy_flag,
+                "time_spent": q.get("timeTaken", None),
+            })
+    df = pd.DataFrame(questions_data)
+    df["timestamp"] = pd.date_range(start=datetime.now(), periods=len(df), freq="min")
+    return df
+
+
+def _time(fn, *args, repeat: int = 3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Question-table builder benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} | {'legacy s':>9} | {'columnar s':>10} | {'speedup':>7} | "
+          f"{'legacy MB':>9} | {'columnar MB':>11} | {'mem ratio':>9}")
+    for n in args.sizes:
+        sections = make_sections(n)
+        legacy_s, legacy_df = _time(legacy_build, sections, repeat=args.repeat)
+        new_s, (new_df, tags_df) = _time(_build_question_columns, sections, repeat=args.repeat)
+
+        legacy_mb = legacy_df.memory_usage(deep=True).sum() / 1e6
+        # The columnar layout needs the exploded tag table too, so count both
+        new_mb = (new_df.memory_usage(deep=True).sum() + tags_df.memory_usage(deep=True).sum()) / 1e6
+
+        print(f"{n:>9,} | {legacy_s:>9.3f} | {new_s:>10.3f} | {legacy_s / new_s:>6.2f}x | "
+              f"{legacy_mb:>9.1f} | {new_mb:>11.1f} | {legacy_mb / new_mb:>8.1f}x")
+        del sections, legacy_df, new_df, tags_df
+
+
+if __name__ == "__main__":
+    main()
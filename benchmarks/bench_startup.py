@@ -0,0 +1,105 @@
+# benchmarks/bench_startup.py
+#
+# Start-up cost of the app modules and CLIs.
+#
+#   python -m benchmarks.bench_startup
+#   python -m benchmarks.bench_startup --repeat 10 --modules app.batch app.feedback_generator --top 15
+#   python -m benchmarks.bench_startup --commands "app.batch --help" "app.analytics_store --help"
+#
+# Import time: each module is imported in a fresh `python -X importtime` process
+# (--repeat times, median reported); the slowest imports by self time are listed
+# for the first module, to show what still loads eagerly.
+#
+# CLI start-up: wall time of `python -m <command>` for each --commands entry, run
+# cold and through a warm worker (app/warm_worker.py, started for the run).
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_MODULES = [
+    "app.prompt_builder",
+    "app.rule_feedback",
+    "app.llm_client",
+    "app.feedback_generator",
+    "app.charts",
+    "app.pdf_generator",
+    "app.data_processor",
+    "app.batch",
+]
+
+
+def import_times(module: str) -> dict:
+    """
+    {imported package: (self µs, cumulative µs)} for `import module` in a new interpreter.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def cli_seconds(argv: list) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *argv], capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and CLI start-up benchmark")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median reported)")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports listed for the first module")
+    parser.add_argument("--commands", nargs="*", default=["app.batch --help", "app.cohort_stats --help"],
+                        help="CLI invocations (module and arguments) for the cold vs warm comparison")
+    args = parser.parse_args()
+
+    print(f"{'module':<24} | {'import ms':>9} | {'modules':>7} | heavy dependencies loaded")
+    first = None
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.repeat)]
+        first = first or runs[-1]
+        ms = statistics.median(r[module][1] for r in runs) / 1000
+        heavy = [m for m in ("numpy", "pandas", "matplotlib", "reportlab", "requests") if m in runs[-1]]
+        print(f"{module:<24} | {ms:>9.1f} | {len(runs[-1]):>7} | {', '.join(heavy) or '-'}")
+
+    print(f"\nslowest imports (self time) under `import {args.modules[0]}`:")
+    for name, (self_us, _) in sorted(first.items(), key=lambda kv: -kv[1][0])[:args.top]:
+        print(f"  {self_us / 1000:>8.1f} ms  {name}")
+
+    if not args.commands:
+        return
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.warm_worker", "--socket", socket_path, "serve", "--workers", "2"],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        server.stdout.readline()   # "listening" once preloaded
+        print(f"\n{'command':<32} | {'cold ms':>8} | {'warm ms':>8}   (median of {args.repeat})")
+        for command in args.commands:
+            argv = command.split()
+            cold = [cli_seconds(["-m", *argv]) for _ in range(args.repeat)]
+            warm = [cli_seconds(["-m", "app.warm_worker", "--socket", socket_path, "run", *argv])
+                    for _ in range(args.repeat)]
+            print(f"{command:<32} | {statistics.median(cold) * 1000:>8.1f} | {statistics.median(warm) * 1000:>8.1f}")
+    finally:
+        subprocess.run([sys.executable, "-m", "app.warm_worker", "--socket", socket_path, "stop"],
+                       capture_output=True)
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# benchmarks/loadtest.py
+#
+# Load test for the HTTP service (app/service.py): sustained requests/s and tail
+# latency per load level.
+#
+#   python -m benchmarks.loadtest                                   # /v1/report, rules engine
+#   python -m benchmarks.loadtest --endpoint feedback --engine llm --concurrency 8 32 128
+#   python -m benchmarks.loadtest --rate 5 10 20 --duration 30      # open loop: fixed arrival rate
+#   python -m benchmarks.loadtest --url http://127.0.0.1:8000       # an already running service
+#
+# Without --url the service is started in a subprocess with its LLM pointed at a
+# local stub (benchmarks/stub_llm.py; --stub-overhead etc. set its latency), so
+# nothing is spent on tokens. Request bodies are synthetic submissions
+# (benchmarks/synthetic.py), one per --students, sent round-robin.
+#
+# --concurrency N is a closed loop: N clients, each sending its next request as soon
+# as the last one finished. --rate R is an open loop: R requests/s arrive no matter
+# how fast the server answers, which is what shows the backpressure (503s) working.
+# Each level runs for --duration seconds after --warmup seconds that are not counted.
+# Latency percentiles are over successful (200) responses only.
+
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+STARTUP_TIMEOUT_S = 60
+
+
+# ─── Minimal HTTP/1.1 client (keep-alive, one connection per client) ──────────────
+
+class _Connection:
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b"") -> tuple:
+        """
+        (status, response body). Reconnects once if the kept-alive connection was closed.
+        """
+        for attempt in (0, 1):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                return await self._exchange(method, path, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if attempt:
+                    raise
+
+    async def _exchange(self, method: str, path: str, body: bytes) -> tuple:
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+        )
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            data = bytearray()
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                data += await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                del data[-2:]
+            payload = bytes(data)
+        else:
+            payload = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection") == "close":
+            self.close()
+        return status, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+# ─── Load levels ──────────────────────────────────────────────────────────────────
+
+class _Tally:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+
+    def add(self, status: int, seconds: float):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == 200:
+            self.latencies.append(seconds)
+
+
+async def _timed_request(conn: _Connection, path: str, body: bytes, tally: _Tally, counting) -> None:
+    start = time.perf_counter()
+    try:
+        status, _ = await conn.request("POST", path, body)
+    except (OSError, asyncio.IncompleteReadError, ValueError):
+        conn.close()
+        if counting():
+            tally.errors += 1
+        return
+    if counting():
+        tally.add(status, time.perf_counter() - start)
+
+
+async def closed_loop(host, port, path, bodies, concurrency, warmup, duration) -> _Tally:
+    tally = _Tally()
+    begin = time.perf_counter()
+    measure_from, stop_at = begin + warmup, begin + warmup + duration
+    counting = lambda: time.perf_counter() >= measure_from
+
+    async def client(i: int):
+        conn = _Connection(host, port)
+        n = i
+        while time.perf_counter() < stop_at:
+            await _timed_request(conn, path, bodies[n % len(bodies)], tally, counting)
+            n += concurrency
+        conn.close()
+
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return tally
+
+
+async def open_loop(host, port, path, bodies, rate, warmup, duration) -> _Tally:
+    """
+    Requests start every 1/rate seconds on their own connection (from a reuse pool),
+    whether or not earlier ones have finished.
+    """
+    tally = _Tally()
+    idle = []
+    pending = set()
+    begin = time.perf_counter()
+    measure_from = begin + warmup
+    counting = lambda: time.perf_counter() >= measure_from
+
+    async def one(body: bytes):
+        conn = idle.pop() if idle else _Connection(host, port)
+        await _timed_request(conn, path, body, tally, counting)
+        idle.append(conn)
+
+    n = 0
+    while True:
+        due = begin + n / rate
+        if due >= begin + warmup + duration:
+            break
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        task = asyncio.create_task(one(bodies[n % len(bodies)]))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        n += 1
+    if pending:
+        await asyncio.wait(pending)
+    for conn in idle:
+        conn.close()
+    return tally
+
+
+def _row(label: str, tally: _Tally, duration: float) -> str:
+    ok = len(tally.latencies)
+    shed = tally.statuses.get(503, 0)
+    other = sum(n for status, n in tally.statuses.items() if status not in (200, 503)) + tally.errors
+    if tally.latencies:
+        ordered = sorted(tally.latencies)
+        pick = lambda q: ordered[min(ok - 1, int(q * ok))] * 1000
+        lat = f"{pick(0.50):>8.0f} | {pick(0.95):>8.0f} | {pick(0.99):>8.0f} | {ordered[-1] * 1000:>8.0f}"
+    else:
+        lat = " | ".join(f"{'-':>8}" for _ in range(4))
+    return f"{label:<12} | {ok / duration:>7.2f} | {ok:>6} | {shed:>6} | {other:>6} | {lat}"
+
+
+# ─── Service under test ───────────────────────────────────────────────────────────
+
+def _serve_with_stub(args):
+    """
+    Run app.service in this process with the LLM client pointed at a StubLLM.
+    """
+    import app.llm_client as llm_client
+    from app import service
+    from benchmarks.stub_llm import StubLLM
+
+    stub = StubLLM(
+        overhead_s=args.stub_overhead, prefill_tps=args.stub_prefill_tps, decode_tps=args.stub_decode_tps
+    ).start()
+    llm_client.LLM_CACHE_MODE = "off"
+    llm_client._default_client = llm_client.LLMClient(api_url=stub.url, api_key="stub")
+    try:
+        service.run(port=args.port, log_level="warning", service=service.FeedbackService(
+            workers=args.workers or service.SERVICE_WORKERS, max_inflight=args.max_inflight, max_queue=args.max_queue,
+        ))
+    finally:
+        stub.stop()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_service(args) -> tuple:
+    port = _free_port()
+    argv = [
+        sys.executable, "-m", "benchmarks.loadtest", "--serve", "--port", str(port),
+        "--stub-overhead", str(args.stub_overhead),
+        "--stub-prefill-tps", str(args.stub_prefill_tps), "--stub-decode-tps", str(args.stub_decode_tps),
+        "--max-inflight", str(args.max_inflight), "--max-queue", str(args.max_queue),
+    ]
+    if args.workers:
+        argv += ["--workers", str(args.workers)]
+    proc = subprocess.Popen(argv)
+    deadline = time.monotonic() + STARTUP_TIMEOUT_S
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"service exited with status {proc.returncode}")
+        try:
+            status, _ = asyncio.run(_Connection("127.0.0.1", port).request("GET", "/healthz"))
+            if status == 200:
+                return proc, "127.0.0.1", port
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"service not up after {STARTUP_TIMEOUT_S}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for app.service")
+    parser.add_argument("--url", help="service to test (default: start one with a stub LLM)")
+    parser.add_argument("--endpoint", choices=("summary", "feedback", "report"), default="report")
+    parser.add_argument("--engine", choices=("rules", "llm"), default="rules")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="closed-loop client counts")
+    parser.add_argument("--rate", type=float, nargs="+", help="open-loop arrival rates (req/s) instead")
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each level")
+    parser.add_argument("--students", type=int, default=50, help="distinct submissions to send")
+    parser.add_argument("--questions", type=int, default=75)
+    # Settings of the service started without --url
+    parser.add_argument("--workers", type=int, help="service worker processes (default: CPU count)")
+    parser.add_argument("--max-inflight", type=int, default=16)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--stub-overhead", type=float, default=0.35, help="stub LLM seconds per call")
+    parser.add_argument("--stub-prefill-tps", type=float, default=20_000.0)
+    parser.add_argument("--stub-decode-tps", type=float, default=400.0)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=8000, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return _serve_with_stub(args)
+
+    from benchmarks.synthetic import make_submission
+
+    bodies = [json.dumps([make_submission(i, args.questions)]).encode("utf-8") for i in range(args.students)]
+    path = f"/v1/{args.endpoint}?engine={args.engine}"
+
+    proc = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        proc, host, port = _start_service(args)
+    try:
+        mode = "rate" if args.rate else "concurrency"
+        print(f"POST {path}  ({len(bodies)} submissions × {args.questions} questions, "
+              f"{args.duration:g}s per level after {args.warmup:g}s warm-up)")
+        print(f"{mode:<12} | {'req/s':>7} | {'ok':>6} | {'503':>6} | {'other':>6} | "
+              f"{'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'max ms':>8}")
+        for level in args.rate or args.concurrency:
+            if args.rate:
+                tally = asyncio.run(open_loop(host, port, path, bodies, level, args.warmup, args.duration))
+            else:
+                tally = asyncio.run(closed_loop(host, port, path, bodies, level, args.warmup, args.duration))
+            print(_row(f"{level:g}", tally, args.duration))
+
+        status, payload = asyncio.run(_Connection(host, port).request("GET", "/healthz"))
+        if status == 200:
+            health = json.loads(payload)
+            print(f"\nadmitted {health['admitted']}, rejected {health['rejected_queue_full']} (queue full) "
+                  f"+ {health['rejected_timeout']} (queue timeout)")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# benchmarks/stub_llm.py
+#
+# A local stand-in for the chat completions API, for benchmarks that should not
+# spend real tokens. Replies are valid feedback JSON (an array for multi-student
+# prompts) and take as long as a real call would under a simple latency model:
+#
+#   overhead + prompt tokens / prefill rate + reply tokens / decode rate
+#
+# It reports usage like the real API does, so token accounting can be checked too.
+#
+#   python -m benchmarks.stub_llm --port 8099
+#   python -m benchmarks.bench_feedback_batch        (starts one in-process)
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.prompt_builder import count_tokens
+
+_BATCH_ID_RE = re.compile(r'^\{"id":"([^"]+)"', re.M)
+_FILLER = "Keep practising the step-by-step method and review each mistake once more. "
+
+
+class StubLLM:
+    """
+    Threaded HTTP server answering OpenAI-style chat completion requests.
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        overhead_s: float = 0.35,
+        prefill_tps: float = 20_000.0,
+        decode_tps: float = 400.0,
+        reply_tokens: int = 600,
+    ):
+        self.overhead_s = overhead_s
+        self.prefill_tps = prefill_tps
+        self.decode_tps = decode_tps
+        self.reply_tokens = reply_tokens
+        self.stats = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1/chat/completions"
+
+    def start(self) -> "StubLLM":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ─── Replies ──────────────────────────────────────────────────────────────────
+
+    def _feedback(self) -> dict:
+        # Roughly reply_tokens tokens, split like a real reply
+        words = _FILLER * max(1, self.reply_tokens // count_tokens(_FILLER))
+        return {
+            "intro": "Hi! " + words[: len(words) // 4].strip(),
+            "breakdown": words[len(words) // 4:].strip(),
+            "suggestions": ["Review one chapter a day.", "Take short breaks between sessions."],
+        }
+
+    def reply(self, prompt: str) -> str:
+        if "\nBATCH:" in prompt:
+            return json.dumps([{"id": i, **self._feedback()} for i in _BATCH_ID_RE.findall(prompt)])
+        return json.dumps(self._feedback())
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = body["messages"][-1]["content"] if "messages" in body else body.get("prompt", "")
+                content = stub.reply(prompt)
+                prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+                time.sleep(stub.overhead_s + prompt_tokens / stub.prefill_tps
+                           + completion_tokens / stub.decode_tps)
+                with stub._lock:
+                    stub.stats["requests"] += 1
+                    stub.stats["prompt_tokens"] += prompt_tokens
+                    stub.stats["completion_tokens"] += completion_tokens
+
+                out = json.dumps({
+                    "choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub chat completions server")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--overhead", type=float, default=0.35, help="seconds per request")
+    parser.add_argument("--decode-tps", type=float, default=400.0, help="reply tokens per second")
+    parser.add_argument("--reply-tokens", type=int, default=600, help="reply tokens per student")
+    args = parser.parse_args()
+
+    stub = StubLLM(args.port, overhead_s=args.overhead, decode_tps=args.decode_tps,
+                   reply_tokens=args.reply_tokens).start()
+    print(f"stub LLM listening on {stub.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
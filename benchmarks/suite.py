@@ -0,0 +1,237 @@
+# benchmarks/suite.py
+#
+# End-to-end benchmark suite over synthetic data (benchmarks/synthetic.py), with the
+# LLM replaced by a zero-latency local stub (benchmarks/stub_llm.py), so the numbers
+# are our own code's cost and stay comparable across commits.
+#
+#   python -m benchmarks.suite                          # run, save, compare with the last other commit
+#   python -m benchmarks.suite --filter parse charts    # only cases whose name contains one of these
+#   python -m benchmarks.suite --compare 7615ca5        # compare with a specific stored commit
+#   python -m benchmarks.suite --history                # every stored commit, oldest first
+#
+# Cases: parse_json_to_df at several paper sizes, each plot_* chart function (figure
+# plus PNG, as the app uses it), create_pdf_report and generate_feedback_sections.
+# Each case runs until --min-time seconds and at least --min-runs calls have
+# passed, after one warm-up call; the median is the headline number.
+#
+# Results go to benchmarks/results/<machine>/<commit>.json (git-ignored, so they
+# survive checkouts). A case more than --threshold slower than the baseline is
+# flagged, and --fail-on-regression makes that the exit status.
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+PARSE_SIZES = (75, 1_000, 20_000)
+
+
+# ─── Cases ────────────────────────────────────────────────────────────────────────
+
+def build_cases() -> dict:
+    """
+    {case name: zero-argument callable}. Inputs are prepared here, outside the timing.
+    """
+    from app.charts import (
+        ChartImage,
+        plot_accuracy_over_time,
+        plot_chapter_breakdown,
+        plot_concept_breakdown,
+        plot_percentile_breakdown,
+        plot_subject_breakdown,
+    )
+    from app.data_processor import parse_json_to_df
+    from app.feedback_generator import generate_feedback_sections
+    from app.pdf_generator import create_pdf_report
+    from app.rule_feedback import generate_rule_feedback
+    from benchmarks.synthetic import make_submission
+
+    cases = {}
+    for n in PARSE_SIZES:
+        raw = json.dumps([make_submission(0, n)]).encode("utf-8")
+        cases[f"parse_json_to_df[{n}q]"] = lambda raw=raw: parse_json_to_df(raw)
+
+    df_all, summary = parse_json_to_df(json.dumps([make_submission(0, 75)]).encode("utf-8"))
+    chapters = summary["chapter_summary_df"].copy()
+    chapters["accuracy_percentile"] = chapters["accuracy"].rank(pct=True) * 100
+    charts = {
+        "plot_accuracy_over_time": lambda: plot_accuracy_over_time(df_all),
+        "plot_chapter_breakdown": lambda: plot_chapter_breakdown(summary["chapter_summary_df"]),
+        "plot_subject_breakdown": lambda: plot_subject_breakdown(summary["subject_summary_df"]),
+        "plot_concept_breakdown": lambda: plot_concept_breakdown(summary["tag_summary_df"]),
+        "plot_percentile_breakdown": lambda: plot_percentile_breakdown(chapters),
+    }
+    for name, plot in charts.items():
+        cases[f"charts.{name}"] = lambda plot=plot: ChartImage.from_figure(plot())
+
+    images = [ChartImage.from_figure(plot()) for plot in list(charts.values())[:4]]
+    feedback = generate_rule_feedback(summary)
+    cases["create_pdf_report[4 charts]"] = lambda: create_pdf_report(summary["student_name"], feedback, images)
+
+    cases["generate_feedback_sections[stub]"] = lambda: generate_feedback_sections(summary)
+    return cases
+
+
+def _use_stub_llm():
+    """
+    Point the shared LLM client at a zero-latency stub; bypass the response cache.
+    """
+    import app.llm_client as llm_client
+    from benchmarks.stub_llm import StubLLM
+
+    stub = StubLLM(overhead_s=0.0, prefill_tps=float("inf"), decode_tps=float("inf")).start()
+    llm_client.LLM_CACHE_MODE = "off"
+    llm_client._default_client = llm_client.LLMClient(api_url=stub.url, api_key="stub")
+    return stub
+
+
+def measure(fn, min_time: float, min_runs: int) -> dict:
+    fn()   # warm-up: imports, caches, first-call setup
+    times = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < min_runs or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    q1, q3 = times[len(times) // 4], times[(3 * len(times)) // 4]
+    return {
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "min_ms": round(times[0] * 1000, 3),
+        "iqr_ms": round((q3 - q1) * 1000, 3),
+        "runs": len(times),
+    }
+
+
+# ─── Stored results ───────────────────────────────────────────────────────────────
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _load_results(machine: str) -> list:
+    runs = []
+    for path in glob.glob(os.path.join(RESULTS_DIR, machine, "*.json")):
+        with open(path, encoding="utf-8") as f:
+            runs.append(json.load(f))
+    return sorted(runs, key=lambda r: (r["commit_date"], r["date"]))
+
+
+def _baseline(runs: list, commit: str, ref: str = None):
+    """
+    The stored run for commit `ref` (a prefix is enough), or by default the most
+    recent run of a different commit.
+    """
+    if ref:
+        matches = [r for r in runs if r["commit"].startswith(ref)]
+        return matches[-1] if matches else None
+    others = [r for r in runs if r["commit"] != commit]
+    return others[-1] if others else None
+
+
+def _print_comparison(results: dict, baseline: dict, threshold: float) -> int:
+    print(f"\nvs {baseline['commit'][:10]} ({baseline['commit_date'][:10]}, {baseline['subject']})")
+    print(f"{'case':<40} | {'median ms':>10} | {'base ms':>10} | {'ratio':>6}")
+    regressions = 0
+    for name, r in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<40} | {r['median_ms']:>10.2f} | {'-':>10} | {'new':>6}")
+            continue
+        ratio = r["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag, regressions = "  REGRESSION", regressions + 1
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{name:<40} | {r['median_ms']:>10.2f} | {base['median_ms']:>10.2f} | {ratio:>6.2f}{flag}")
+    return regressions
+
+
+def _print_history(runs: list, names: list):
+    print(f"{'commit':<10} {'date':<10} " + " ".join(f"{n[:24]:>24}" for n in names))
+    for run in runs:
+        cells = [run["results"].get(n, {}).get("median_ms") for n in names]
+        print(f"{run['commit'][:10]:<10} {run['commit_date'][:10]:<10} "
+              + " ".join(f"{c:>24.2f}" if c is not None else f"{'-':>24}" for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark suite with stored results")
+    parser.add_argument("--filter", nargs="+", help="run only cases whose name contains one of these")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per case")
+    parser.add_argument("--min-runs", type=int, default=5)
+    parser.add_argument("--machine", default=platform.node() or "local", help="results subdirectory")
+    parser.add_argument("--compare", metavar="COMMIT", help="baseline commit (default: last other stored commit)")
+    parser.add_argument("--threshold", type=float, default=0.15, help="slowdown flagged as a regression")
+    parser.add_argument("--no-save", action="store_true", help="do not store this run")
+    parser.add_argument("--history", action="store_true", help="print stored results per commit and exit")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    runs = _load_results(args.machine)
+    if args.history:
+        names = sorted({n for r in runs for n in r["results"]
+                        if not args.filter or any(f in n for f in args.filter)})
+        _print_history(runs, names)
+        return 0
+
+    stub = _use_stub_llm()
+    try:
+        cases = build_cases()
+        if args.filter:
+            cases = {n: fn for n, fn in cases.items() if any(f in n for f in args.filter)}
+        results = {}
+        print(f"{'case':<40} | {'median ms':>10} | {'min ms':>9} | {'IQR ms':>8} | {'runs':>5}")
+        for name, fn in cases.items():
+            r = results[name] = measure(fn, args.min_time, args.min_runs)
+            print(f"{name:<40} | {r['median_ms']:>10.2f} | {r['min_ms']:>9.2f} | {r['iqr_ms']:>8.2f} | {r['runs']:>5}")
+    finally:
+        stub.stop()
+
+    commit = _git("rev-parse", "HEAD") or "unknown"
+    run = {
+        "commit": commit,
+        "commit_date": _git("show", "-s", "--format=%cI", "HEAD") or "",
+        "subject": _git("show", "-s", "--format=%s", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": args.machine,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+    regressions = 0
+    baseline = _baseline(runs, commit, args.compare)
+    if baseline is not None:
+        regressions = _print_comparison(results, baseline, args.threshold)
+    elif args.compare:
+        print(f"\nno stored results for {args.compare} on {args.machine}")
+
+    if not args.no_save:
+        path = os.path.join(RESULTS_DIR, args.machine, f"{commit[:12]}{'-dirty' if run['dirty'] else ''}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            # Same commit run again (e.g. with --filter): keep the other cases' results
+            with open(path, encoding="utf-8") as f:
+                run["results"] = {**json.load(f)["results"], **results}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=1)
+        print(f"\nsaved {os.path.relpath(path)}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
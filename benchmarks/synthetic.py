@@ -0,0 +1,343 @@
+# benchmarks/synthetic.py
+#
+# Synthetic submissions in the schema of data/submission1.json (subjects, sections →
+# questions with chapters/topics/concepts/level/question text, markedOptions,
+# inputValue, timeTaken, status), from 1 to 1M questions per test and 1 to 100k
+# students, for benchmarks and load tests.
+#
+#   python -m benchmarks.synthetic --students 1 --questions 75 --out .cache/synthetic/one.json
+#   python -m benchmarks.synthetic --students 100000 --out .cache/synthetic/cohort/ --per-file 1000
+#   python -m benchmarks.synthetic --students 1 --questions 1000000 --out .cache/synthetic/huge.json
+#
+# Every student sits the same paper (same question order, chapters, topics and
+# difficulty, all fixed by --seed). Answers follow a simple model fitted by eye to
+# the sample: ~63% answered, ~31% marked for review, ~75% of answered questions
+# correct on average, lognormal time per question (slower on hard questions), and
+# per-student / per-subject ability so chapters and students differ.
+# Output is deterministic for a given seed, whatever the file split or worker count.
+#
+# make_submission() returns one submission as a dict; write_submissions() streams
+# students to a JSON list file one at a time. Papers with more than STREAM_QUESTIONS
+# questions are never held in memory at all.
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+
+SUBJECTS = (
+    ("Physics", "607018ee404ae53194e73d92", (
+        "Capacitance", "Electrostatics", "Current Electricity", "Magnetic Effects of Current",
+        "Ray Optics", "Rotational Motion", "Thermodynamics", "Laws of Motion",
+        "Work Power Energy", "Modern Physics",
+    )),
+    ("Chemistry", "607018ee404ae53194e73d90", (
+        "Electrochemistry", "Solutions", "Chemical Kinetics", "Chemical Bonding",
+        "Thermodynamics (C)", "Hydrocarbons", "Coordination Compounds", "Equilibrium",
+        "p-Block Elements", "Aldehydes and Ketones",
+    )),
+    ("Mathematics", "607018ee404ae53194e73d91", (
+        "Functions", "Sets and Relations", "Limits", "Definite Integration", "Matrices",
+        "Complex Numbers", "Probability", "Vectors", "Conic Sections", "Sequences and Series",
+    )),
+)
+TOPIC_SUFFIXES = ("Fundamentals", "Applications", "Graphs and Diagrams", "Special Cases",
+                  "Numerical Problems", "Advanced Problems")
+CONCEPTS_PER_TOPIC = 4
+LEVELS = ("easy", "medium", "hard")
+LEVEL_WEIGHTS = (0.3, 0.5, 0.2)
+LEVEL_DIFFICULTY = {"easy": -1.0, "medium": 0.0, "hard": 1.2}
+LEVEL_TIME = {"easy": 0.7, "medium": 1.0, "hard": 1.6}
+
+NUMERICAL_SHARE = 0.2          # per subject: 20 single-correct + 5 numerical in the sample
+STATUS_WEIGHTS = (("answered", 0.63), ("markedReview", 0.31), ("notAnswered", 0.06))
+MEDIAN_SECONDS = 45.0
+TEST_MINUTES = 180
+TEST_DATE = datetime(2025, 5, 11, 9, 0, tzinfo=timezone.utc)
+_WORDS = ("the", "a", "capacitor", "charge", "field", "potential", "current", "mass", "velocity",
+          "function", "value", "is", "of", "and", "find", "if", "then", "with", "at", "$x$",
+          "$\\mu \\mathrm{F}$", "$50 \\mathrm{~V}$", "solution", "reaction", "rate", "equal")
+
+# Papers larger than this are generated on the fly instead of cached per process
+STREAM_QUESTIONS = 20_000
+
+
+# ─── The paper (shared by every student) ──────────────────────────────────────────
+
+def _layout(n_questions: int) -> list:
+    """
+    [(subject index, section title, kind, count), ...]: questions split evenly over
+    the subjects, each with a single-correct and a numerical section.
+    """
+    per_subject = [n_questions // len(SUBJECTS) + (i < n_questions % len(SUBJECTS))
+                   for i in range(len(SUBJECTS))]
+    layout = []
+    for s, count in enumerate(per_subject):
+        numerical = int(round(count * NUMERICAL_SHARE)) if count > 1 else 0
+        name = SUBJECTS[s][0]
+        if count - numerical:
+            layout.append((s, f"{name} Single Correct", "single", count - numerical))
+        if numerical:
+            layout.append((s, f"{name} Numerical", "numerical", numerical))
+    return layout
+
+
+def _question_text(rng: random.Random, chars: int) -> str:
+    if chars <= 0:
+        return ""
+    words, size = [], 0
+    while size < chars:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:chars].rstrip() + "?"
+
+
+def iter_paper(n_questions: int, seed: int = 0, text_chars: int = 300):
+    """
+    Yield (section index, subject index, kind, questionId dict) for every question.
+    """
+    rng = random.Random(f"{seed}:paper")
+    for section, (s, _, kind, count) in enumerate(_layout(n_questions)):
+        chapters = SUBJECTS[s][2]
+        for _ in range(count):
+            chapter = rng.choice(chapters)
+            topic = f"{chapter}: {rng.choice(TOPIC_SUFFIXES)}"
+            yield section, s, kind, {
+                "chapters": [{"title": chapter}],
+                "topics": [{"title": topic}],
+                "concepts": [{"title": f"{topic} concept {rng.randint(1, CONCEPTS_PER_TOPIC)}"}],
+                "level": rng.choices(LEVELS, LEVEL_WEIGHTS)[0],
+                "question": {"text": _question_text(rng, int(rng.uniform(0.4, 1.6) * text_chars))},
+            }
+
+
+@lru_cache(maxsize=4)
+def _paper(n_questions: int, seed: int, text_chars: int) -> tuple:
+    return tuple(iter_paper(n_questions, seed, text_chars))
+
+
+def _paper_for(n_questions: int, seed: int, text_chars: int):
+    if n_questions <= STREAM_QUESTIONS:
+        return _paper(n_questions, seed, text_chars)
+    return iter_paper(n_questions, seed, text_chars)
+
+
+# ─── One student's answers ────────────────────────────────────────────────────────
+
+def _oid(rng: random.Random, when: float) -> dict:
+    return {"$oid": f"{int(when):08x}{rng.getrandbits(64):016x}"}
+
+
+def _number(value: float):
+    return int(value) if float(value).is_integer() else value
+
+
+class _Totals:
+    __slots__ = ("time", "marks", "attempted", "correct")
+
+    def __init__(self):
+        self.time = self.marks = self.attempted = self.correct = 0
+
+    def as_dict(self) -> dict:
+        accuracy = 100 * self.correct / self.attempted if self.attempted else 0
+        return {
+            "totalTimeTaken": self.time,
+            "totalMarkScored": self.marks,
+            "totalAttempted": self.attempted,
+            "totalCorrect": self.correct,
+            "accuracy": _number(accuracy),
+        }
+
+
+def _iter_answers(student: int, seed: int, paper, when: float):
+    """
+    Yield (section index, subject index, question dict, marks, attempted, correct)
+    for one student working through `paper` in order.
+    """
+    rng = random.Random(f"{seed}:student:{student}")
+    ability = rng.gauss(0.0, 1.0)
+    subject_ability = [ability + rng.gauss(0.0, 0.5) for _ in SUBJECTS]
+    pace = math.exp(rng.gauss(0.0, 0.25))
+    statuses, status_weights = zip(*STATUS_WEIGHTS)
+    clock = 0.0
+
+    for section, s, kind, question_id in paper:
+        level = question_id["level"]
+        status = rng.choices(statuses, status_weights)[0]
+        # A few questions marked for review still carry an answer, as in the sample
+        answered = status == "answered" or (status == "markedReview" and rng.random() < 0.05)
+        seconds = max(1, min(900, round(MEDIAN_SECONDS * pace * LEVEL_TIME[level]
+                                        * math.exp(rng.gauss(0.0, 0.8)) * (1.0 if answered else 0.6))))
+        clock += seconds
+        correct = answered and rng.random() < 1 / (1 + math.exp(-(
+            1.2 * (subject_ability[s] - LEVEL_DIFFICULTY[level]) + 1.6)))
+
+        if answered and kind == "single":
+            marked = [{"_id": _oid(rng, when), "optionId": f"{rng.getrandbits(24):06x}", "isCorrect": correct}]
+            input_value = {"value": None, "isCorrect": False}
+            marks = 4 if correct else -1
+        elif answered:
+            marked = []
+            input_value = {"value": str(rng.randint(1, 100)), "isCorrect": correct}
+            marks = 4 if correct else 0
+        else:
+            marked, input_value, marks = [], {"value": None, "isCorrect": False}, 0
+
+        yield section, s, {
+            "questionId": question_id,
+            "markedOptions": marked,
+            "inputValue": input_value,
+            "timeTaken": seconds,
+            "timeLeftWhenAttempted": max(0, TEST_MINUTES - int(clock // 60)),
+            "status": status,
+        }, marks, answered, correct
+
+
+def _header(student: int, seed: int, n_questions: int) -> tuple:
+    """
+    (submission start time, the submission's leading fields).
+    """
+    rng = random.Random(f"{seed}:header:{student}")
+    when = TEST_DATE.timestamp() + rng.uniform(0, 3600)
+    return when, {
+        "_id": _oid(rng, when),
+        "student_name": f"Student {student:06d}",
+        "test": {
+            "syllabus": "<h1>Synthetic Test Syllabus</h1>\n" + "".join(
+                f"<h2>{name}</h2><p>{', '.join(chapters)}</p>\n" for name, _, chapters in SUBJECTS),
+            "totalTime": TEST_MINUTES,
+            "totalQuestions": n_questions,
+            "totalMarks": 4 * n_questions,
+        },
+    }
+
+
+def _summaries(student: int, seed: int, when: float, totals: list, overall: _Totals) -> dict:
+    rng = random.Random(f"{seed}:subjects:{student}")
+    return {
+        "subjects": [
+            {"_id": _oid(rng, when), "subjectId": {"$oid": SUBJECTS[s][1]}, **t.as_dict()}
+            for s, t in enumerate(totals)
+        ],
+        **overall.as_dict(),
+    }
+
+
+def _tally(totals: list, overall: _Totals, s: int, question: dict, marks: int, answered: bool, correct: bool):
+    for t in (totals[s], overall):
+        t.time += question["timeTaken"]
+        t.marks += marks
+        t.attempted += answered
+        t.correct += correct
+
+
+def make_submission(student: int = 0, n_questions: int = 75, seed: int = 0, text_chars: int = 300) -> dict:
+    """
+    Student `student`'s submission for the `n_questions`-question paper of `seed`.
+    """
+    when, submission = _header(student, seed, n_questions)
+    layout = _layout(n_questions)
+    sections = [{"sectionId": {"sectionType": "normal", "title": title, "maximumAttemptLimit": count},
+                 "questions": []} for _, title, _, count in layout]
+    totals, overall = [_Totals() for _ in SUBJECTS], _Totals()
+    for section, s, question, marks, answered, correct in _iter_answers(
+            student, seed, _paper_for(n_questions, seed, text_chars), when):
+        sections[section]["questions"].append(question)
+        _tally(totals, overall, s, question, marks, answered, correct)
+    submission.update(_summaries(student, seed, when, totals, overall))
+    submission["sections"] = sections
+    return submission
+
+
+def _write_streamed(f, student: int, n_questions: int, seed: int, text_chars: int):
+    """
+    Write one submission whose paper is too large to hold in memory: a first pass
+    over the answers only adds up the totals, a second one writes the questions.
+    """
+    when, submission = _header(student, seed, n_questions)
+    totals, overall = [_Totals() for _ in SUBJECTS], _Totals()
+    for _, s, question, marks, answered, correct in _iter_answers(
+            student, seed, iter_paper(n_questions, seed, text_chars), when):
+        _tally(totals, overall, s, question, marks, answered, correct)
+    submission.update(_summaries(student, seed, when, totals, overall))
+
+    f.write(json.dumps(submission)[:-1] + ', "sections": [')
+    current = None
+    for section, _, question, *_ in _iter_answers(student, seed, iter_paper(n_questions, seed, text_chars), when):
+        if section != current:
+            _, title, _, count = _layout(n_questions)[section]
+            f.write("]}, " if current is not None else "")
+            f.write(json.dumps({"sectionId": {"sectionType": "normal", "title": title,
+                                              "maximumAttemptLimit": count}})[:-1] + ', "questions": [')
+            first, current = True, section
+        f.write(("" if first else ", ") + json.dumps(question))
+        first = False
+    f.write("]}]}" if current is not None else "]}")
+
+
+def write_submissions(path: str, students, n_questions: int = 75, seed: int = 0, text_chars: int = 300) -> int:
+    """
+    Write the submissions of `students` (an iterable of student numbers) to `path` as
+    a JSON list, one at a time. Returns the number of bytes written.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, student in enumerate(students):
+            f.write(",\n" if i else "")
+            if n_questions > STREAM_QUESTIONS:
+                _write_streamed(f, student, n_questions, seed, text_chars)
+            else:
+                f.write(json.dumps(make_submission(student, n_questions, seed, text_chars)))
+        f.write("]\n")
+        return f.tell()
+
+
+def _write_file(args: tuple) -> int:
+    return write_submissions(*args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic student submissions")
+    parser.add_argument("--students", type=int, default=1, help="1 to 100k")
+    parser.add_argument("--questions", type=int, default=75, help="questions per test, 1 to 1M")
+    parser.add_argument("--out", required=True,
+                        help="a .json file, or a directory for one file per --per-file students")
+    parser.add_argument("--per-file", type=int, default=1000, help="students per file when --out is a directory")
+    parser.add_argument("--text-chars", type=int, default=300, help="average question text length (0: none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes writing files (default: CPU count)")
+    args = parser.parse_args()
+
+    if not 1 <= args.students <= 100_000 or not 1 <= args.questions <= 1_000_000:
+        parser.error("--students must be 1..100000 and --questions 1..1000000")
+
+    start = time.perf_counter()
+    if args.out.endswith(".json"):
+        jobs = [(args.out, range(args.students), args.questions, args.seed, args.text_chars)]
+    else:
+        jobs = [
+            (os.path.join(args.out, f"students_{lo:06d}.json"), range(lo, min(lo + args.per_file, args.students)),
+             args.questions, args.seed, args.text_chars)
+            for lo in range(0, args.students, args.per_file)
+        ]
+    workers = min(args.workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = sum(pool.map(_write_file, jobs))
+    else:
+        written = sum(map(_write_file, jobs))
+    elapsed = time.perf_counter() - start
+    print(f"{args.students} students × {args.questions} questions → {len(jobs)} file(s), "
+          f"{written / 1e6:.1f} MB in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
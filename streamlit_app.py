@@ -1,146 +1,362 @@
-# streamlit_app.py
-
-import os
-from dotenv import load_dotenv
-
-# ─── Step 1) Load environment variables before anything else ───────────────────────
-load_dotenv()  # This reads your .env file and puts GROQ_API_KEY into os.environ
-
-# ─── Step 2) Now import everything else ────────────────────────────────────────────
-import streamlit as st
-import pandas as pd
-import json
-
-from app.data_processor import parse_json_to_df
-from app.charts import plot_accuracy_over_time, plot_chapter_breakdown, plot_subject_breakdown
-from app.feedback_generator import generate_feedback_sections
-from app.pdf_generator import create_pdf_report
-
-# ─── Step 3) Configure the Streamlit page ─────────────────────────────────────────
-st.set_page_config(
-    page_title="MathonGo AI Feedback",
-    layout="wide",
-    page_icon="🧠"
-)
-
-# ─── Step 4) (Optional) Inject custom CSS for MathonGo brand colors ────────────────
-st.markdown(
-    """
-    <style>
-    /* Change button hover to accent orange */
-    .stButton>button:hover {
-        background-color: #FF7F00 !important;
-        color: #FFFFFF !important;
-    }
-    /* Force H1/H2 in primary blue */
-    h1, h2, h3 {
-        color: #0033A0 !important;
-    }
-    /* Sidebar background to light gray */
-    [data-testid="stSidebar"] {
-        background-color: #F5F5F5;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
-# ─── Step 5) Sidebar: Logo + Data Source Selection ─────────────────────────────────
-st.sidebar.markdown(
-    """
-    <div style="text-align:Left; padding: 10px;">
-      <h2 style="color: #0033A0;">MathonGo</h2>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
-
-logo_path = os.path.join("assets", "logo.png")
-if os.path.exists(logo_path):
-    st.sidebar.image(logo_path, width=200)
-else:
-    st.sidebar.markdown("### MathonGo")
-
-st.sidebar.title("Student Feedback")
-
-data_source = st.sidebar.radio(
-    "Choose Data Source:",
-    ("Use Demo Data", "Upload Your Own JSON")
-)
-
-# ─── Step 6) Load raw bytes from Demo or Uploaded JSON ─────────────────────────────
-raw_bytes = None
-demo_loaded = False
-
-if data_source == "Use Demo Data":
-    demo_path = os.path.join("data", "submission1.json")
-    try:
-        with open(demo_path, "rb") as f:
-            raw_bytes = f.read()
-            demo_loaded = True
-    except FileNotFoundError:
-        st.sidebar.error(f"Demo file not found at {demo_path}.")
-elif data_source == "Upload Your Own JSON":
-    uploaded_file = st.sidebar.file_uploader("Upload your JSON file", type=["json"])
-    if uploaded_file is not None:
-        raw_bytes = uploaded_file.read()
-
-# ─── Step 7) If we have JSON bytes, process and display ────────────────────────────
-if raw_bytes is not None:
-    try:
-        # 1) Parse JSON → DataFrames + summary dict
-        df_all, summary_dict = parse_json_to_df(raw_bytes)
-
-        # 2) Show a preview of the question‐level DataFrame
-        st.subheader("🔍 Raw Data Preview")
-        st.dataframe(df_all.head(10), use_container_width=True)
-
-        # 3) Generate & display charts: accuracy vs time, chapter breakdown, subject breakdown
-        st.subheader("📊 Performance Charts")
-        fig1 = plot_accuracy_over_time(df_all)
-        fig2 = plot_chapter_breakdown(summary_dict["chapter_summary_df"])
-        fig3 = plot_subject_breakdown(summary_dict["subject_summary_df"])
-
-        col1, col2 = st.columns(2)
-        with col1:
-            st.pyplot(fig1, use_container_width=True)
-        with col2:
-            st.pyplot(fig2, use_container_width=True)
-
-        # Show the subject‐level chart below
-        st.pyplot(fig3, use_container_width=True)
-
-        # 4) Button to trigger AI feedback generation
-        if st.button("🧠 Generate Feedback"):
-            with st.spinner("Generating AI‐powered feedback..."):
-                feedback_sections = generate_feedback_sections(summary_dict)
-
-            # 5) Display the AI feedback
-            st.subheader("🤖 AI‐Generated Feedback")
-            st.markdown("")
-            st.markdown(feedback_sections["intro"])
-            st.markdown("*Performance Breakdown*")
-            st.markdown(feedback_sections["breakdown"])
-            st.markdown("*Actionable Suggestions*")
-            for bullet in feedback_sections["suggestions"]:
-                st.markdown(f"- {bullet}")
-
-            # 6) Build PDF & offer download
-            student_name = summary_dict.get("student_name", "Student")
-            pdf_bytes = create_pdf_report(
-                student_name=student_name,
-                feedback=feedback_sections,
-                chart_figs=[fig1, fig2, fig3]
-            )
-            st.download_button(
-                label="📄 Download PDF Report",
-                data=pdf_bytes,
-                file_name="student_performance_report.pdf",
-                mime="application/pdf"
-            )
-
-    except Exception as e:
-        st.error(f"Error processing data: {e}")
-
-else:
-    st.info("Select *Use Demo Data* or *Upload Your Own JSON* from the sidebar.")
\ No newline at end of file
+# streamlit_app.py
+
+import os
+from dotenv import load_dotenv
+
+# ─── Step 1) Load environment variables before anything else ───────────────────────
+load_dotenv()  # This reads your .env file and puts GROQ_API_KEY into os.environ
+
+# ─── Step 2) Now import everything else ────────────────────────────────────────────
+import json
+
+import streamlit as st
+
+from app.parse_cache import cached_parse_json_to_df, content_key
+from app.charts import (
+    ChartImage,
+    plot_accuracy_over_time,
+    plot_chapter_breakdown,
+    plot_concept_breakdown,
+    plot_percentile_breakdown,
+    plot_subject_breakdown,
+)
+from app.cohort_stats import load_cohort_benchmark
+from app.feedback_generator import stream_feedback_sections
+from app.job_queue import JobQueue, get_worker_pool
+from app.metrics import METRICS_ENABLED, get_metrics
+from app.rule_feedback import generate_rule_feedback
+from app.pdf_generator import create_pdf_report
+
+# ─── Step 3) Configure the Streamlit page ─────────────────────────────────────────
+st.set_page_config(
+    page_title="MathonGo AI Feedback",
+    layout="wide",
+    page_icon="🧠"
+)
+
+# ─── Step 4) (Optional) Inject custom CSS for MathonGo brand colors ────────────────
+st.markdown(
+    """
+    <style>
+    /* Change button hover to accent orange */
+    .stButton>button:hover {
+        background-color: #FF7F00 !important;
+        color: #FFFFFF !important;
+    }
+    /* Force H1/H2 in primary blue */
+    h1, h2, h3 {
+        color: #0033A0 !important;
+    }
+    /* Sidebar background to light gray */
+    [data-testid="stSidebar"] {
+        background-color: #F5F5F5;
+    }
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+# ─── Step 5) Sidebar: Logo + Data Source Selection ─────────────────────────────────
+st.sidebar.markdown(
+    """
+    <div style="text-align:Left; padding: 10px;">
+      <h2 style="color: #0033A0;">MathonGo</h2>
+    </div>
+    """,
+    unsafe_allow_html=True
+)
+
+logo_path = os.path.join("assets", "logo.png")
+if os.path.exists(logo_path):
+    st.sidebar.image(logo_path, width=200)
+else:
+    st.sidebar.markdown("### MathonGo")
+
+st.sidebar.title("Student Feedback")
+
+data_source = st.sidebar.radio(
+    "Choose Data Source:",
+    ("Use Demo Data", "Upload Your Own JSON")
+)
+
+# ─── Step 6) Load raw bytes from Demo or Uploaded JSON ─────────────────────────────
+raw_bytes = None
+demo_loaded = False
+
+if data_source == "Use Demo Data":
+    demo_path = os.path.join("data", "submission1.json")
+    try:
+        with open(demo_path, "rb") as f:
+            raw_bytes = f.read()
+            demo_loaded = True
+    except FileNotFoundError:
+        st.sidebar.error(f"Demo file not found at {demo_path}.")
+elif data_source == "Upload Your Own JSON":
+    uploaded_file = st.sidebar.file_uploader("Upload your JSON file", type=["json"])
+    if uploaded_file is not None:
+        raw_bytes = uploaded_file.read()
+
+# Optional Performance page: stage timings recorded by this server (app.metrics)
+show_performance = METRICS_ENABLED and st.sidebar.toggle("⏱️ Performance", key="performance_page")
+
+# Background Jobs page: reports queued with "Generate in Background" (app.job_queue)
+show_jobs = st.sidebar.toggle("📥 Background Jobs", key="jobs_page")
+
+# ─── Step 7) Session memo helpers ─────────────────────────────────────────────────
+# Streamlit reruns this whole script on every widget interaction. Anything expensive
+# (chart rasterization, LLM feedback, PDF) is computed only when the user asks for it
+# and then kept in st.session_state, keyed by the upload's content hash, so a click
+# elsewhere never throws the result away.
+MAX_MEMO_UPLOADS = 4
+
+
+def _memo(name: str, key: str):
+    """
+    Return the session-state dict holding `name` results for upload `key`.
+    Only the most recent MAX_MEMO_UPLOADS uploads are kept per session.
+    """
+    memo = st.session_state.setdefault(name, {})
+    if key not in memo:
+        while len(memo) >= MAX_MEMO_UPLOADS:
+            memo.pop(next(iter(memo)))
+        memo[key] = {}
+    return memo[key]
+
+
+def _get_charts(key: str, df_all, summary_dict) -> list:
+    """
+    The report charts as ChartImages, rasterized once per upload and shared
+    by the Charts view and the PDF.
+    """
+    memo = _memo("charts", key)
+    if "images" not in memo:
+        memo["images"] = [
+            ChartImage.from_figure(plot_accuracy_over_time(df_all)),
+            ChartImage.from_figure(plot_chapter_breakdown(summary_dict["chapter_summary_df"])),
+            ChartImage.from_figure(plot_subject_breakdown(summary_dict["subject_summary_df"])),
+            ChartImage.from_figure(plot_concept_breakdown(summary_dict["tag_summary_df"])),
+        ]
+        if "accuracy_percentile" in summary_dict["chapter_summary_df"]:
+            memo["images"].append(
+                ChartImage.from_figure(plot_percentile_breakdown(summary_dict["chapter_summary_df"]))
+            )
+    return memo["images"]
+
+
+def _feedback_slots():
+    """
+    Placeholders for the intro, breakdown and suggestions sections, in page order.
+    """
+    st.markdown("")
+    intro_slot = st.empty()
+    st.markdown("*Performance Breakdown*")
+    breakdown_slot = st.empty()
+    st.markdown("*Actionable Suggestions*")
+    suggestions_slot = st.empty()
+    return intro_slot, breakdown_slot, suggestions_slot
+
+
+def _show_feedback(feedback_sections: dict, intro_slot, breakdown_slot, suggestions_slot):
+    if "intro" in feedback_sections:
+        intro_slot.markdown(feedback_sections["intro"])
+    if "breakdown" in feedback_sections:
+        breakdown_slot.markdown(feedback_sections["breakdown"])
+    if "suggestions" in feedback_sections:
+        suggestions_slot.markdown(
+            "\n".join(f"- {bullet}" for bullet in feedback_sections["suggestions"])
+        )
+
+
+def _show_performance():
+    """
+    p50/p95/p99 per instrumented stage, for every session this server has handled.
+    """
+    st.subheader("⏱️ Performance")
+    st.caption(
+        "Timings recorded by this server process since it started (or was reset). "
+        "Percentiles cover each stage's most recent 1024 calls."
+    )
+    metrics = get_metrics()
+    rows = metrics.snapshot()
+    if not rows:
+        st.info("No timings yet: parse a file, render charts, generate feedback or build a PDF first.")
+        return
+
+    st.bar_chart(rows, x="span", y=["p50_ms", "p95_ms", "p99_ms"], y_label="ms", horizontal=True, stack=False)
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("Prometheus text", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
+    with col2:
+        st.download_button(
+            "OpenTelemetry JSON", json.dumps(metrics.to_otel_json()), file_name="metrics.json",
+            mime="application/json",
+        )
+    with col3:
+        if st.button("Reset timings"):
+            metrics.reset()
+            st.rerun()
+
+
+def _job_queue():
+    """
+    The shared job queue, with this server's worker pool running (started once;
+    jobs left running by a previous server resume when it starts).
+    """
+    return JobQueue(get_worker_pool().root)
+
+
+def _show_jobs():
+    """
+    Reports generated in the background: status and progress, download when done.
+    Jobs survive closed tabs and server restarts.
+    """
+    st.subheader("📥 Background Jobs")
+    queue = _job_queue()
+    counts = queue.counts()
+    st.caption(" · ".join(f"{n} {status}" for status, n in counts.items()))
+    if st.button("🔄 Refresh"):
+        st.rerun()
+
+    jobs = queue.list_jobs(limit=50)
+    if not jobs:
+        st.info("No jobs yet: use *Generate in Background* in the AI Feedback view.")
+        return
+    for job in jobs:
+        name = job["student_name"] or job["submission_id"] or job["job_id"][:8]
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            if job["status"] == "running":
+                st.progress(job["progress"], text=f"{name}: {job['stage'] or 'starting'}")
+            elif job["status"] == "failed":
+                st.error(f"{name}: failed after {job['attempts']} attempt(s): {job['error']}")
+            else:
+                st.write(f"**{name}**: {job['status']}")
+        with col2:
+            if job["status"] == "done":
+                st.download_button(
+                    "📄 PDF", queue.read_result(job["job_id"]), file_name=f"{name}_report.pdf",
+                    mime="application/pdf", key=f"job_pdf_{job['job_id']}",
+                )
+            elif job["status"] == "failed" and st.button("🔁 Retry", key=f"job_retry_{job['job_id']}"):
+                queue.retry(job["job_id"])
+                st.rerun()
+
+
+# ─── Step 8) If we have JSON bytes, process and display ────────────────────────────
+if show_performance:
+    _show_performance()
+
+elif show_jobs:
+    _show_jobs()
+
+elif raw_bytes is not None:
+    try:
+        # 1) Parse JSON → DataFrames + summary dict (cached by content hash, so reruns
+        #    and repeat uploads of the same file skip parsing entirely)
+        df_all, summary_dict = cached_parse_json_to_df(raw_bytes)
+        upload_key = content_key(raw_bytes)
+
+        #    Add cohort percentiles when a benchmark for this test has been built
+        #    (python -m app.cohort_stats); a few table lookups, no cohort data is read
+        cohort = load_cohort_benchmark()
+        if cohort is not None:
+            summary_dict = cohort.with_percentiles(summary_dict)
+
+        # 2) Only the selected view is computed. (st.tabs/st.expander would still run
+        #    the code of every hidden tab on each rerun.)
+        view = st.radio(
+            "View",
+            ("🔍 Raw Data Preview", "📊 Performance Charts", "🤖 AI Feedback"),
+            horizontal=True,
+            label_visibility="collapsed",
+            key="view",
+        )
+
+        if view == "🔍 Raw Data Preview":
+            st.subheader("🔍 Raw Data Preview")
+            st.dataframe(df_all.head(10), use_container_width=True)
+
+        elif view == "📊 Performance Charts":
+            # 3) Charts: accuracy vs time, chapter breakdown, subject breakdown, weakest concepts
+            st.subheader("📊 Performance Charts")
+            chart1, chart2, chart3, chart4, *cohort_charts = _get_charts(upload_key, df_all, summary_dict)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.image(chart1.png, use_container_width=True)
+            with col2:
+                st.image(chart2.png, use_container_width=True)
+
+            # Subject‐level and concept‐level charts below
+            col3, col4 = st.columns(2)
+            with col3:
+                st.image(chart3.png, use_container_width=True)
+            with col4:
+                st.image(chart4.png, use_container_width=True)
+
+            # Peer comparison, when a cohort benchmark exists
+            for chart in cohort_charts:
+                st.image(chart.png, use_container_width=True)
+
+        else:
+            st.subheader("🤖 AI‐Generated Feedback")
+            feedback_memo = _memo("feedback", upload_key)
+
+            # 4) Button to trigger AI feedback generation (once per upload), or hand the
+            #    whole report to the background job queue, which outlives this tab
+            if "sections" not in feedback_memo:
+                if st.button("📥 Generate in Background", help="Builds the full PDF report even if you close this tab"):
+                    _job_queue().enqueue(raw_bytes, engine="llm")
+                    st.success("Queued: follow it under *📥 Background Jobs* in the sidebar.")
+                if st.button("🧠 Generate Feedback"):
+                    # 5) Stream the AI feedback: each section renders as soon as it is complete
+                    #    A rule-based draft shows instantly; LLM sections replace it as they arrive
+                    status_slot = st.empty()
+                    slots = _feedback_slots()
+                    status_slot.info("Generating AI‐powered feedback... (showing a quick draft meanwhile)")
+                    _show_feedback(generate_rule_feedback(summary_dict), *slots)
+                    feedback_sections = {}
+                    for feedback_sections in stream_feedback_sections(summary_dict):
+                        _show_feedback(feedback_sections, *slots)
+                    status_slot.empty()
+                    feedback_memo["sections"] = feedback_sections
+            else:
+                # Generated on an earlier run: redraw from session state, no LLM call
+                _show_feedback(feedback_memo["sections"], *_feedback_slots())
+
+            usage = feedback_memo.get("sections", {}).get("usage")
+            if usage and usage.get("fallback_reason"):
+                st.warning(f"AI feedback unavailable ({usage['fallback_reason']}); showing rule-based feedback.")
+                if st.button("🔁 Retry AI Feedback"):
+                    feedback_memo.clear()
+                    st.rerun()
+            elif usage and usage.get("prompt_tokens") is not None:
+                st.caption(
+                    f"Tokens: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion "
+                    f"({usage['source']})"
+                )
+
+            # 6) Build the PDF only when asked for, then offer it for download
+            if "sections" in feedback_memo:
+                if "pdf" not in feedback_memo and st.button("📄 Prepare PDF Report"):
+                    with st.spinner("Building PDF..."):
+                        feedback_memo["pdf"] = create_pdf_report(
+                            student_name=summary_dict.get("student_name", "Student"),
+                            feedback=feedback_memo["sections"],
+                            chart_figs=_get_charts(upload_key, df_all, summary_dict),
+                        )
+                if "pdf" in feedback_memo:
+                    st.download_button(
+                        label="📄 Download PDF Report",
+                        data=feedback_memo["pdf"],
+                        file_name="student_performance_report.pdf",
+                        mime="application/pdf"
+                    )
+
+    except Exception as e:
+        st.error(f"Error processing data: {e}")
+
+else:
+    st.info("Select *Use Demo Data* or *Upload Your Own JSON* from the sidebar.")
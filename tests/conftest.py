@@ -0,0 +1,34 @@
+# tests/conftest.py
+#
+#   python -m pytest -q
+#
+# Everything runs offline: submissions come from benchmarks.synthetic (or
+# data/submission1.json), and nothing here calls the LLM.
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+SAMPLE_PATH = os.path.join(ROOT, "data", "submission1.json")
+
+
+@pytest.fixture
+def sample_bytes() -> bytes:
+    with open(SAMPLE_PATH, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def cohort_bytes() -> bytes:
+    """
+    Three synthetic students on the same 60-question paper, as one JSON list.
+    """
+    from benchmarks.synthetic import make_submission
+
+    return json.dumps([make_submission(student, n_questions=60) for student in range(3)]).encode("utf-8")
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from app.analytics_store import AnalyticsStore, load_student_map
+from app.data_processor import parse_submissions
+
+
+@pytest.fixture
+def cohort(tmp_path, cohort_bytes):
+    # Like a real export: nothing in a submission says who took it
+    submissions = json.loads(cohort_bytes)
+    for submission in submissions:
+        submission.pop("student_name", None)
+    path = tmp_path / "cohort.json"
+    path.write_text(json.dumps(submissions))
+    return path
+
+
+def test_ingest_without_student_refused(tmp_path, cohort):
+    store = AnalyticsStore(str(tmp_path / "store"))
+    with pytest.raises(ValueError, match="no student id"):
+        store.ingest_sources(str(cohort))
+    assert store.students() == []
+
+
+def test_ingest_with_student_map(tmp_path, cohort):
+    _, parsed = parse_submissions(str(cohort), max_workers=1)
+    ids = parsed["submission_ids"]
+    mapping = tmp_path / "students.json"
+    mapping.write_text(json.dumps({sub_id: f"s{i}" for i, sub_id in enumerate(ids)}))
+
+    store = AnalyticsStore(str(tmp_path / "store"))
+    counts = store.ingest_sources(str(cohort), students=load_student_map(str(mapping)))
+    assert counts["ingested"] == len(ids)
+    assert store.students() == [f"s{i}" for i in range(len(ids))]
+    assert len(store.accuracy_over_time("s0")) == 1
+
+
+def test_student_map_must_be_object(tmp_path):
+    path = tmp_path / "students.json"
+    path.write_text("[1, 2]")
+    with pytest.raises(ValueError):
+        load_student_map(str(path))
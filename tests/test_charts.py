@@ -0,0 +1,60 @@
+import io
+
+import numpy as np
+import pytest
+
+from app.charts import ChartRenderer, encode_png
+
+PIL_Image = pytest.importorskip("PIL.Image")
+
+
+def _decode(png: bytes) -> np.ndarray:
+    with PIL_Image.open(io.BytesIO(png)) as image:
+        assert image.mode == "RGB"
+        return np.asarray(image)
+
+
+def test_encode_png_round_trip():
+    rng = np.random.default_rng(0)
+    rgba = rng.integers(0, 256, size=(17, 23, 4), dtype=np.uint8)
+    rgba[..., 3] = 255
+    decoded = _decode(encode_png(rgba.tobytes(), 23, 17))
+    assert decoded.shape == (17, 23, 3)
+    np.testing.assert_array_equal(decoded, rgba[..., :3])
+
+
+def test_encode_png_blends_alpha_onto_white():
+    rgba = np.zeros((2, 2, 4), dtype=np.uint8)
+    rgba[0, 0] = (0, 0, 0, 0)        # transparent → white
+    rgba[0, 1] = (0, 0, 0, 255)      # opaque black stays black
+    rgba[1, 0] = (200, 0, 0, 128)    # half red over white
+    rgba[1, 1] = (10, 20, 30, 255)
+    decoded = _decode(encode_png(rgba.tobytes(), 2, 2))
+    np.testing.assert_array_equal(decoded[0, 0], (255, 255, 255))
+    np.testing.assert_array_equal(decoded[0, 1], (0, 0, 0))
+    np.testing.assert_array_equal(decoded[1, 0], (227, 127, 127))
+    np.testing.assert_array_equal(decoded[1, 1], (10, 20, 30))
+
+
+def test_encode_png_levels_decode_the_same():
+    rgba = np.full((8, 8, 4), 255, dtype=np.uint8)
+    rgba[2:6, 2:6, :3] = (31, 119, 180)
+    fast, small = encode_png(rgba.tobytes(), 8, 8, level=1), encode_png(rgba.tobytes(), 8, 8, level=9)
+    np.testing.assert_array_equal(_decode(fast), _decode(small))
+
+
+def test_renderer_reuse_matches_fresh_render(sample_bytes):
+    import pandas as pd
+
+    from app.data_processor import parse_json_to_df
+
+    df_all, _ = parse_json_to_df(sample_bytes)
+    short = df_all.assign(timestamp=pd.date_range("2024-01-01", periods=len(df_all), freq="min"))
+    long = df_all.assign(timestamp=pd.date_range("2020-01-01", periods=len(df_all), freq="30D"))
+
+    with ChartRenderer() as renderer:
+        renderer.render_accuracy_over_time(short)
+        reused = renderer.render_accuracy_over_time(long)
+    with ChartRenderer() as renderer:
+        fresh = renderer.render_accuracy_over_time(long)
+    assert reused.png == fresh.png
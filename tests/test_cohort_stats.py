@@ -0,0 +1,147 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.cohort_stats import CohortBenchmark, KLLSketch
+
+
+def _max_rank_error(sketch: KLLSketch, values: np.ndarray) -> float:
+    qs = np.linspace(0.01, 0.99, 99)
+    ranks = np.searchsorted(np.sort(values), sketch.quantiles(qs), side="right") / len(values)
+    return float(np.max(np.abs(ranks - qs)))
+
+
+def test_kll_exact_below_capacity():
+    sketch = KLLSketch(k=200, seed=0)
+    sketch.update(np.arange(100, dtype=float))
+    assert len(sketch) == 100
+    assert list(sketch.quantiles([0.0, 0.5, 1.0])) == [0.0, 49.0, 99.0]
+
+
+def test_kll_rank_error_and_bounded_memory():
+    rng = np.random.default_rng(1)
+    values = rng.normal(60, 15, 200_000)
+    sketch = KLLSketch(k=200, seed=1)
+    for chunk in np.array_split(values, 50):
+        sketch.update(chunk)
+    assert len(sketch) == len(values)
+    assert sum(len(items) for items in sketch.levels) < 3 * 200
+    assert _max_rank_error(sketch, values) < 0.02
+
+
+def test_kll_merge_matches_single_sketch():
+    rng = np.random.default_rng(2)
+    parts = [rng.uniform(0, 100, 30_000) for _ in range(4)]
+    merged = KLLSketch(k=200, seed=2)
+    for i, part in enumerate(parts):
+        worker = KLLSketch(k=200, seed=10 + i)
+        worker.update(part)
+        merged.merge(worker)
+    values = np.concatenate(parts)
+    assert len(merged) == len(values)
+    assert _max_rank_error(merged, values) < 0.02
+
+
+def test_kll_ignores_nan_and_round_trips():
+    sketch = KLLSketch(k=16, seed=3)
+    sketch.update([1.0, np.nan, 2.0, 3.0])
+    sketch.update(np.arange(500, dtype=float))
+    assert len(sketch) == 503
+    copy = KLLSketch.from_dict(sketch.to_dict())
+    assert len(copy) == len(sketch)
+    np.testing.assert_array_equal(copy.quantiles([0.1, 0.5, 0.9]), sketch.quantiles([0.1, 0.5, 0.9]))
+    assert np.isnan(KLLSketch().quantiles([0.5])).all()
+    with pytest.raises(ValueError):
+        KLLSketch(k=4)
+
+
+def _frames(chapter_accuracy, chapter_time, subject_accuracy=(), chapter="Capacitance"):
+    chapters = pd.DataFrame({
+        "chapter": [chapter] * len(chapter_accuracy),
+        "accuracy": chapter_accuracy,
+        "avg_time_spent": chapter_time,
+    })
+    subjects = pd.DataFrame({
+        "subject_id": ["physics"] * len(subject_accuracy),
+        "accuracy": list(subject_accuracy),
+        "total_time_spent": [600.0] * len(subject_accuracy),
+        "total_attempted": [10] * len(subject_accuracy),
+    })
+    return chapters, subjects
+
+
+def test_percentile_of_uniform_cohort():
+    bench = CohortBenchmark()
+    accuracy = np.arange(0, 100, 0.01)
+    bench.add_frames(*_frames(accuracy, np.full(len(accuracy), 60.0)), students=len(accuracy))
+    assert bench.percentile("chapter", "Capacitance", "accuracy", 50.0) == pytest.approx(50.0, abs=1.0)
+    assert bench.percentile("chapter", "Capacitance", "accuracy", 90.0) == pytest.approx(90.0, abs=1.0)
+    assert bench.percentile("chapter", "Capacitance", "accuracy", -1.0) == 0.0
+    assert bench.percentile("chapter", "Capacitance", "accuracy", 101.0) == 100.0
+    # Every student took 60s per question: ties count half
+    assert bench.percentile("chapter", "Capacitance", "time_per_question", 60.0) == 50.0
+
+
+def test_percentile_missing_data_and_bad_metric():
+    bench = CohortBenchmark()
+    bench.add_frames(*_frames([50.0, 70.0], [30.0, 40.0]))
+    assert math.isnan(bench.percentile("chapter", "Optics", "accuracy", 50.0))
+    assert math.isnan(bench.percentile("chapter", "Capacitance", "accuracy", float("nan")))
+    with pytest.raises(ValueError):
+        bench.percentile("chapter", "Capacitance", "marks", 50.0)
+
+
+def test_with_percentiles_and_persistence(tmp_path):
+    bench = CohortBenchmark()
+    rng = np.random.default_rng(4)
+    bench.add_frames(*_frames(rng.uniform(0, 100, 1000), rng.uniform(20, 120, 1000),
+                              subject_accuracy=rng.uniform(0, 100, 1000)), students=1000)
+    chapters, subjects = _frames([80.0], [30.0], subject_accuracy=[20.0])
+    summary = {"chapter_summary_df": chapters, "subject_summary_df": subjects}
+
+    result = bench.with_percentiles(summary)
+    assert "accuracy_percentile" not in chapters
+    row = result["chapter_summary_df"].iloc[0]
+    assert row["accuracy_percentile"] == pytest.approx(80.0, abs=3.0)
+    # 30s per question is faster than ~90% of a 20–120s cohort
+    assert row["speed_percentile"] == pytest.approx(90.0, abs=3.0)
+    assert result["subject_summary_df"].iloc[0]["accuracy_percentile"] == pytest.approx(20.0, abs=3.0)
+    assert result["cohort_size"] == 1000
+
+    path = str(tmp_path / "benchmark.json")
+    bench.save(path)
+    loaded = CohortBenchmark.load(path)
+    assert loaded.students == bench.students
+    for value in (10.0, 55.5, 99.0):
+        assert loaded.percentile("chapter", "Capacitance", "accuracy", value) == \
+            bench.percentile("chapter", "Capacitance", "accuracy", value)
+
+
+def test_add_summary_from_parsed_submissions(cohort_bytes):
+    import json
+
+    from app.data_processor import _parse_submission
+
+    bench = CohortBenchmark()
+    for submission in json.loads(cohort_bytes):
+        bench.add_summary(_parse_submission(submission)[1])
+    assert bench.students == 3
+    chapter = _parse_submission(json.loads(cohort_bytes)[0])[1]["chapter_summary_df"]["chapter"].iloc[0]
+    assert len(bench.sketches[("chapter", str(chapter), "accuracy")]) == 3
+
+
+def test_outdated_benchmark_file_ignored(tmp_path):
+    import json
+
+    from app.cohort_stats import load_cohort_benchmark
+
+    path = tmp_path / "benchmark.json"
+    CohortBenchmark().save(str(path))
+    data = json.loads(path.read_text())
+    del data["format"]
+    path.write_text(json.dumps(data))
+    with pytest.raises(ValueError):
+        CohortBenchmark.load(str(path))
+    assert load_cohort_benchmark(str(path)) is None
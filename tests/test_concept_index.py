@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.concept_index import ConceptIndex, _top_k, top_k_from_summary
+
+
+def _tables(rng, students=4, questions=200, tags=12):
+    """
+    Question rows (with a student column) and their concept/topic tags, with many
+    accuracy ties so the tie-break is exercised.
+    """
+    df_questions = pd.DataFrame({
+        "student": np.repeat([f"s{i}" for i in range(students)], questions),
+        "accuracy": rng.integers(0, 2, students * questions),
+        "time_spent": np.where(rng.random(students * questions) < 0.1, np.nan,
+                               rng.integers(10, 200, students * questions).astype(float)),
+    })
+    n = len(df_questions)
+    question_idx = np.concatenate([np.arange(n), rng.integers(0, n, n // 2)])
+    question_tags_df = pd.DataFrame({
+        "question_idx": question_idx,
+        "tag_type": rng.choice(["concept", "topic"], len(question_idx)),
+        "title": [f"t{i}" for i in rng.integers(0, tags, len(question_idx))],
+    })
+    return df_questions, question_tags_df
+
+
+def _brute_force(df_questions, question_tags_df, student=None):
+    rows = question_tags_df.join(df_questions, on="question_idx")
+    if student is not None:
+        rows = rows[rows["student"] == student]
+    grouped = rows.groupby(["tag_type", "title"])
+    return pd.DataFrame({
+        "attempts": grouped.size(),
+        "correct": grouped["accuracy"].sum(),
+        "avg_time_spent": grouped["time_spent"].mean(),
+    }).reset_index()
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("student", [None, "s2"])
+def test_weakest_and_slowest_match_brute_force(seed, student):
+    df_questions, question_tags_df = _tables(np.random.default_rng(seed))
+    index = ConceptIndex(df_questions, question_tags_df, student_col="student")
+    expected = _brute_force(df_questions, question_tags_df, student)
+    expected = expected[(expected["tag_type"] == "concept") & (expected["attempts"] >= 2)]
+    expected = expected.assign(ratio=expected["correct"] / expected["attempts"])
+
+    weakest = expected.sort_values(["ratio", "attempts"], ascending=[True, False], kind="stable").head(5)
+    got = index.weakest(k=5, student=student)
+    assert list(got["title"]) == list(weakest["title"])
+    assert list(got["attempts"]) == list(weakest["attempts"])
+
+    slowest = expected.dropna(subset=["avg_time_spent"])
+    slowest = slowest.sort_values(["avg_time_spent", "attempts"], ascending=[False, False], kind="stable").head(5)
+    got = index.slowest(k=5, student=student)
+    assert list(got["title"]) == list(slowest["title"])
+    np.testing.assert_allclose(got["avg_time_spent"], slowest["avg_time_spent"].round(1))
+
+
+def test_stats_and_postings():
+    df_questions, question_tags_df = _tables(np.random.default_rng(7))
+    index = ConceptIndex(df_questions, question_tags_df, student_col="student")
+    expected = _brute_force(df_questions, question_tags_df).set_index(["tag_type", "title"])
+    stats = index.stats().set_index(["tag_type", "title"])
+    assert len(index) == len(expected)
+    np.testing.assert_array_equal(stats.loc[expected.index, "attempts"], expected["attempts"])
+    np.testing.assert_array_equal(stats.loc[expected.index, "correct"], expected["correct"])
+
+    title = expected.index[0]
+    postings = index.postings(*title)
+    tagged = question_tags_df[(question_tags_df["tag_type"] == title[0]) & (question_tags_df["title"] == title[1])]
+    assert sorted(postings) == sorted(tagged["question_idx"])
+    assert len(index.postings("concept", "no such tag")) == 0
+
+
+def test_top_k_keeps_every_tie_for_the_tie_break():
+    primary = np.array([0.5, 0.1, 0.1, 0.1, 0.9])
+    secondary = np.array([0, -1, -5, -3, 0])
+    assert list(_top_k(primary, secondary, 2)) == [2, 3]
+    assert list(_top_k(primary, secondary, 10)) == [2, 3, 1, 0, 4]
+    assert len(_top_k(primary, secondary, 0)) == 0
+
+
+def test_top_k_from_summary_matches_index(sample_bytes):
+    from app.data_processor import parse_json_to_df
+
+    df_questions, summary = parse_json_to_df(sample_bytes)
+    index = ConceptIndex(df_questions, summary["question_tags_df"])
+    for by, query in (("weakest", index.weakest), ("slowest", index.slowest)):
+        from_summary = top_k_from_summary(summary["tag_summary_df"], k=5, by=by)
+        assert list(from_summary["title"]) == list(query(k=5)["title"])
+
+
+def test_invalid_arguments():
+    df_questions, question_tags_df = _tables(np.random.default_rng(0))
+    index = ConceptIndex(df_questions, question_tags_df, student_col="student")
+    with pytest.raises(ValueError):
+        index.weakest(student="nobody")
+    with pytest.raises(ValueError):
+        index.stats(tag_type="chapter")
+    with pytest.raises(ValueError):
+        top_k_from_summary(index.stats(), by="fastest")
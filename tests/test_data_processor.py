@@ -0,0 +1,47 @@
+import json
+
+import pandas as pd
+
+from app import data_processor
+from app.data_processor import _list_item_ranges, parse_json_to_df, parse_submissions
+
+
+def test_chapter_accuracy_in_percent(sample_bytes):
+    _, summary = parse_json_to_df(sample_bytes)
+    chapters = summary["chapter_summary_df"].set_index("chapter")
+    assert chapters.loc["Electrochemistry", "accuracy"] == 7.7      # 1 of 13
+    assert chapters.loc["Electrostatics", "accuracy"] == 66.7       # 10 of 15
+    assert chapters.loc["Functions", "accuracy"] == 38.9            # 7 of 18
+
+
+def test_list_item_ranges_match_json(tmp_path, monkeypatch):
+    # Small blocks so strings, escapes and elements straddle block boundaries
+    monkeypatch.setattr(data_processor, "SPLIT_BLOCK_BYTES", 7)
+    items = [{"a": "x,]}\\\"{[", "b": [1, {"c": "\\\\"}]}, [], {}, "s\\\\\"", 3, {"d": "}}],"}]
+    path = tmp_path / "list.json"
+    path.write_text(" [ " + " , ".join(json.dumps(item) for item in items) + " ]\n")
+
+    data = path.read_bytes()
+    ranges = _list_item_ranges(str(path))
+    assert [i for i, _, _ in ranges] == list(range(len(items)))
+    assert [json.loads(data[offset:offset + length]) for _, offset, length in ranges] == items
+
+    empty = tmp_path / "empty.json"
+    empty.write_text("[ ]")
+    assert _list_item_ranges(str(empty)) == []
+    not_list = tmp_path / "one.json"
+    not_list.write_text('{"a": 1}')
+    assert _list_item_ranges(str(not_list)) is None
+
+
+def test_split_file_parses_like_whole(tmp_path, cohort_bytes):
+    path = tmp_path / "cohort.json"
+    path.write_bytes(cohort_bytes)
+    whole_questions, whole = parse_submissions(str(path), max_workers=1)
+    split_questions, split = parse_submissions(str(path), max_workers=3)
+
+    assert split["stats"]["workers"] == 3
+    assert split["submission_ids"] == whole["submission_ids"]
+    pd.testing.assert_frame_equal(split_questions, whole_questions)
+    for key in ("subject_summary_df", "chapter_summary_df", "question_tags_df"):
+        pd.testing.assert_frame_equal(split[key], whole[key])
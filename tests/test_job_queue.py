@@ -0,0 +1,128 @@
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from app import job_queue
+from app.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs"))
+
+
+def _dead_worker() -> str:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return f"{socket.gethostname()}:{proc.pid}"
+
+
+def test_claim_is_exclusive_and_oldest_first(queue):
+    first = queue.enqueue(b"{}", engine="rules")
+    second = queue.enqueue(b"{}")
+    assert queue.claim("w1") == (first, "rules", None)
+    assert queue.claim("w2") == (second, "llm", None)
+    assert queue.claim("w3") is None
+    assert queue.counts() == {"queued": 0, "running": 2, "done": 0, "failed": 0}
+    assert queue.get(first)["worker"] == "w1" and queue.get(first)["attempts"] == 1
+
+
+def test_heartbeat_only_for_lease_holder(queue):
+    job_id = queue.enqueue(b"{}")
+    queue.claim("w1")
+    assert queue.heartbeat(job_id, "w1", stage="pdf", progress=0.8)
+    assert not queue.heartbeat(job_id, "w2")
+    job = queue.get(job_id)
+    assert (job["stage"], job["progress"]) == ("pdf", 0.8)
+
+
+def test_expired_lease_is_claimed_again_with_checkpoint(queue, monkeypatch):
+    job_id = queue.enqueue(b"{}")
+    monkeypatch.setattr(job_queue, "LEASE_S", -1.0)
+    queue.claim("w1")
+    queue.save_feedback(job_id, "Asha", {"intro": "hi"})
+    assert queue.claim("w2") == (job_id, "llm", {"intro": "hi"})
+    job = queue.get(job_id)
+    assert (job["worker"], job["attempts"], job["student_name"]) == ("w2", 2, "Asha")
+    # The first worker lost its lease and can no longer finish the job
+    assert not queue.heartbeat(job_id, "w1")
+    queue.complete(job_id, "w1", b"%PDF-stale")
+    assert queue.get(job_id)["status"] == "running"
+
+
+def test_expired_lease_without_attempts_left_fails(queue, monkeypatch):
+    job_id = queue.enqueue(b"{}", max_attempts=1)
+    monkeypatch.setattr(job_queue, "LEASE_S", -1.0)
+    queue.claim("w1")
+    assert queue.claim("w2") is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "worker lost (attempts exhausted)"
+
+
+def test_complete_stores_result_and_drops_input(queue):
+    job_id = queue.enqueue(b'{"a": 1}')
+    with pytest.raises(ValueError):
+        queue.read_result(job_id)
+    queue.claim("w1")
+    queue.complete(job_id, "w1", b"%PDF-1.4 report")
+    assert queue.read_result(job_id) == b"%PDF-1.4 report"
+    job = queue.get(job_id)
+    assert (job["status"], job["progress"], job["result_bytes"]) == ("done", 1.0, 15)
+    assert not os.path.exists(queue.input_path(job_id))
+
+
+def test_fail_retries_with_backoff_then_gives_up(queue, monkeypatch):
+    job_id = queue.enqueue(b"{}", max_attempts=2)
+    queue.claim("w1")
+    queue.fail(job_id, "w1", "timeout")
+    assert queue.get(job_id)["status"] == "queued"
+    assert queue.claim("w1") is None            # still backing off
+
+    monkeypatch.setattr(job_queue, "RETRY_BACKOFF_S", 0.0)
+    job_id2 = queue.enqueue(b"{}")
+    queue.claim("w1")
+    queue.fail(job_id2, "w1", "timeout")
+    assert queue.claim("w1")[0] == job_id2
+    queue.fail(job_id2, "w1", "timeout again")
+    queue.claim("w1")
+    queue.fail(job_id2, "w1", "third strike")
+    job = queue.get(job_id2)
+    assert (job["status"], job["error"]) == ("failed", "third strike")
+
+    assert queue.retry(job_id2)
+    assert queue.get(job_id2)["attempts"] == 0
+    assert not queue.retry(job_id2)              # only failed jobs
+
+
+def test_permanent_failure_is_not_retried(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "RETRY_BACKOFF_S", 0.0)
+    job_id = queue.enqueue(b"not json")
+    queue.claim("w1")
+    queue.fail(job_id, "w1", "does not parse", permanent=True)
+    assert queue.get(job_id)["status"] == "failed"
+    assert queue.claim("w1") is None
+
+
+def test_recover_requeues_jobs_of_dead_local_workers(queue):
+    dead, alive = _dead_worker(), job_queue._worker_id()
+    lost = queue.enqueue(b"{}")
+    busy = queue.enqueue(b"{}")
+    queue.claim(dead)
+    queue.claim(alive)
+    assert queue.claim("w3") is None
+
+    assert queue.recover() == 1
+    assert queue.claim("w3") == (lost, "llm", None)
+    assert queue.get(busy)["worker"] == alive
+
+
+def test_shared_between_instances(tmp_path):
+    root = str(tmp_path / "jobs")
+    job_id = JobQueue(root).enqueue(b"{}")
+    assert JobQueue(root).claim("w1")[0] == job_id
+    with pytest.raises(ValueError):
+        JobQueue(root).enqueue(b"{}", engine="gpt")
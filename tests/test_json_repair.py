@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from app.json_repair import repair_json
+
+
+def _loads(text):
+    repaired, complete = repair_json(text)
+    assert complete, repaired
+    return json.loads(repaired)
+
+
+def test_valid_json_unchanged():
+    text = '{"intro": "Hi \\"there\\"", "tips": ["a", "b"], "n": 1.5, "ok": true, "none": null}'
+    assert repair_json(text) == (text, True)
+
+
+@pytest.mark.parametrize("text", [
+    'Sure! Here is the feedback:\n{"intro": "hi"}\nHope this helps.',
+    '```json\n{"intro": "hi"}\n```',
+])
+def test_prose_and_fences_dropped(text):
+    assert _loads(text) == {"intro": "hi"}
+
+
+def test_control_characters_in_strings_escaped():
+    value = _loads('{"intro": "line one\nline two\tend\x01"}')
+    assert value == {"intro": "line one\nline two\tend\x01"}
+
+
+def test_trailing_commas_removed():
+    assert _loads('{"tips": ["a", "b",], "n": 1, }') == {"tips": ["a", "b"], "n": 1}
+
+
+def test_mismatched_closer_replaced():
+    assert _loads('{"tips": ["a", "b"}}') == {"tips": ["a", "b"]}
+
+
+def test_brackets_inside_strings_left_alone():
+    assert _loads('{"intro": "use {x} and [y], too"}') == {"intro": "use {x} and [y], too"}
+
+
+def test_unterminated_final_string_closed():
+    assert _loads('{"intro": "hi", "tips": ["a", "last tip]}') == {"intro": "hi", "tips": ["a", "last tip"]}
+    assert _loads('{"intro": "hi", "outro": "bye}') == {"intro": "hi", "outro": "bye"}
+
+
+@pytest.mark.parametrize("text", [
+    '{"intro": "hi", "tips": ["a", "cut off mid',          # no closers at all
+    '{"intro": "hi", "tips": ["a", "b"}',                   # outer object never closed
+    '{"intro": "ends in a backslash \\',                    # quote would be escaped
+])
+def test_truncated_reply_left_incomplete(text):
+    repaired, complete = repair_json(text)
+    assert not complete
+    assert len(repaired) == len(text)          # nothing invented to close it
+
+
+def test_truncated_reply_keeps_finished_sections():
+    from app.feedback_generator import _salvage_sections
+
+    raw = '```json\n{"intro": "Hello\nthere", "breakdown": "Good work,", "suggestions": ["Rev'
+    assert _salvage_sections(raw) == {"intro": "Hello\nthere", "breakdown": "Good work,"}
+
+
+def test_arrays_and_nothing_to_repair():
+    assert _loads('Result: [{"id": "s1"}, {"id": "s2"},]') == [{"id": "s1"}, {"id": "s2"}]
+    assert repair_json("no json here") == ("", False)
+    assert repair_json(None) == ("", False)
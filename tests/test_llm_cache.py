@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from app import feedback_generator, llm_cache, llm_client
+from app.llm_cache import LLMCache
+
+GOOD = json.dumps({"intro": "Hi!", "breakdown": "Solid work.", "suggestions": ["Review Capacitance."]})
+
+
+@pytest.fixture
+def replies(tmp_path, monkeypatch):
+    """
+    The shared client and cache, pointed at a temp cache and a fake API that
+    returns the queued replies in order. Yields the queue; calls are counted in it.
+    """
+    queue = {"replies": [], "calls": 0}
+
+    def request_completion(self, prompt, model, max_tokens, temperature):
+        queue["calls"] += 1
+        return queue["replies"].pop(0), None
+
+    monkeypatch.setattr(llm_cache, "_default_cache", LLMCache(str(tmp_path / "llm.sqlite")))
+    monkeypatch.setattr(llm_client, "_default_client", llm_client.LLMClient(api_key="test"))
+    monkeypatch.setattr(llm_client.LLMClient, "_request_completion", request_completion)
+    monkeypatch.setattr(feedback_generator, "get_single_flight", lambda: None)
+    return queue
+
+
+def test_cache_delete(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"))
+    cache.put("k", "reply")
+    cache.delete("k")
+    cache.delete("missing")
+    assert cache.get("k") is None and len(cache) == 0
+
+
+def test_good_reply_served_from_cache(replies, sample_bytes):
+    from app.data_processor import parse_json_to_df
+
+    _, summary = parse_json_to_df(sample_bytes)
+    replies["replies"] = [GOOD]
+    first = feedback_generator.generate_feedback(summary, engine="llm")
+    second = feedback_generator.generate_feedback(summary, engine="llm")
+    assert first["intro"] == second["intro"] == "Hi!"
+    assert second["usage"]["source"] == "cache"
+    assert replies["calls"] == 1
+
+
+def test_unusable_reply_not_replayed(replies, sample_bytes):
+    from app.data_processor import parse_json_to_df
+
+    _, summary = parse_json_to_df(sample_bytes)
+    replies["replies"] = ["Sorry, I can't help with that.", GOOD]
+    fallback = feedback_generator.generate_feedback(summary, engine="llm")
+    assert fallback["usage"]["fallback_reason"]
+    assert len(llm_cache.get_llm_cache()) == 0
+
+    # A retry asks the API again rather than replaying the cached bad reply
+    retried = feedback_generator.generate_feedback(summary, engine="llm")
+    assert retried["intro"] == "Hi!"
+    assert replies["calls"] == 2
+
+
+def test_unusable_streamed_reply_not_replayed(replies, sample_bytes, monkeypatch):
+    from app.data_processor import parse_json_to_df
+
+    def stream_complete(self, prompt, **kwargs):
+        yield self.complete(prompt, **kwargs)
+
+    monkeypatch.setattr(llm_client.LLMClient, "stream_complete", stream_complete)
+    _, summary = parse_json_to_df(sample_bytes)
+    replies["replies"] = ["not json at all", GOOD]
+    *_, fallback = feedback_generator.stream_feedback_sections(summary)
+    assert fallback["usage"]["fallback_reason"]
+    *_, retried = feedback_generator.stream_feedback_sections(summary)
+    assert retried["intro"] == "Hi!"
+    assert replies["calls"] == 2
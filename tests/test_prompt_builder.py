@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+from app.prompt_builder import (
+    _compact, _extremes_first, build_feedback_prompt, count_tokens, dumps_compact, fit_context, get_template,
+)
+
+
+def _context(chapters=30, subjects=4, concepts=8, seed=0):
+    rng = random.Random(seed)
+    return {
+        "student_name": "Asha",
+        "overall_accuracy": 61.234,
+        "subjects": [{"subject": f"Subject {i}", "accuracy": rng.uniform(0, 100)} for i in range(subjects)],
+        "chapters": [{"chapter": f"Chapter {i}", "accuracy": rng.uniform(0, 100), "avg_time_spent": rng.uniform(20, 200)}
+                     for i in range(chapters)],
+        "weakest_concepts": [{"concept": f"Weak {i}", "accuracy": 10.0 + i} for i in range(concepts)],
+        "slowest_concepts": [{"concept": f"Slow {i}", "avg_time_spent": 300.0 - i} for i in range(concepts)],
+    }
+
+
+def _names(rows, key):
+    return [row[key] for row in rows]
+
+
+def test_nothing_dropped_under_budget():
+    context = _context()
+    data, omitted, tokens = fit_context(context, 100_000)
+    assert omitted == {}
+    assert data == _compact(context)
+    assert count_tokens(dumps_compact(data)) <= tokens
+
+
+@pytest.mark.parametrize("budget", [60, 150, 300, 600, 1000])
+def test_result_fits_budget(budget):
+    data, omitted, tokens = fit_context(_context(), budget)
+    assert count_tokens(dumps_compact(data)) <= tokens
+    if tokens > budget:
+        # Only the scalars are left and they alone overflow
+        assert omitted == {"slowest_concepts": 8, "weakest_concepts": 8, "chapters": 30, "subjects": 4}
+
+
+def test_trimming_order():
+    context = _context()
+    full = fit_context(context, 100_000)[2]
+    slow_cost = full - fit_context({k: v for k, v in context.items() if k != "slowest_concepts"}, 100_000)[2]
+
+    data, omitted, _ = fit_context(context, full - 1)
+    assert set(omitted) == {"slowest_concepts"}
+    assert _names(data["slowest_concepts"], "concept") == [f"Slow {i}" for i in range(7)]
+
+    data, omitted, _ = fit_context(context, full - slow_cost - 1)
+    assert omitted["slowest_concepts"] == 8
+    assert "slowest_concepts" not in data
+    assert set(omitted) == {"slowest_concepts", "weakest_concepts"}
+
+    data, omitted, _ = fit_context(context, 250)
+    assert omitted["chapters"] > 0 and "subjects" not in omitted
+    assert data["omitted_chapters"] == omitted["chapters"]
+    assert "omitted_subjects" not in data
+
+
+def test_chapters_keep_extremes_in_original_order():
+    context = _context(chapters=40)
+    data, omitted, _ = fit_context(context, 300)
+    kept = _names(data["chapters"], "chapter")
+    assert 0 < len(kept) < 40
+    by_accuracy = sorted(context["chapters"], key=lambda row: row["accuracy"])
+    assert by_accuracy[0]["chapter"] in kept and by_accuracy[-1]["chapter"] in kept
+    # The middle of the ranking goes first
+    assert by_accuracy[20]["chapter"] not in kept
+    order = _names(context["chapters"], "chapter")
+    assert kept == [name for name in order if name in kept]
+
+
+def test_many_rows_trim_like_one_at_a_time():
+    context = _context(chapters=2000, subjects=50, concepts=100, seed=3)
+    data, omitted, tokens = fit_context(context, 2000)
+    assert tokens <= 2000
+    assert len(data["chapters"]) + omitted["chapters"] == 2000
+    # Trimming stopped as soon as it fit: putting back the last row dropped overflows
+    compacted = _compact(context)["chapters"]
+    kept = set(_names(data["chapters"], "chapter"))
+    last_dropped = next(i for i in _extremes_first(compacted, "accuracy") if compacted[i]["chapter"] not in kept)
+    assert tokens + count_tokens(dumps_compact(compacted[last_dropped])) + 1 > 2000
+
+
+def test_build_feedback_prompt_respects_budget():
+    budget = get_template().fixed_tokens + 500
+    built = build_feedback_prompt(_context(chapters=200), budget=budget)
+    assert built.omitted
+    assert built.prompt_tokens <= budget
+    assert dumps_compact(built.context) in built.text
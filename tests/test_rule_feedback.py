@@ -0,0 +1,28 @@
+import pandas as pd
+
+from app.data_processor import parse_json_to_df
+from app.rule_feedback import STRONG_ACCURACY, _chapter_rows, generate_rule_feedback
+
+
+def test_chapters_banded_on_exact_accuracy(sample_bytes):
+    _, summary = parse_json_to_df(sample_bytes)
+    rows = {row["chapter"]: row for row in _chapter_rows(summary["chapter_summary_df"])}
+    electrostatics = rows["Electrostatics"]
+    assert electrostatics["correct"] == 10 and electrostatics["questions"] == 15
+    assert electrostatics["accuracy"] < STRONG_ACCURACY
+    line = next(line for line in generate_rule_feedback(summary)["breakdown"].splitlines()
+                if line.startswith("- Electrostatics:"))
+    assert line.startswith("- Electrostatics: 67% over 15 questions")
+    assert "a real strength" not in line
+
+
+def test_overall_counts_from_chapters_without_subjects():
+    chapters = pd.DataFrame({
+        "chapter": ["A", "B"],
+        "accuracy": [66.7, 33.3],
+        "avg_time_spent": [60.0, 60.0],
+        "num_questions": [3, 3],
+        "correct": [2, 1],
+    })
+    feedback = generate_rule_feedback({"student_name": "Asha", "chapter_summary_df": chapters})
+    assert feedback["intro"].startswith("Hi Asha! You answered 3 of 6 questions correctly (50%).")
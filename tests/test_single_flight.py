@@ -0,0 +1,144 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.single_flight import Abandoned, SingleFlight
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _wait_for_followers(flight, n, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while flight.stats["coalesced"] < n and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_concurrent_callers_share_one_call(tmp_path):
+    flight = SingleFlight(str(tmp_path), cross_process=False)
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {"sections": 3}
+
+    def call():
+        return flight.do("key", work)
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(call) for _ in range(8)]
+        _wait_for_followers(flight, 7)
+        release.set()
+        results = [f.result() for f in futures]
+    assert results == [{"sections": 3}] * 8
+    assert len(calls) == 1
+    assert flight.stats == {"leaders": 1, "coalesced": 7, "coalesced_processes": 0}
+
+    # Once finished, the key is free again
+    assert flight.do("key", lambda: "again") == "again"
+    assert flight.stats["leaders"] == 2
+
+
+def test_followers_get_the_leaders_exception(tmp_path):
+    flight = SingleFlight(str(tmp_path), cross_process=False)
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise ValueError("model said no")
+
+    def call():
+        return flight.do("key", work)
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(call) for _ in range(4)]
+        _wait_for_followers(flight, 3)
+        release.set()
+        errors = [f.exception() for f in futures]
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_follower_gives_up_after_wait_timeout(tmp_path):
+    flight = SingleFlight(str(tmp_path), cross_process=False, wait_timeout=0.2)
+    leader = flight.begin("key")
+    assert leader.leader
+    follower = flight.begin("key")
+    assert not follower.leader
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        follower.wait()
+    assert time.monotonic() - started < 2.0
+    leader.abandon()
+    with pytest.raises(Abandoned):
+        follower.wait()
+
+
+def _hold_in_child(lock_dir, key, hold_s, result=None, fail=False):
+    """
+    A child process that leads `key` for hold_s seconds, then publishes `result`
+    (or fails). Returns once the child holds the lock.
+    """
+    script = textwrap.dedent(f"""
+        import sys, time
+        from app.single_flight import SingleFlight
+        call = SingleFlight({lock_dir!r}).begin({key!r})
+        print("leading", flush=True)
+        time.sleep({hold_s!r})
+        if {fail!r}:
+            call.finish(error=RuntimeError("leader failed"))
+        else:
+            call.finish({result!r})
+    """)
+    proc = subprocess.Popen([sys.executable, "-c", script], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    assert proc.stdout.readline().strip() == "leading"
+    return proc
+
+
+@pytest.fixture
+def cross_process_dir(tmp_path):
+    if SingleFlight(str(tmp_path)).cross_process is False:
+        pytest.skip("no flock on this platform")
+    return str(tmp_path)
+
+
+def test_result_shared_across_processes(cross_process_dir):
+    proc = _hold_in_child(cross_process_dir, "abc123", 0.3, result={"intro": "from child"})
+    flight = SingleFlight(cross_process_dir)
+    try:
+        assert flight.do("abc123", lambda: pytest.fail("should not run")) == {"intro": "from child"}
+    finally:
+        proc.wait(10)
+    assert flight.stats["coalesced_processes"] == 1
+    assert flight.stats["leaders"] == 0
+
+
+def test_failed_leader_in_other_process_leaves_call_to_us(cross_process_dir):
+    proc = _hold_in_child(cross_process_dir, "abc123", 0.3, fail=True)
+    flight = SingleFlight(cross_process_dir)
+    try:
+        assert flight.do("abc123", lambda: "ran here") == "ran here"
+    finally:
+        proc.wait(10)
+    assert flight.stats["leaders"] == 1
+
+
+def test_cross_process_wait_is_bounded(cross_process_dir):
+    proc = _hold_in_child(cross_process_dir, "abc123", 30)
+    flight = SingleFlight(cross_process_dir, wait_timeout=0.3)
+    try:
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            flight.do("abc123", lambda: "too late")
+        assert time.monotonic() - started < 3.0
+    finally:
+        proc.kill()
+        proc.wait(10)
+    # The lock died with the child: the next caller leads
+    assert flight.do("abc123", lambda: "ours") == "ours"
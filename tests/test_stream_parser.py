@@ -0,0 +1,56 @@
+import json
+
+import pandas as pd
+import pytest
+
+from app.data_processor import _parse_submission, parse_json_stream_to_df, parse_json_to_df
+from app.stream_parser import iter_submissions
+
+
+def _assert_same_parse(expected, actual):
+    expected_df, expected_summary = expected
+    actual_df, actual_summary = actual
+    pd.testing.assert_frame_equal(expected_df, actual_df)
+    assert expected_summary["student_name"] == actual_summary["student_name"]
+    for name, value in expected_summary.items():
+        if isinstance(value, pd.DataFrame):
+            pd.testing.assert_frame_equal(value, actual_summary[name], obj=name)
+
+
+def test_sample_matches_parse_json_to_df(sample_bytes):
+    _assert_same_parse(parse_json_to_df(sample_bytes), parse_json_stream_to_df(sample_bytes))
+
+
+def test_stream_keeps_no_raw_json(sample_bytes):
+    _, summary = parse_json_stream_to_df(sample_bytes)
+    assert summary["raw_json"] is None
+
+
+def test_path_and_file_object_sources(tmp_path, sample_bytes):
+    path = tmp_path / "submission.json"
+    path.write_bytes(sample_bytes)
+    expected = parse_json_to_df(sample_bytes)
+    _assert_same_parse(expected, parse_json_stream_to_df(str(path)))
+    with open(path, "rb") as f:
+        _assert_same_parse(expected, parse_json_stream_to_df(f))
+
+
+def test_single_object_top_level(cohort_bytes):
+    submission = json.loads(cohort_bytes)[1]
+    raw = json.dumps(submission).encode("utf-8")
+    _assert_same_parse(parse_json_to_df(raw), parse_json_stream_to_df(raw))
+
+
+def test_every_cohort_submission_matches(cohort_bytes):
+    submissions = json.loads(cohort_bytes)
+    skeletons = list(iter_submissions(cohort_bytes))
+    assert len(skeletons) == len(submissions)
+    for submission, skeleton in zip(submissions, skeletons):
+        _assert_same_parse(_parse_submission(submission), _parse_submission(skeleton, keep_raw=False))
+
+
+def test_empty_list_and_scalar_rejected():
+    with pytest.raises(ValueError):
+        parse_json_stream_to_df(b"[]")
+    with pytest.raises(ValueError):
+        parse_json_stream_to_df(b"42")